@@ -0,0 +1,143 @@
+import time
+import itertools
+import threading
+from collections import deque
+from queue import PriorityQueue, Empty, Full
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from logging_setup import get_logger
+
+
+log = get_logger('alerts')
+
+
+# Lower value is processed first
+ALERT_PRIORITIES = {'severe': 0, 'moderate': 1, 'fall': 2}
+DEFAULT_PRIORITY = 3
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[int(fraction * (len(sorted_values) - 1))]
+
+
+class AlertExecutor:
+    """Processes alerts in priority order with bounded concurrency
+
+    Up to max_workers alerts are handled at once. Slow external calls
+    (the LLM analysis) go through call_with_timeout so a stuck request
+    falls back instead of holding a worker indefinitely.
+    """
+
+    def __init__(self, handler, max_workers=4, max_queue=100, call_timeout=8.0):
+        self.handler = handler
+        self.max_workers = max_workers
+        self.call_timeout = call_timeout
+
+        self.queue = PriorityQueue(maxsize=max_queue)
+        self.sequence = itertools.count()
+        # Timed-out calls keep running in the background, so allow some headroom
+        self.call_pool = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix='alert-call')
+        self.workers = []
+        self.is_running = False
+
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.time_to_alert = deque(maxlen=500)
+        self.queue_wait = deque(maxlen=500)
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self.run_worker, name=f'alert-worker-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        log.info("🚑 Alert executor started - %d workers, %.0fs call timeout", self.max_workers, self.call_timeout)
+
+    def stop(self):
+        self.is_running = False
+
+    def submit(self, alert_data):
+        """Queue an alert; returns False if the queue is full and it was dropped"""
+        priority = ALERT_PRIORITIES.get(alert_data['class_name'], DEFAULT_PRIORITY)
+        alert_data['queued_at'] = time.time()
+        try:
+            self.queue.put_nowait((priority, next(self.sequence), alert_data))
+            return True
+        except Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def run_worker(self):
+        while self.is_running:
+            try:
+                _, _, alert_data = self.queue.get(timeout=0.5)
+            except Empty:
+                continue
+
+            started = time.time()
+            with self.lock:
+                self.in_progress += 1
+                self.queue_wait.append(started - alert_data['queued_at'])
+
+            try:
+                self.handler(alert_data)
+                with self.lock:
+                    self.processed += 1
+                    self.time_to_alert.append(time.time() - alert_data.get('captured_at', alert_data['queued_at']))
+            except Exception as e:
+                log.error("❌ [%s] Alert error: %s", alert_data.get('stream_id'), e)
+                with self.lock:
+                    self.failed += 1
+            finally:
+                with self.lock:
+                    self.in_progress -= 1
+
+    def call_with_timeout(self, fn, *args, fallback=None, timeout=None):
+        """Run fn(*args) with a deadline; on timeout or error return fallback()
+
+        Returns (value, used_fallback).
+        """
+        future = self.call_pool.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout or self.call_timeout), False
+        except FutureTimeout:
+            with self.lock:
+                self.timeouts += 1
+            log.warning("⏱️ Call to %s timed out, using fallback", getattr(fn, '__name__', fn))
+        except Exception as e:
+            log.error("❌ Call to %s failed: %s", getattr(fn, '__name__', fn), e)
+        return (fallback() if fallback else None), True
+
+    def get_stats(self):
+        with self.lock:
+            time_to_alert = sorted(self.time_to_alert)
+            queue_wait = sorted(self.queue_wait)
+            stats = {
+                'queue_depth': self.queue.qsize(),
+                'in_progress': self.in_progress,
+                'workers': self.max_workers,
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'timeouts': self.timeouts
+            }
+
+        if time_to_alert:
+            stats['time_to_alert'] = {
+                'p50_s': round(percentile(time_to_alert, 0.5), 3),
+                'p95_s': round(percentile(time_to_alert, 0.95), 3),
+                'max_s': round(time_to_alert[-1], 3)
+            }
+        if queue_wait:
+            stats['queue_wait'] = {
+                'p50_s': round(percentile(queue_wait, 0.5), 3),
+                'p95_s': round(percentile(queue_wait, 0.95), 3)
+            }
+        return stats
@@ -0,0 +1,233 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+from logging_setup import get_logger
+
+
+log = get_logger('alert_store')
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    alert_id TEXT UNIQUE,
+    stream_id TEXT,
+    track_id INTEGER,
+    class_name TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    threshold REAL,
+    created_at REAL NOT NULL,
+    analysis TEXT,
+    evidence_sha256 TEXT,
+    clip_file TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts (created_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_class_created ON alerts (class_name, created_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_stream_created ON alerts (stream_id, created_at);
+"""
+
+
+class AlertStore:
+    """SQLite index of alerts with content-addressed evidence blobs
+
+    Evidence images are stored once under blobs/<aa>/<sha256>.jpg no
+    matter how many alerts reference them. Alert numbers come from the
+    table's autoincrement id, so they keep counting across restarts.
+    Retention also removes the clips (under clips/) of deleted alerts.
+    """
+
+    def __init__(self, folder='./alerts', db_name='alerts.db'):
+        self.folder = folder
+        self.blob_folder = os.path.join(folder, 'blobs')
+        self.clip_folder = os.path.join(folder, 'clips')
+        os.makedirs(self.blob_folder, exist_ok=True)
+
+        self.db_path = os.path.join(folder, db_name)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.retention_thread = None
+
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.migrate()
+            self.conn.commit()
+
+    def migrate(self):
+        """Add columns introduced after a database was first created"""
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(alerts)")}
+        if 'clip_file' not in columns:
+            self.conn.execute("ALTER TABLE alerts ADD COLUMN clip_file TEXT")
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_folder, sha256[:2], f"{sha256}.jpg")
+
+    def put_blob(self, data):
+        """Store bytes by content hash and return the hash"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temp name: two alerts with the same evidence may store it at once
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        return sha256
+
+    def last_alert_number(self):
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(id) FROM alerts").fetchone()
+        return row[0] or 0
+
+    def add_alert(self, class_name, confidence, analysis, evidence_jpeg=None,
+                  stream_id=None, track_id=None, clip_file=None, threshold=None, created_at=None):
+        """Record an alert and return its stored row as a dict"""
+        evidence_sha256 = self.put_blob(evidence_jpeg) if evidence_jpeg is not None else None
+        created_at = created_at or time.time()
+
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO alerts (stream_id, track_id, class_name, confidence, threshold, "
+                "created_at, analysis, evidence_sha256, clip_file) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (stream_id, track_id, class_name, confidence, threshold, created_at, analysis,
+                 evidence_sha256, clip_file)
+            )
+            alert_number = cursor.lastrowid
+            alert_id = f"EMRG-{alert_number:04d}"
+            self.conn.execute("UPDATE alerts SET alert_id = ? WHERE id = ?", (alert_id, alert_number))
+            self.conn.commit()
+            row = self.conn.execute("SELECT * FROM alerts WHERE id = ?", (alert_number,)).fetchone()
+
+        return self.row_to_dict(row)
+
+    def get_alert(self, alert_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM alerts WHERE alert_id = ?", (alert_id,)).fetchone()
+        return self.row_to_dict(row) if row else None
+
+    def query(self, start=None, end=None, class_name=None, stream_id=None, limit=50, before=None):
+        """Newest-first page of alerts; pass the returned next_before to get the next page"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("created_at >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("created_at < ?")
+            params.append(end)
+        if class_name:
+            clauses.append("class_name = ?")
+            params.append(class_name.lower())
+        if stream_id:
+            clauses.append("stream_id = ?")
+            params.append(stream_id)
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit = max(1, min(int(limit), 500))
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM alerts {where} ORDER BY id DESC LIMIT ?", params + [limit + 1]
+            ).fetchall()
+
+        alerts = [self.row_to_dict(row) for row in rows[:limit]]
+        next_before = alerts[-1]['id'] if len(rows) > limit else None
+        return {'alerts': alerts, 'next_before': next_before}
+
+    def row_to_dict(self, row):
+        alert = dict(row)
+        alert['timestamp'] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(alert['created_at']))
+        return alert
+
+    def apply_retention(self, max_age_days=None, max_alerts=None):
+        """Delete alerts past the retention policy, then drop unreferenced blobs and clips"""
+        deleted = 0
+        with self.lock:
+            if max_age_days:
+                cutoff = time.time() - max_age_days * 86400
+                deleted += self.conn.execute("DELETE FROM alerts WHERE created_at < ?", (cutoff,)).rowcount
+            if max_alerts:
+                deleted += self.conn.execute(
+                    "DELETE FROM alerts WHERE id NOT IN (SELECT id FROM alerts ORDER BY id DESC LIMIT ?)",
+                    (max_alerts,)
+                ).rowcount
+            self.conn.commit()
+            referenced = {
+                row[0] for row in
+                self.conn.execute("SELECT DISTINCT evidence_sha256 FROM alerts WHERE evidence_sha256 IS NOT NULL")
+            }
+            referenced_clips = {
+                row[0] for row in
+                self.conn.execute("SELECT DISTINCT clip_file FROM alerts WHERE clip_file IS NOT NULL")
+            }
+
+        removed_blobs = self.compact(referenced)
+        removed_clips = self.compact(referenced_clips, folder=self.clip_folder, match_stem=False)
+        if deleted:
+            with self.lock:
+                self.conn.execute("VACUUM")
+        if deleted or removed_blobs or removed_clips:
+            log.info("🧹 Alert retention: removed %d alerts, %d evidence files and %d clips",
+                     deleted, removed_blobs, removed_clips)
+        return deleted, removed_blobs, removed_clips
+
+    def compact(self, referenced, grace_period=60, folder=None, match_stem=True):
+        """Remove files under folder (the blob folder by default) that no alert references
+
+        Blobs are referenced by their hash (the file name without extension),
+        clips by their full file name (match_stem=False).
+        """
+        # Skip fresh files: a blob is written just before its alert row is inserted,
+        # a clip may be written before its alert's analysis finishes
+        cutoff = time.time() - grace_period
+        removed = 0
+        for root, _, files in os.walk(folder or self.blob_folder):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = filename.split('.')[0] if match_stem else filename
+                if name not in referenced and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def start_retention_worker(self, max_age_days=None, max_alerts=None, interval=3600):
+        """Apply the retention policy now and then every interval seconds"""
+        if self.retention_thread or not (max_age_days or max_alerts):
+            return
+
+        def run():
+            while True:
+                try:
+                    self.apply_retention(max_age_days, max_alerts)
+                except Exception as e:
+                    log.error("❌ Alert retention error: %s", e)
+                time.sleep(interval)
+
+        self.retention_thread = threading.Thread(target=run, daemon=True)
+        self.retention_thread.start()
+
+    def export_report(self, alert):
+        """Legacy report layout, as previously written to report_*.json"""
+        return {
+            "alert_id": alert['alert_id'],
+            "timestamp": alert['timestamp'],
+            "incident_type": alert['class_name'].upper(),
+            "detection_confidence": round(alert['confidence'], 3),
+            "ai_analysis": alert['analysis'],
+            "evidence_file": alert['evidence_sha256'],
+            "detection_threshold": alert['threshold']
+        }
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from logging_setup import get_logger
+
+
+log = get_logger('analysis_cache')
+
+
+def dhash(image_bgr, hash_size=8):
+    """64-bit difference hash: robust to small shifts, noise and re-encoding"""
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY) if image_bgr.ndim == 3 else image_bgr
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class AnalysisCache:
+    """Reuses LLM analyses for near-duplicate incident crops
+
+    Entries are keyed on class name plus a perceptual hash of the crop. A
+    lookup hits when an unexpired entry of the same class is within
+    max_distance bits. The cache is LRU-bounded to max_entries and can be
+    persisted to a JSON file so it survives restarts.
+    """
+
+    def __init__(self, max_entries=256, ttl=600, max_distance=6, persist_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.persist_path = persist_path
+
+        self.entries = OrderedDict()  # (class_name, phash) -> entry
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency = 0.0
+
+        if persist_path:
+            self.load()
+
+    def evict_expired(self, now):
+        expired = [key for key, entry in self.entries.items() if now - entry['created_at'] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+
+    def lookup(self, class_name, crop_bgr):
+        """Return (analysis or None, phash) for an incident crop"""
+        phash = dhash(crop_bgr)
+        now = time.time()
+
+        with self.lock:
+            self.evict_expired(now)
+
+            best_key, best_distance = None, self.max_distance + 1
+            for key in self.entries:
+                if key[0] != class_name:
+                    continue
+                distance = hamming_distance(key[1], phash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+
+            if best_key is None:
+                self.misses += 1
+                return None, phash
+
+            entry = self.entries[best_key]
+            self.entries.move_to_end(best_key)
+            self.hits += 1
+            self.saved_latency += entry['latency']
+            return entry['analysis'], phash
+
+    def store(self, class_name, phash, analysis, latency):
+        with self.lock:
+            self.entries[(class_name, phash)] = {
+                'analysis': analysis,
+                'latency': latency,
+                'created_at': time.time()
+            }
+            self.entries.move_to_end((class_name, phash))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        if self.persist_path:
+            self.save()
+
+    def save(self):
+        """Write the cache atomically; concurrent saves are serialized so the newest snapshot wins"""
+        with self.save_lock:
+            with self.lock:
+                data = [
+                    {'class_name': class_name, 'phash': f"{phash:016x}", **entry}
+                    for (class_name, phash), entry in self.entries.items()
+                ]
+            folder = os.path.dirname(os.path.abspath(self.persist_path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.analysis_cache-', suffix='.tmp', dir=folder)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.persist_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    def load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Could not load analysis cache %s: %s", self.persist_path, e)
+            return
+
+        with self.lock:
+            for item in data:
+                key = (item['class_name'], int(item['phash'], 16))
+                self.entries[key] = {
+                    'analysis': item['analysis'],
+                    'latency': item['latency'],
+                    'created_at': item['created_at']
+                }
+            self.evict_expired(time.time())
+        log.info("🗂️ Loaded %d cached analyses from %s", len(self.entries), self.persist_path)
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'saved_latency_s': round(self.saved_latency, 2)
+        }
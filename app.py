@@ -1,36 +1,176 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_socketio import SocketIO, emit
-import cv2
-import numpy as np
-import json
 import time
+process_started = time.time()
+
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 import os
-import base64
-from PIL import Image
+import re
 import threading
-from queue import Queue
-from detection_model import EmergencyDetectionSystem
+from datetime import datetime
+from stream_manager import StreamManager
+from analysis_cache import AnalysisCache
+from alert_store import AlertStore
+from clip_recorder import ClipRecorder
+from metrics import PipelineMetrics
+from logging_setup import get_logger, setup_logging, set_stream_debug
+from config import ConfigWatcher, load_config, public_config
+from upload_manager import UploadManager
+from notifications import NotificationDispatcher, channels_from_env
+from message_bus import create_bus
+from cluster import ClusterStreams, DetectorWorker, bus_emitter
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+# Upload bookkeeping stays outside the publicly served static tree
+app.config['UPLOAD_STATE_FOLDER'] = 'uploads/.state'
 
+# Bound to the app (and its message queue) in create_app()
 socketio = SocketIO(
-    app,
     cors_allowed_origins="*",
     async_mode='eventlet',
     logger=False,
     engineio_logger=False
 )
+log = get_logger('app')
+
+# Services built by create_app(); importing this module starts nothing, so spawned
+# inference workers (which re-import the main module) stay free of servers and threads
+bus = None
+role = None
+upload_manager = None
+config_path = None
+alert_store = None
+pipeline_metrics = None
+stats_interval = 0
+stats_task = None
+notifier = None
+stream_manager = None
+streams = None
+detector_worker = None
+config_watcher = None
+
+
+def create_app():
+    """Build the services behind the dashboard and API, once per server process"""
+    global bus, role, upload_manager, config_path, alert_store, pipeline_metrics, stats_interval, notifier, \
+        stream_manager, streams, detector_worker, config_watcher
+    if stream_manager is not None:
+        return app
+
+    # Scaled-out mode: SOS_BUS_URL=redis://... shares streams and Socket.IO rooms between processes.
+    # SOS_ROLE=web serves only the dashboard and API; detector_worker.py processes run the cameras.
+    bus_url = os.environ.get('SOS_BUS_URL')
+    role = os.environ.get('SOS_ROLE', 'standalone')
+    if role not in ('standalone', 'web'):
+        raise ValueError(f"Unknown SOS_ROLE: {role}")
+    if role == 'web' and not bus_url:
+        raise ValueError("SOS_ROLE=web needs SOS_BUS_URL to reach the detector workers")
+    bus = create_bus(bus_url) if bus_url else None
+    socketio.init_app(app, message_queue=bus.socketio_queue if bus else None)
+
+    # Levelled, rate-limited logging written by a background thread; SOS_DEBUG_STREAMS traces chosen streams
+    setup_logging(
+        level=os.environ.get('SOS_LOG_LEVEL', 'INFO'),
+        debug_streams=[s for s in os.environ.get('SOS_DEBUG_STREAMS', '').split(',') if s],
+        rate_burst=int(os.environ.get('SOS_LOG_RATE_BURST', 20))
+    )
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # Resumable chunked uploads; a stream can start on the part already received
+    upload_manager = UploadManager(
+        app.config['UPLOAD_FOLDER'],
+        state_folder=app.config['UPLOAD_STATE_FOLDER'],
+        stall_timeout=float(os.environ.get('SOS_UPLOAD_STALL_TIMEOUT', 60))
+    )
+    os.makedirs('alerts', exist_ok=True)
+
+    # Detector settings: config.py defaults < SOS_CONFIG file (hot-reloaded) < SOS_* variables
+    config_path = os.environ.get('SOS_CONFIG', 'config.json')
+    detector_config = load_config(config_path)
 
-# Global variables
-detection_system = None
-frame_queue = Queue(maxsize=3)
-alert_queue = Queue()
-is_monitoring = False
+    # Alert history is queryable before any model is loaded
+    alert_store = AlertStore('alerts')
 
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs('alerts', exist_ok=True)
+    # Per-stage latency histograms, exported on /metrics and pushed to dashboards
+    pipeline_metrics = PipelineMetrics()
+    stats_interval = float(os.environ.get('SOS_STATS_INTERVAL', 2))
+
+    # Pre/post-event clips are opt-in: they need every stream encoded, watched or not
+    clip_recorder = None
+    if float(os.environ.get('SOS_CLIP_SECONDS_BEFORE', 0)) > 0:
+        clip_recorder = ClipRecorder(
+            folder=os.path.join('alerts', 'clips'),
+            seconds_before=float(os.environ['SOS_CLIP_SECONDS_BEFORE']),
+            seconds_after=float(os.environ.get('SOS_CLIP_SECONDS_AFTER', 5)),
+            max_bytes_per_stream=int(float(os.environ.get('SOS_CLIP_BUFFER_MB', 6)) * 1024 * 1024),
+            fps=float(os.environ.get('SOS_CLIP_FPS', 10)),
+            metrics=pipeline_metrics
+        )
+
+    # External notifications: email and/or webhook (Slack, SMS gateways, ...), sent from a durable outbox
+    notification_channels = channels_from_env() if role != 'web' else []
+    if notification_channels:
+        notifier = NotificationDispatcher(
+            notification_channels,
+            outbox_path=os.path.join('alerts', 'notifications.db'),
+            coalesce_window=float(os.environ.get('SOS_NOTIFY_COALESCE', 10)),
+            max_attempts=int(os.environ.get('SOS_NOTIFY_MAX_ATTEMPTS', 8)),
+            metrics=pipeline_metrics
+        )
+        notifier.start()
+
+    # One manager owns every stream, the shared model and the alert pipeline
+    stream_manager = StreamManager(
+        bus_emitter(bus, socketio.emit) if bus else socketio.emit,
+        max_streams=int(os.environ.get('SOS_MAX_STREAMS', 64)),
+        max_batch_size=int(os.environ.get('SOS_MAX_BATCH_SIZE', 8)),
+        max_batch_wait=float(os.environ.get('SOS_MAX_BATCH_WAIT_MS', 20)) / 1000,
+        client_video_fps=float(os.environ.get('SOS_CLIENT_VIDEO_FPS', 5)),
+        alert_workers=int(os.environ.get('SOS_ALERT_WORKERS', 4)),
+        analysis_timeout=float(os.environ.get('SOS_ANALYSIS_TIMEOUT', 8)),
+        analysis_cache=AnalysisCache(
+            max_entries=int(os.environ.get('SOS_ANALYSIS_CACHE_SIZE', 256)),
+            ttl=float(os.environ.get('SOS_ANALYSIS_CACHE_TTL', 600)),
+            max_distance=int(os.environ.get('SOS_ANALYSIS_CACHE_DISTANCE', 6)),
+            persist_path=os.environ.get('SOS_ANALYSIS_CACHE_PATH')
+        ),
+        alert_store=alert_store,
+        clip_recorder=clip_recorder,
+        execution_mode=os.environ.get('SOS_EXECUTION_MODE', 'thread'),
+        inference_workers=int(os.environ['SOS_INFERENCE_WORKERS']) if os.environ.get('SOS_INFERENCE_WORKERS') else None,
+        metrics=pipeline_metrics,
+        config=detector_config,
+        notifier=notifier
+    )
+
+    # Socket and API handlers control streams through `streams`: the local manager, or the cluster
+    streams = stream_manager
+    if bus:
+        streams = ClusterStreams(bus)
+        streams.start()
+        if role != 'web':
+            # memory:// (or a standalone node on a shared bus) also runs cameras in this process
+            detector_worker = DetectorWorker(bus, stream_manager, worker_id=os.environ.get('SOS_WORKER_ID'))
+            detector_worker.start()
+
+    # Load and warm the model in the background so the first stream starts on a hot detector
+    if os.environ.get('SOS_PRELOAD', '1') == '1' and role != 'web':
+        threading.Thread(target=stream_manager.preload, daemon=True).start()
+
+    config_watcher = ConfigWatcher(config_path, stream_manager.apply_config,
+                                   interval=float(os.environ.get('SOS_CONFIG_POLL', 2)))
+    config_watcher.start()
+
+    stream_manager.startup['server_ready_s'] = round(time.time() - process_started, 3)
+    return app
+
+def emit_stats_loop():
+    """Push stage latency summaries to every dashboard (web nodes leave this to the detector workers)"""
+    while True:
+        socketio.sleep(stats_interval)
+        socketio.emit('pipeline_stats', stream_manager.get_pipeline_stats())
 
 @app.route('/')
 def index():
@@ -46,379 +186,268 @@ def upload_video():
         return jsonify({'error': 'No file selected'}), 400
     
     if file:
-        filename = f"uploaded_video_{int(time.time())}.mp4"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        return jsonify({'success': True, 'filepath': filepath})
+        session = upload_manager.save_file(file)
+        return jsonify({'success': True, 'filepath': session.path, 'upload_id': session.upload_id})
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    try:
+        session = upload_manager.create(data.get('filename'), data.get('size'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(session.to_dict(), success=True))
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    session = upload_manager.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(session.to_dict())
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append the raw request body at ?offset=; a wrong offset returns 409 with the offset to resume from"""
+    session = upload_manager.get(upload_id)
+    if session is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.args.get('offset', type=int)
+    try:
+        upload_manager.write_chunk(session, offset, request.stream)
+    except ValueError as e:
+        return jsonify(dict(session.to_dict(), error=str(e))), 409
+    return jsonify(session.to_dict())
 
 @socketio.on('connect')
 def handle_connect():
-    print(f"🔌 Client connected: {request.sid}")
+    global stats_task
+    log.info("🔌 Client connected: %s", request.sid)
     emit('connected', {'status': 'Connected'})
+    if stats_task is None and stats_interval > 0 and role != 'web':
+        stats_task = socketio.start_background_task(emit_stats_loop)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    streams.remove_client(request.sid)
 
 @socketio.on('start_monitoring')
 def handle_start_monitoring(data):
-    global detection_system, is_monitoring
-    
     try:
         source_type = data.get('type', 'file')
         
+        upload = None
         if source_type == 'file':
-            uploaded_files = [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if f.endswith('.mp4')]
-            if uploaded_files:
-                video_source = os.path.join(app.config['UPLOAD_FOLDER'], uploaded_files[-1])
-            else:
-                emit('monitoring_error', {'error': 'No uploaded video found'})
+            # Monitoring is tied to one upload, which may still be in progress
+            upload = upload_manager.get(data.get('upload_id'))
+            if upload is None:
+                emit('monitoring_error', {'error': 'Unknown or missing upload_id'})
                 return
+            video_source = upload.path
         else:
             video_source = data.get('source')
         
-        detection_system = EmergencyDetectionSystem()
-        is_monitoring = True
-        
-        # Start threads
-        detection_thread = threading.Thread(target=run_detection_loop, args=(video_source,))
-        streaming_thread = threading.Thread(target=run_streaming_loop)
-        alert_thread = threading.Thread(target=run_alert_loop)
-        
-        detection_thread.daemon = True
-        streaming_thread.daemon = True
-        alert_thread.daemon = True
+        stream = streams.start_stream(
+            video_source, data.get('stream_id'), data.get('render_mode', 'server'), data.get('roi'),
+            upload=None if upload is None or upload.complete else upload, tiling=data.get('tiling'),
+            latency_target_ms=data.get('latency_target_ms')
+        )
+        join_room(stream.stream_id)
+        streams.add_viewer(stream.stream_id, request.sid)
         
-        detection_thread.start()
-        streaming_thread.start()
-        alert_thread.start()
-        
-        emit('monitoring_started', {'status': 'success'})
+        emit('monitoring_started', {'status': 'success', 'stream_id': stream.stream_id})
         
     except Exception as e:
         emit('monitoring_error', {'error': str(e)})
 
 @socketio.on('stop_monitoring')
-def handle_stop_monitoring():
-    global is_monitoring
-    is_monitoring = False
-    emit('monitoring_stopped', {'status': 'stopped'})
-
-def run_detection_loop(video_source):
-    """Optimized detection loop with debugging"""
-    global is_monitoring, detection_system, frame_queue
+def handle_stop_monitoring(data=None):
+    stream_id = (data or {}).get('stream_id')
     
-    print(f"🎬 Starting optimized detection on: {video_source}")
-    cap = cv2.VideoCapture(video_source)
+    # Without an explicit stream, stop whatever this client is watching
+    stream_ids = [stream_id] if stream_id else [r for r in rooms() if r != request.sid]
+    for sid in stream_ids:
+        streams.stop_stream(sid)
     
-    if not cap.isOpened():
-        socketio.emit('monitoring_error', {'error': f'Cannot open: {video_source}'})
+    emit('monitoring_stopped', {'status': 'stopped', 'stream_ids': stream_ids})
+
+@socketio.on('set_render_mode')
+def handle_set_render_mode(data):
+    stream = streams.get_stream(data.get('stream_id'))
+    if stream is None:
+        emit('monitoring_error', {'error': f"Unknown stream: {data.get('stream_id')}"})
         return
-    
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    print(f"📹 Video - FPS: {fps}, Frames: {total_frames}")
-    
-    frame_count = 0
-    detection_count = 0
-    skip_frames = 2  # Process every 3rd frame
-    
     try:
-        while is_monitoring:
-            ret, frame = cap.read()
-            if not ret:
-                print("📄 End of video file reached")
-                break
-            
-            frame_count += 1
-            
-            # Skip frames for performance
-            if frame_count % skip_frames != 0:
-                continue
-            
-            # For live streams: Alternative buffer management
-            if isinstance(video_source, str) and video_source.startswith('rtsp'):
-                for _ in range(2):
-                    cap.grab()
-            
-            # Resize for optimal YOLO performance
-            original_height, original_width = frame.shape[:2]
-            inference_frame = cv2.resize(frame, (640, 640))
-            display_frame = cv2.resize(frame, (640, 480))
-            
-            # YOLO inference
-            start_time = time.time()
-            results = detection_system.yolo(inference_frame, verbose=False)
-            inference_time = time.time() - start_time
-            
-            # Process detections
-            detections = []
-            for result in results:
-                if hasattr(result, "boxes") and result.boxes is not None:
-                    for box in result.boxes:
-                        confidence = float(box.conf.item())
-                        class_id = int(box.cls.item())
-                        class_name = detection_system.yolo.names[class_id].lower()
-                        
-                        if class_name == "slight":
-                            continue
-                        
-                        # DEBUG: Add threshold debugging
-                        threshold = detection_system.get_confidence_threshold(class_name)
-                        
-                        print(f"🔍 DEBUG: {class_name} - conf={confidence:.3f}, thresh={threshold:.3f}")
-                        
-                        # FIXED: Use proper comparison operators
-                        if confidence < threshold:
-                            print(f"❌ REJECTED: {confidence:.3f} < {threshold:.3f}")
-                            continue
-                            
-                        print(f"✅ ACCEPTED: {confidence:.3f} >= {threshold:.3f}")
-                        
-                        # Get coordinates and scale
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        scale_x = original_width / 640
-                        scale_y = original_height / 640
-                        
-                        x1_orig = int(x1 * scale_x)
-                        y1_orig = int(y1 * scale_y)
-                        x2_orig = int(x2 * scale_x)
-                        y2_orig = int(y2 * scale_y)
-                        
-                        # Scale to display frame
-                        display_scale_x = 640 / original_width
-                        display_scale_y = 480 / original_height
-                        x1_disp = int(x1_orig * display_scale_x)
-                        y1_disp = int(y1_orig * display_scale_y)
-                        x2_disp = int(x2_orig * display_scale_x)
-                        y2_disp = int(y2_orig * display_scale_y)
-                        
-                        detection_data = {
-                            'class_name': class_name,
-                            'confidence': confidence,
-                            'bbox': [x1_orig, y1_orig, x2_orig, y2_orig]
-                        }
-                        detections.append(detection_data)
-                        detection_count += 1
-                        
-                        # Draw detection on display frame
-                        color = get_color_for_class(class_name)
-                        cv2.rectangle(display_frame, (x1_disp, y1_disp), (x2_disp, y2_disp), color, 2)
-                        
-                        # Add label with background
-                        label = f"{class_name.upper()} {confidence:.2f}"
-                        (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                        cv2.rectangle(display_frame, (x1_disp, y1_disp - label_h - 10),
-                                    (x1_disp + label_w, y1_disp), color, -1)
-                        cv2.putText(display_frame, label, (x1_disp, y1_disp - 5),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-                        
-                        # Queue alert for processing
-                        if detection_system.should_send_alert(class_name):
-                            alert_data = {
-                                'frame': frame.copy(),
-                                'bbox': [x1_orig, y1_orig, x2_orig, y2_orig],
-                                'class_name': class_name,
-                                'confidence': confidence
-                            }
-                            try:
-                                alert_queue.put_nowait(alert_data)
-                                print(f"🚨 Queued alert for {class_name}")
-                            except:
-                                print("Alert queue full, skipping...")
-            
-            # Add performance overlay
-            fps_actual = 1 / inference_time if inference_time > 0 else 0
-            cv2.putText(display_frame, f"Inference: {fps_actual:.1f}FPS | Frame: {frame_count}",
-                       (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            cv2.putText(display_frame, f"Detections: {detection_count}",
-                       (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # Queue frame for streaming
-            frame_data = {
-                'frame': display_frame,
-                'frame_count': frame_count,
-                'detections': detections,
-                'inference_time': inference_time,
-                'fps': fps_actual
-            }
-            
-            # Non-blocking frame queuing
-            try:
-                if not frame_queue.full():
-                    frame_queue.put_nowait(frame_data)
-                else:
-                    try:
-                        frame_queue.get_nowait()
-                        frame_queue.put_nowait(frame_data)
-                    except:
-                        pass
-            except:
-                pass
-            
-            time.sleep(0.01)
-            
-    except Exception as e:
-        print(f"❌ Detection error: {e}")
-        socketio.emit('monitoring_error', {'error': str(e)})
-    finally:
-        cap.release()
-        print(f"🏁 Detection finished. {frame_count} frames, {detection_count} detections")
-        socketio.emit('monitoring_stopped', {'status': 'stopped'})
-
-def run_streaming_loop():
-    """Stream frames to frontend"""
-    global is_monitoring, frame_queue
+        stream.set_render_mode(data.get('render_mode'))
+    except ValueError as e:
+        emit('monitoring_error', {'error': str(e)})
+        return
+    emit('render_mode_changed', {'stream_id': stream.stream_id, 'render_mode': stream.render_mode},
+         to=stream.stream_id)
+
+@socketio.on('watch_stream')
+def handle_watch_stream(data):
+    stream_id = data.get('stream_id')
+    if streams.get_stream(stream_id) is None:
+        emit('monitoring_error', {'error': f'Unknown stream: {stream_id}'})
+        return
+    join_room(stream_id)
+    streams.add_viewer(stream_id, request.sid)
+    emit('stream_joined', {'stream_id': stream_id})
+
+@socketio.on('unwatch_stream')
+def handle_unwatch_stream(data):
+    stream_id = data.get('stream_id')
+    leave_room(stream_id)
+    streams.remove_viewer(stream_id, request.sid)
+    emit('stream_left', {'stream_id': stream_id})
+
+@socketio.on('client_timing')
+def handle_client_timing(data):
+    """Decode/display timings a dashboard measured for the stream it shows"""
+    if not isinstance(data, dict) or not isinstance(data.get('stream_id'), str):
+        return
+    # In cluster mode the report goes over the bus to the worker running the stream
+    streams.record_client_timing(data['stream_id'], data)
+
+@app.route('/api/streams', methods=['GET'])
+def list_streams():
+    return jsonify({'streams': streams.list_streams()})
+
+@app.route('/api/streams', methods=['POST'])
+def start_stream():
+    data = request.get_json(silent=True) or {}
+    upload = None
+    if data.get('upload_id'):
+        upload = upload_manager.get(data['upload_id'])
+        if upload is None:
+            return jsonify({'error': 'Upload not found'}), 404
+        data['source'] = upload.path
+    if not data.get('source'):
+        return jsonify({'error': 'No source provided'}), 400
     
-    while is_monitoring:
-        try:
-            if not frame_queue.empty():
-                frame_data = frame_queue.get_nowait()
-                
-                # Encode frame
-                _, buffer = cv2.imencode('.jpg', frame_data['frame'], 
-                                       [cv2.IMWRITE_JPEG_QUALITY, 75])
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                
-                # Emit to frontend
-                socketio.emit('video_frame', {
-                    'frame': frame_base64,
-                    'frame_count': frame_data['frame_count'],
-                    'detections': frame_data['detections'],
-                    'fps': f"{frame_data['fps']:.1f}",
-                    'inference_time': f"{frame_data['inference_time']*1000:.1f}ms"
-                })
-                
-            time.sleep(0.033)  # ~30 FPS streaming
-            
-        except Exception as e:
-            print(f"Streaming error: {e}")
-            time.sleep(0.1)
-
-def run_alert_loop():
-    """Process emergency alerts"""
-    global is_monitoring, alert_queue, detection_system
+    try:
+        stream = streams.start_stream(
+            data['source'], data.get('stream_id'), data.get('render_mode', 'server'), data.get('roi'),
+            upload=None if upload is None or upload.complete else upload, tiling=data.get('tiling'),
+            latency_target_ms=data.get('latency_target_ms')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except RuntimeError as e:
+        # The detector could not be started (e.g. inference workers failed to load the model)
+        return jsonify({'error': str(e)}), 503
     
-    while is_monitoring:
-        try:
-            if not alert_queue.empty():
-                alert_data = alert_queue.get()
-                print(f"🤖 Processing alert for {alert_data['class_name']}")
-                process_emergency_alert(
-                    alert_data['frame'],
-                    alert_data['bbox'],
-                    alert_data['class_name'],
-                    alert_data['confidence']
-                )
-            else:
-                time.sleep(0.1)
-                
-        except Exception as e:
-            print(f"Alert processing error: {e}")
-            time.sleep(0.1)
-
-def process_emergency_alert(frame, bbox, class_name, confidence):
-    """Process and emit emergency alerts with message sending"""
+    return jsonify({'success': True, 'stream': stream.get_status()})
+
+@app.route('/api/stats')
+def get_stats():
+    stats = stream_manager.get_stats()
+    if bus:
+        stats['streams'] = streams.list_streams()
+        stats['cluster'] = dict(streams.get_cluster_stats(), role=role,
+                                worker=detector_worker.get_stats() if detector_worker else None)
+    return jsonify(stats)
+
+@app.route('/api/config', methods=['GET'])
+def get_config():
+    """Settings this node loaded; detector workers load and watch the same SOS_CONFIG file themselves"""
+    return jsonify(public_config(stream_manager.config))
+
+@app.route('/api/config/reload', methods=['POST'])
+def reload_config():
     try:
-        x1, y1, x2, y2 = bbox
-        h, w = frame.shape[:2]
-        
-        # Extract incident region
-        pad = 30
-        x1_pad = max(0, x1 - pad)
-        y1_pad = max(0, y1 - pad)
-        x2_pad = min(w, x2 + pad)
-        y2_pad = min(h, y2 + pad)
-        
-        incident_crop = frame[y1_pad:y2_pad, x1_pad:x2_pad]
-        
-        # Resize if too large
-        if incident_crop.shape[0] > 400 or incident_crop.shape[1] > 400:
-            incident_crop = cv2.resize(incident_crop, (400, 400))
-        
-        incident_rgb = cv2.cvtColor(incident_crop, cv2.COLOR_BGR2RGB)
-        incident_pil = Image.fromarray(incident_rgb)
-        
-        # Notify frontend of AI processing
-        socketio.emit('alert_processing', {
-            'type': class_name,
-            'status': 'Getting AI analysis...'
-        })
-        
-        # Get Gemini analysis
-        start_ai = time.time()
-        gemini_analysis = detection_system.get_gemini_analysis(incident_pil, class_name)
-        ai_time = time.time() - start_ai
-        
-        # Save alert
-        detection_system.save_emergency_alert(class_name, confidence, gemini_analysis, incident_crop)
-        
-        # CREATE ALERT MESSAGE LIKE BEFORE
-        alert_message = f"""
-🚨 EMERGENCY ALERT #{detection_system.alert_count} 🚨
-TYPE: {class_name.upper()} | CONFIDENCE: {confidence:.1%}
-TIME: {time.strftime("%Y-%m-%d %H:%M:%S")}
-ANALYSIS: {gemini_analysis}
-ALERT ID: EMRG-{detection_system.alert_count:04d}
-AI PROCESSING TIME: {ai_time:.1f}s
-        """.strip()
-        
-        # SEND ALERT MESSAGE (like before)
-        print(alert_message)
-        print("-" * 60)
-        
-        # Optional: Send to external systems (email, SMS, etc.)
-        # send_to_email(alert_message)
-        # send_to_sms(alert_message)
-        # send_to_slack(alert_message)
-        
-        # Encode image for web
-        _, buffer = cv2.imencode('.jpg', incident_crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        incident_image = base64.b64encode(buffer).decode('utf-8')
-        
-        # Emit emergency alert to frontend
-        socketio.emit('emergency_alert', {
-            'type': class_name.upper(),
-            'confidence': confidence,
-            'analysis': gemini_analysis,
-            'alert_message': alert_message,  # Added full message
-            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
-            'image': incident_image,
-            'alert_id': f"EMRG-{detection_system.alert_count:04d}",
-            'ai_time': f"{ai_time:.1f}s"
-        })
-        
-        print(f"✅ Alert emitted: {class_name.upper()} - {confidence:.1%}")
-        
-    except Exception as e:
-        print(f"❌ Alert error: {e}")
-        socketio.emit('alert_error', {'error': str(e)})
+        changed = stream_manager.apply_config(load_config(config_path))
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'Invalid config: {e}'}), 400
+    return jsonify({'success': True, 'changed': sorted(changed)})
 
-def get_color_for_class(class_name):
-    colors = {
-        'severe': (0, 0, 255),     # Red
-        'moderate': (0, 165, 255), # Orange  
-        'fall': (0, 255, 255)      # Yellow
-    }
-    return colors.get(class_name, (255, 255, 255))
+@app.route('/metrics')
+def metrics():
+    # A web node runs no pipelines: export the cluster view, stage histograms are on the workers
+    source = streams if role == 'web' else stream_manager
+    return Response(source.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/streams/<stream_id>', methods=['DELETE'])
+def stop_stream(stream_id):
+    if not streams.stop_stream(stream_id):
+        return jsonify({'error': 'Stream not found'}), 404
+    return jsonify({'success': True})
+
+@app.route('/api/streams/<stream_id>/debug', methods=['POST'])
+def set_stream_debug_logging(stream_id):
+    """Turn per-frame DEBUG tracing on or off for one stream"""
+    enabled = bool((request.get_json(silent=True) or {}).get('enabled', True))
+    set_stream_debug(stream_id, enabled)
+    return jsonify({'success': True, 'stream_id': stream_id, 'debug': enabled})
+
+# Evidence and reports written by releases before the alert store; alerts/ also
+# holds the alert database and notification outbox, which must never be served
+LEGACY_ALERT_FILE = re.compile(r'^(alert_[\w-]+\.jpg|report_[\w-]+\.json)$')
 
 @app.route('/alerts/<filename>')
 def serve_alert_file(filename):
+    if not LEGACY_ALERT_FILE.match(filename):
+        return jsonify({'error': 'Not found'}), 404
     return send_from_directory('alerts', filename)
 
-# Optional: Add external messaging functions
-def send_to_email(message):
-    """Send alert via email"""
-    # Implement email sending logic here
-    pass
+def parse_time_arg(value):
+    """Accept epoch seconds or an ISO 8601 timestamp"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/alerts')
+def query_alerts():
+    try:
+        page = alert_store.query(
+            start=parse_time_arg(request.args.get('start')),
+            end=parse_time_arg(request.args.get('end')),
+            class_name=request.args.get('type'),
+            stream_id=request.args.get('stream'),
+            limit=request.args.get('limit', 50, type=int),
+            before=request.args.get('before', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time: {e}'}), 400
+    
+    for alert in page['alerts']:
+        if alert['evidence_sha256']:
+            alert['evidence_url'] = f"/api/alerts/{alert['alert_id']}/evidence"
+        if alert['clip_file']:
+            alert['clip_url'] = f"/api/alerts/{alert['alert_id']}/clip"
+    return jsonify(page)
+
+@app.route('/api/alerts/<alert_id>')
+def get_alert(alert_id):
+    alert = alert_store.get_alert(alert_id)
+    if alert is None:
+        return jsonify({'error': 'Alert not found'}), 404
+    return jsonify(alert)
 
-def send_to_sms(message):
-    """Send alert via SMS"""
-    # Implement SMS sending logic here
-    pass
+@app.route('/api/alerts/<alert_id>/evidence')
+def get_alert_evidence(alert_id):
+    alert = alert_store.get_alert(alert_id)
+    if alert is None or not alert['evidence_sha256']:
+        return jsonify({'error': 'Evidence not found'}), 404
+    path = alert_store.blob_path(alert['evidence_sha256'])
+    return send_from_directory(os.path.dirname(path), os.path.basename(path), max_age=86400)
 
-def send_to_slack(message):
-    """Send alert to Slack"""
-    # Implement Slack webhook logic here
-    pass
+@app.route('/api/alerts/<alert_id>/clip')
+def get_alert_clip(alert_id):
+    alert = alert_store.get_alert(alert_id)
+    if alert is None or not alert['clip_file']:
+        return jsonify({'error': 'Clip not found'}), 404
+    # The clip is written a few seconds after the alert fires
+    if not os.path.exists(os.path.join('alerts', 'clips', alert['clip_file'])):
+        return jsonify({'error': 'Clip not ready yet'}), 404
+    return send_from_directory(os.path.join('alerts', 'clips'), alert['clip_file'])
 
 if __name__ == '__main__':
     import eventlet
     eventlet.monkey_patch()
+    create_app()
     socketio.run(app, debug=False, host='0.0.0.0', port=5000)
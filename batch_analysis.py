@@ -0,0 +1,505 @@
+"""Headless batch analysis of archived footage
+
+    python batch_analysis.py /footage --out results --workers 4 --analysis defer
+    python batch_analysis.py --analyze results
+
+Runs the live monitor's detection path (detector backend, per-class
+thresholds, motion gate, incident tracker) over every video under the
+given paths. Frames are decoded back to back and inferred in batches,
+without the playback throttling and browser streaming of the web path.
+Videos are spread over a pool of worker processes that each load the
+model once.
+
+Per video, under --out:
+
+    detections/<key>.jsonl   one row per box above threshold
+    incidents/<key>.jsonl    one row per confirmed incident track
+    crops/<key>_<track>.jpg  the incident crop that analysis runs on
+
+--format parquet also writes a .parquet copy of each finished file
+(needs pyarrow). Progress is checkpointed every --checkpoint-every
+frames; running the same command again resumes each video from its
+last checkpoint and skips finished ones.
+
+--analysis decides what happens to incidents: skip leaves them without
+LLM analysis, inline runs Gemini on them as each video finishes, and
+defer marks them pending for a later --analyze pass. Incidents whose
+analysis failed are marked failed and retried by the next --analyze.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import cv2
+from PIL import Image
+
+from config import load_config
+from detection_model import AnalysisUnavailable, GeminiAnalyst, model_arguments
+from postprocess import build_threshold_table, extract_arrays, postprocess_arrays
+from tracker import IncidentTracker
+from motion_gate import MotionGate
+from analysis_cache import AnalysisCache
+from stream_manager import crop_incident
+from upload_manager import VIDEO_EXTENSIONS
+from logging_setup import get_logger, setup_logging
+
+
+log = get_logger('batch')
+
+INFERENCE_SIZE = (640, 640)
+ANALYSIS_MODES = ('skip', 'inline', 'defer')
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+# Detector of this worker process, loaded once by init_worker
+worker_model = None
+
+
+def find_videos(paths):
+    videos = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.update(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(path):
+            videos.add(path)
+        else:
+            log.warning("⚠️ Skipping %s: not found", path)
+    return sorted(os.path.abspath(video) for video in videos)
+
+
+def video_key(path):
+    """Output name: the file stem plus a hash of the full path, so same-named files never collide"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+
+
+def output_paths(out, key):
+    return {
+        'detections': os.path.join(out, 'detections', f"{key}.jsonl"),
+        'incidents': os.path.join(out, 'incidents', f"{key}.jsonl"),
+        'checkpoint': os.path.join(out, 'checkpoints', f"{key}.pkl"),
+        'crops': os.path.join(out, 'crops')
+    }
+
+
+def read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_jsonl(path, rows):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+    os.replace(tmp_path, path)
+
+
+def write_parquet(jsonl_path):
+    """Columnar copy of a finished JSONL file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    rows = read_jsonl(jsonl_path)
+    pq.write_table(pa.Table.from_pylist(rows), jsonl_path[:-len('.jsonl')] + '.parquet')
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, video, settings):
+    """The saved checkpoint, or None if there is none or it was made for another file or settings"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            checkpoint = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        log.warning("⚠️ Ignoring unreadable checkpoint %s: %s", path, e)
+        return None
+
+    stat = os.stat(video)
+    if checkpoint['source'] != (stat.st_size, stat.st_mtime) or checkpoint['settings'] != settings:
+        log.info("🔁 %s changed since its checkpoint, starting over", os.path.basename(video))
+        return None
+    return checkpoint
+
+
+def init_worker(model_config, threads, log_level):
+    """Pool initializer: set up logging and load the detector once per worker process"""
+    global worker_model
+    setup_logging(log_level)
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from detector_backends import load_detector
+    worker_model = load_detector(**model_config)
+
+
+class VideoJob:
+    """Detection and incident tracking for one video inside a worker process
+
+    State that must survive a crash (next frame, output sizes, tracker
+    and motion gate) is pickled to the checkpoint file after a batch
+    has been fully written, so a resumed run never writes a row twice.
+    """
+
+    def __init__(self, video, out, config, options):
+        self.video = video
+        self.key = video_key(video)
+        self.paths = output_paths(out, self.key)
+        self.out = out
+        self.config = config
+        self.options = options
+        self.names = dict(worker_model.names)
+        self.threshold_table = build_threshold_table(
+            self.names, lambda name: config.get(f"{name}_confidence", 0.5)
+        )
+        self.settings = {
+            'stride': options['stride'],
+            'motion_gate': options['motion_gate'],
+            'model': config['yolo_model_path'],
+            'thresholds': self.threshold_table.tolist(),
+            'tracking': [config[key] for key in ('track_iou_threshold', 'track_confirm_hits',
+                                                 'track_confirm_window', 'track_max_age')]
+        }
+
+        self.frame_index = 0
+        self.stats = {'frames': 0, 'inferred_frames': 0, 'gated_frames': 0, 'detections': 0, 'incidents': 0}
+        self.tracker = IncidentTracker(*self.settings['tracking'])
+        self.gate = None
+        if options['motion_gate']:
+            self.gate = MotionGate(
+                pixel_threshold=config['motion_pixel_threshold'],
+                min_area=config['motion_min_area'],
+                heartbeat=config['motion_heartbeat']
+            )
+
+    def restore(self, checkpoint):
+        self.frame_index = checkpoint['frame']
+        self.stats = checkpoint['stats']
+        self.tracker = checkpoint['tracker']
+        self.gate = checkpoint['gate']
+        # Drop anything written after the checkpoint
+        for name in ('detections', 'incidents'):
+            with open(self.paths[name], 'ab') as f:
+                f.truncate(checkpoint['sizes'][name])
+
+    def checkpoint(self, done=False):
+        for f in self.files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        stat = os.stat(self.video)
+        save_checkpoint(self.paths['checkpoint'], {
+            'source': (stat.st_size, stat.st_mtime),
+            'settings': self.settings,
+            'frame': self.frame_index,
+            'sizes': {name: f.tell() for name, f in self.files.items()},
+            'stats': self.stats,
+            'tracker': self.tracker,
+            'gate': self.gate,
+            'done': done
+        })
+
+    def run(self):
+        checkpoint = load_checkpoint(self.paths['checkpoint'], self.video, self.settings)
+        if checkpoint and checkpoint['done']:
+            return dict(self.summary(checkpoint['stats']), skipped=True)
+
+        cap = cv2.VideoCapture(self.video)
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open {self.video}")
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30
+
+        if checkpoint:
+            self.restore(checkpoint)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, self.frame_index)
+            log.info("⏩ %s: resuming at frame %d", self.key, self.frame_index)
+
+        mode = 'ab' if checkpoint else 'wb'
+        self.files = {name: open(self.paths[name], mode) for name in ('detections', 'incidents')}
+        started, start_frame = time.time(), self.frame_index
+        last_checkpoint = self.frame_index
+        batch = []
+
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                index = self.frame_index
+                self.frame_index += 1
+                self.stats['frames'] += 1
+
+                # Skipped frames are only grabbed, not decoded
+                for _ in range(self.options['stride'] - 1):
+                    if not cap.grab():
+                        break
+                    self.frame_index += 1
+
+                # Same gating as the live loop, on the video clock
+                if self.gate and self.gate.check(frame, force=bool(self.tracker.tracks), now=index / self.fps) is None:
+                    self.stats['gated_frames'] += 1
+                else:
+                    batch.append((index, frame))
+
+                if len(batch) >= self.options['batch_size']:
+                    self.run_batch(batch)
+                    batch = []
+                    if self.frame_index - last_checkpoint >= self.options['checkpoint_every']:
+                        self.checkpoint()
+                        last_checkpoint = self.frame_index
+
+            if batch:
+                self.run_batch(batch)
+            self.checkpoint(done=True)
+        finally:
+            cap.release()
+            for f in self.files.values():
+                f.close()
+
+        if self.options['format'] == 'parquet':
+            write_parquet(self.paths['detections'])
+            write_parquet(self.paths['incidents'])
+
+        elapsed = time.time() - started
+        summary = self.summary(self.stats)
+        summary['seconds'] = round(elapsed, 2)
+        summary['speed'] = round((self.frame_index - start_frame) / self.fps / elapsed, 2) if elapsed > 0 else None
+        return summary
+
+    def run_batch(self, batch):
+        results = worker_model([cv2.resize(frame, INFERENCE_SIZE) for _, frame in batch], verbose=False)
+        self.stats['inferred_frames'] += len(batch)
+
+        for (index, frame), result in zip(batch, results):
+            height, width = frame.shape[:2]
+            detections = postprocess_arrays(
+                extract_arrays(result), self.names, self.threshold_table,
+                INFERENCE_SIZE, (width, height), (width, height)
+            )
+            confirmed = self.tracker.update(detections)
+            timestamp = round(index / self.fps, 3)
+
+            for detection in detections.to_list():
+                detection.update(video=self.video, frame=index, time=timestamp)
+                self.files['detections'].write((json.dumps(detection) + '\n').encode())
+            self.stats['detections'] += len(detections)
+
+            for det_index, track in confirmed:
+                self.write_incident(frame, index, timestamp, detections, det_index, track)
+
+    def write_incident(self, frame, index, timestamp, detections, det_index, track):
+        bbox = detections.boxes[det_index].tolist()
+        crop_name = f"{self.key}_{track.track_id}.jpg"
+        cv2.imwrite(os.path.join(self.paths['crops'], crop_name), crop_incident(frame, bbox),
+                    [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+        incident = {
+            'incident_id': f"{self.key}:{track.track_id}",
+            'video': self.video,
+            'track_id': track.track_id,
+            'class_name': detections.class_name(det_index),
+            'confidence': float(detections.confidences[det_index]),
+            'bbox': bbox,
+            'frame': index,
+            'time': timestamp,
+            'crop': os.path.join('crops', crop_name),
+            'analysis': None,
+            'analysis_status': 'skipped' if self.options['analysis'] == 'skip' else 'pending'
+        }
+        self.files['incidents'].write((json.dumps(incident) + '\n').encode())
+        self.stats['incidents'] += 1
+
+    def summary(self, stats):
+        return dict(stats, video=self.video, key=self.key, incidents_file=self.paths['incidents'])
+
+
+def process_video(video, out, config, options):
+    return VideoJob(video, out, config, options).run()
+
+
+class IncidentAnalyst:
+    """Fills in the Gemini analysis of pending incidents
+
+    Uses the same prompts, crop size and near-duplicate analysis cache
+    as live alerts; the cache is persisted in the output folder. Rows
+    whose analysis fails are marked failed and retried by the next pass.
+    """
+
+    def __init__(self, config, out, output_format, workers=4):
+        self.gemini = GeminiAnalyst(config['google_api_key'], config['gemini_model'])
+        if not self.gemini.available:
+            raise RuntimeError("Gemini is not configured; set google_api_key or use --analysis skip/defer")
+
+        self.cache = AnalysisCache(persist_path=os.path.join(out, 'analysis_cache.json'))
+        self.out = out
+        self.output_format = output_format
+        self.workers = workers
+
+    def analyze_row(self, row):
+        crop = cv2.imread(os.path.join(self.out, row['crop']))
+        if crop is None:
+            row['analysis_status'] = 'missing_crop'
+            return
+
+        if crop.shape[0] > 400 or crop.shape[1] > 400:
+            crop = cv2.resize(crop, (400, 400))
+
+        analysis, phash = self.cache.lookup(row['class_name'], crop)
+        if analysis is not None:
+            row.update(analysis=analysis, analysis_status='cached')
+            return
+
+        started = time.time()
+        image = Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        try:
+            analysis = self.gemini.analyze(image, row['class_name'])
+        except AnalysisUnavailable as e:
+            log.warning("⚠️ %s: %s", row['incident_id'], e)
+            row['analysis_status'] = 'failed'
+            return
+        self.cache.store(row['class_name'], phash, analysis, time.time() - started)
+        row.update(analysis=analysis, analysis_status='done')
+
+    def analyze_file(self, path):
+        """Analyze the pending incidents of one incidents file; returns how many were analyzed"""
+        rows = read_jsonl(path)
+        pending = [row for row in rows if row['analysis_status'] in ('pending', 'failed')]
+        if not pending:
+            return 0
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(self.analyze_row, pending))
+
+        write_jsonl(path, rows)
+        if self.output_format == 'parquet':
+            write_parquet(path)
+        failed = sum(row['analysis_status'] == 'failed' for row in pending)
+        log.info("🤖 %s: analyzed %d incidents, %d failed", os.path.basename(path), len(pending) - failed, failed)
+        return len(pending) - failed
+
+
+def run_batch(args, config):
+    videos = find_videos(args.inputs)
+    if not videos:
+        raise RuntimeError("No videos found")
+    for folder in ('detections', 'incidents', 'checkpoints', 'crops'):
+        os.makedirs(os.path.join(args.out, folder), exist_ok=True)
+
+    analyst = None
+    if args.analysis == 'inline':
+        analyst = IncidentAnalyst(config, args.out, args.format, args.analysis_workers)
+
+    options = {
+        'stride': max(1, args.stride),
+        'batch_size': args.batch_size,
+        'checkpoint_every': args.checkpoint_every,
+        'motion_gate': config['motion_gating'] and not args.no_motion_gate,
+        'analysis': args.analysis,
+        'format': args.format
+    }
+    workers = min(args.workers or max(1, (os.cpu_count() or 2) // 2), len(videos))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    log.info("🎞️ Analyzing %d videos with %d workers", len(videos), workers)
+
+    started = time.time()
+    summaries = []
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn'), initializer=init_worker,
+                             initargs=(model_arguments(config), threads, args.log_level)) as pool:
+        futures = {pool.submit(process_video, video, args.out, config, options): video for video in videos}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                log.error("❌ %s failed: %s", futures[future], e)
+                summary = {'video': futures[future], 'error': str(e)}
+            else:
+                if analyst:
+                    summary['analyzed'] = analyst.analyze_file(summary['incidents_file'])
+                log.info("✅ %s: %d frames, %d incidents%s", os.path.basename(summary['video']), summary['frames'],
+                         summary['incidents'], ' (already done)' if summary.get('skipped') else
+                         f" at {summary['speed']}x real time")
+            summaries.append(summary)
+
+    processed = [s for s in summaries if 'error' not in s]
+    return {
+        'videos': sorted(summaries, key=lambda s: s['video']),
+        'failed': len(summaries) - len(processed),
+        'frames': sum(s['frames'] for s in processed),
+        'detections': sum(s['detections'] for s in processed),
+        'incidents': sum(s['incidents'] for s in processed),
+        'seconds': round(time.time() - started, 2)
+    }
+
+
+def run_analysis(args, config):
+    analyst = IncidentAnalyst(config, args.analyze, args.format, args.analysis_workers)
+    folder = os.path.join(args.analyze, 'incidents')
+    files = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.jsonl'))
+    return {'files': len(files), 'analyzed': sum(analyst.analyze_file(path) for path in files)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='Video files or folders to analyze')
+    parser.add_argument('--out', default='./batch_results', help='Output folder (also holds the checkpoints)')
+    parser.add_argument('--config', default=os.environ.get('SOS_CONFIG', 'config.json'),
+                        help='Detector config file, as for the web app')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: half the cores)')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--stride', type=int, default=1, help='Analyze every Nth frame')
+    parser.add_argument('--no-motion-gate', action='store_true', help='Infer on every frame, even static ones')
+    parser.add_argument('--checkpoint-every', type=int, default=500, help='Frames between checkpoints')
+    parser.add_argument('--format', default='jsonl', choices=OUTPUT_FORMATS)
+    parser.add_argument('--analysis', default='defer', choices=ANALYSIS_MODES,
+                        help='Gemini analysis of incidents: skip, inline, or defer to --analyze')
+    parser.add_argument('--analysis-workers', type=int, default=4, help='Concurrent Gemini calls')
+    parser.add_argument('--analyze', metavar='OUT', help='Analyze the pending incidents of an earlier run and exit')
+    parser.add_argument('--json', help='Write the run summary to this file')
+    parser.add_argument('--log-level', default='INFO')
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+    if not args.analyze and not args.inputs:
+        parser.error("give video files or folders to analyze, or --analyze OUT")
+
+    config = load_config(args.config)
+    try:
+        results = run_analysis(args, config) if args.analyze else run_batch(args, config)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+
+    if results.get('failed'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compare detector backends on the same frames
+
+    python benchmark_backends.py --weights best.pt --video sample.mp4 \
+        --backends torch onnx openvino --int8 --calibration sample.mp4
+
+Throughput is measured in frames/sec at the given batch size. Accuracy
+is measured against the PyTorch backend's detections: a detection
+matches when it has the same class and IoU >= --iou with a reference box.
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+
+from detector_backends import BACKENDS, load_calibration_frames, load_detector
+from postprocess import box_iou, extract_arrays
+
+
+def run_backend(model, frames, batch_size, conf):
+    """Return (fps, per-frame detection rows) for one backend"""
+    # Warm-up so lazy initialisation is not counted
+    model(frames[:batch_size], verbose=False, conf=conf)
+
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        for result in model(frames[i:i + batch_size], verbose=False, conf=conf):
+            outputs.append(extract_arrays(result))
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, outputs
+
+
+def match_detections(reference, candidate, iou_threshold):
+    """Count class-aware IoU matches between two frames' detection rows"""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0
+
+    iou = box_iou(reference[:, :4], candidate[:, :4])
+    iou[reference[:, 5][:, None] != candidate[:, 5][None, :]] = 0
+
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        r, c = np.unravel_index(iou.argmax(), iou.shape)
+        iou[r, :] = 0
+        iou[:, c] = 0
+        matched += 1
+    return matched
+
+
+def compare(reference_outputs, outputs, iou_threshold):
+    matched = sum(match_detections(r, c, iou_threshold) for r, c in zip(reference_outputs, outputs))
+    reference_total = sum(len(r) for r in reference_outputs)
+    candidate_total = sum(len(c) for c in outputs)
+
+    precision = matched / candidate_total if candidate_total else 1.0
+    recall = matched / reference_total if reference_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'detections': candidate_total,
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', required=True, help='PyTorch .pt checkpoint')
+    parser.add_argument('--video', required=True, help='Video file or image folder to benchmark on')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--int8', action='store_true', help='Also benchmark INT8 variants of onnx/openvino')
+    parser.add_argument('--calibration', help='Frames for INT8 calibration (defaults to --video)')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--cache-folder', default='./model_cache')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    frames = load_calibration_frames(args.video, count=args.frames)
+    print(f"🎞️ Benchmarking on {len(frames)} frames, batch size {args.batch_size}")
+
+    variants = [(backend, False) for backend in args.backends]
+    if args.int8:
+        variants += [(backend, True) for backend in args.backends if backend != 'torch']
+
+    # PyTorch is the accuracy reference even if it is not in --backends
+    reference_model = load_detector(args.weights, 'torch')
+    _, reference_outputs = run_backend(reference_model, frames, args.batch_size, args.conf)
+
+    results = []
+    for backend, int8 in variants:
+        name = f"{backend}{'-int8' if int8 else ''}"
+        model = load_detector(
+            args.weights, backend, int8=int8,
+            calibration_source=args.calibration or args.video,
+            cache_folder=args.cache_folder
+        )
+        fps, outputs = run_backend(model, frames, args.batch_size, args.conf)
+        row = {'backend': name, 'fps': round(fps, 2)}
+        row.update(compare(reference_outputs, outputs, args.iou))
+        results.append(row)
+        print(f"  {name:<14} {row['fps']:>8.2f} fps | P {row['precision']:.3f} "
+              f"R {row['recall']:.3f} F1 {row['f1']:.3f} | {row['detections']} detections")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': len(frames), 'batch_size': args.batch_size, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
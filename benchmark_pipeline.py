@@ -0,0 +1,377 @@
+"""Replay video through the full monitoring pipeline with stub model and LLM
+
+    python benchmark_pipeline.py --streams 4 --seconds 30 --json results.json \
+        --thresholds benchmark_thresholds.json
+
+Runs the real StreamManager stages (frame reader, motion gate, batched
+inference, postprocess, tracker, JPEG broadcast, alert executor, alert
+store) with a deterministic stub detector and a stub analysis provider
+with configurable latency, so results only depend on this code. Without
+--video a synthetic clip is generated: a static scene in which a bright
+"person" periodically appears and falls, which the stub detector finds
+by brightness.
+
+The per-frame CPU stages (motion gate, postprocess, tracking) are timed
+in isolation on one thread after the replay: inside the pipeline they
+share the GIL with decoding, inference and the other streams, so their
+wall-clock there mostly measures waiting (it is still reported under
+stage_histograms). Inference, encode, broadcast and alerts are timed in
+the running pipeline.
+
+Exits with status 1 if any metric violates --thresholds, a JSON file of
+{"dotted.metric.path": {"min": x} or {"max": y}}.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from functools import wraps
+
+import cv2
+import numpy as np
+
+import stream_manager as pipeline
+from alert_store import AlertStore
+from alert_executor import percentile
+from analysis_cache import AnalysisCache
+from detection_model import EmergencyDetectionSystem
+from motion_gate import MotionGate
+from tracker import IncidentTracker
+from metrics import PipelineMetrics
+from logging_setup import setup_logging
+
+
+STUB_NAMES = {0: 'severe', 1: 'moderate', 2: 'fall'}
+
+
+class StubDetector:
+    """Deterministic stand-in for the YOLO model
+
+    Reports one 'fall' box around the bright pixels of each frame, after
+    sleeping batch_latency + per_frame_latency * len(frames).
+    """
+
+    names = STUB_NAMES
+
+    def __init__(self, batch_latency=0.01, per_frame_latency=0.004, brightness=200, confidence=0.9):
+        self.batch_latency = batch_latency
+        self.per_frame_latency = per_frame_latency
+        self.brightness = brightness
+        self.confidence = confidence
+
+    def __call__(self, frames, verbose=False):
+        time.sleep(self.batch_latency + self.per_frame_latency * len(frames))
+        return [self.detect(frame) for frame in frames]
+
+    def detect(self, frame):
+        bright = frame.min(axis=2) > self.brightness
+        rows, cols = np.any(bright, axis=1), np.any(bright, axis=0)
+        if not rows.any():
+            return np.empty((0, 6), dtype=np.float32)
+        y1, y2 = np.flatnonzero(rows)[[0, -1]]
+        x1, x2 = np.flatnonzero(cols)[[0, -1]]
+        return np.array([[x1, y1, x2, y2, self.confidence, 2]], dtype=np.float32)
+
+
+class StubDetectionSystem(EmergencyDetectionSystem):
+    """EmergencyDetectionSystem with the stub detector and a fake LLM of configurable latency"""
+
+    def __init__(self, alert_store, detector, analysis_latency=0.5, analysis_jitter=0.2, seed=0):
+        super().__init__(alert_store=alert_store, load_model=False)
+        self.yolo = detector
+        self.names = detector.names
+        self.use_gemini = True
+        self.analysis_latency = analysis_latency
+        self.analysis_jitter = analysis_jitter
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def request_gemini_analysis(self, image_pil, event_type):
+        with self.random_lock:
+            jitter = self.random.uniform(0, self.analysis_jitter)
+        time.sleep(self.analysis_latency + jitter)
+        return f"Stub analysis: {event_type} incident in a {image_pil.width}x{image_pil.height} crop."
+
+
+class RunMetrics(PipelineMetrics):
+    """Keeps the series of finished streams, which the summary reads after they stop"""
+
+    def remove_stream(self, stream_id):
+        pass
+
+
+class StageTimer:
+    """Wall-clock samples per pipeline stage"""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, fn):
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+    def summary(self):
+        with self.lock:
+            samples = {stage: sorted(values) for stage, values in self.samples.items()}
+        return {stage: summarize(values) for stage, values in samples.items()}
+
+
+def summarize(sorted_values):
+    if not sorted_values:
+        return {'count': 0}
+    return {
+        'count': len(sorted_values),
+        'p50_ms': round(percentile(sorted_values, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(sorted_values, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(sorted_values, 0.99) * 1000, 2),
+        'max_ms': round(sorted_values[-1] * 1000, 2)
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def write_synthetic_video(path, seconds=20, fps=30, size=(1280, 720), idle=4.0, incident=4.0):
+    """Static textured scene; a bright box walks in and falls during every incident window"""
+    width, height = size
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    background = (60 + 60 * np.sin(x * 12) * np.cos(y * 9)).astype(np.uint8)
+    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    period = idle + incident
+    for index in range(int(seconds * fps)):
+        frame = background.copy()
+        phase = (index / fps) % period - idle
+        if phase >= 0:
+            progress = phase / incident
+            cx = int(width * (0.2 + 0.5 * min(progress * 2, 1.0)))
+            if progress < 0.5:
+                # Standing and walking
+                box = (cx - 40, height // 3, cx + 40, height // 3 + 240)
+            else:
+                # Lying on the floor
+                box = (cx - 120, 2 * height // 3, cx + 120, 2 * height // 3 + 80)
+            cv2.rectangle(frame, box[:2], box[2:], (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def check_thresholds(results, thresholds):
+    """Return a list of human-readable violations"""
+    violations = []
+    for path, limits in thresholds.items():
+        value = results
+        for key in path.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            violations.append(f"{path}: missing")
+            continue
+        if 'min' in limits and value < limits['min']:
+            violations.append(f"{path}: {value} < min {limits['min']}")
+        if 'max' in limits and value > limits['max']:
+            violations.append(f"{path}: {value} > max {limits['max']}")
+    return violations
+
+
+def instrument(manager, timer):
+    """Time the shared pipeline stages of this manager without changing what they do"""
+    manager.scheduler.infer = timer.wrap('inference', manager.scheduler.infer)
+    manager.broadcaster.encode = timer.wrap('encode', manager.broadcaster.encode)
+    manager.broadcaster.broadcast = timer.wrap('broadcast', manager.broadcaster.broadcast)
+
+    handler = timer.wrap('alert_handler', manager.alert_executor.handler)
+
+    def handle_alert(alert_data):
+        handler(alert_data)
+        timer.record('alert_latency', time.time() - alert_data['captured_at'])
+
+    manager.alert_executor.handler = handle_alert
+
+
+def time_cpu_stages(video, detection_system, timer, max_frames=600):
+    """Time motion gate, postprocess and tracking one frame at a time on this thread"""
+    gate = MotionGate(
+        pixel_threshold=detection_system.motion_pixel_threshold,
+        min_area=detection_system.motion_min_area,
+        heartbeat=detection_system.motion_heartbeat
+    )
+    tracker = IncidentTracker(
+        iou_threshold=detection_system.track_iou_threshold,
+        confirm_hits=detection_system.track_confirm_hits,
+        confirm_window=detection_system.track_confirm_window,
+        max_age=detection_system.track_max_age
+    )
+    check = timer.wrap('motion_gate', gate.check)
+    update = timer.wrap('tracking', tracker.update)
+    postprocess = timer.wrap('postprocess', pipeline.postprocess_result)
+
+    cap = cv2.VideoCapture(video)
+    try:
+        for _ in range(max_frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if check(frame, force=bool(tracker.tracks)) is None:
+                continue
+            height, width = frame.shape[:2]
+            result = detection_system.yolo.detect(cv2.resize(frame, (640, 640)))
+            detections = postprocess(result, detection_system.names, detection_system.get_threshold_table(),
+                                     inference_size=(640, 640), original_size=(width, height),
+                                     display_size=(width, height))
+            update(detections)
+    finally:
+        cap.release()
+
+
+def run_benchmark(args, workdir):
+    video = args.video
+    if not video:
+        video = os.path.join(workdir, 'synthetic.mp4')
+        write_synthetic_video(video, seconds=args.seconds, fps=args.fps)
+
+    alert_store = AlertStore(os.path.join(workdir, 'alerts'))
+    detector = StubDetector(args.batch_latency_ms / 1000, args.frame_latency_ms / 1000)
+    detection_system = StubDetectionSystem(
+        alert_store, detector, args.analysis_latency_ms / 1000, args.analysis_jitter_ms / 1000, args.seed
+    )
+
+    def emit(event, data, to=None, callback=None):
+        # Acknowledge video frames immediately, like a fast dashboard
+        if callback:
+            callback()
+
+    manager = pipeline.StreamManager(
+        emit,
+        max_streams=args.streams,
+        max_batch_size=args.batch_size,
+        max_batch_wait=args.batch_wait_ms / 1000,
+        analysis_cache=AnalysisCache(max_entries=0 if args.no_analysis_cache else 256),
+        alert_store=alert_store,
+        detection_system=detection_system,
+        metrics=RunMetrics()
+    )
+    manager.get_detection_system()
+
+    timer = StageTimer()
+    instrument(manager, timer)
+
+    started = time.time()
+    streams = []
+    for index in range(args.streams):
+        stream = manager.start_stream(video, f"bench-{index}", args.render_mode)
+        if args.viewers:
+            manager.broadcaster.add_viewer(stream.stream_id, f"viewer-{index}")
+        streams.append(stream)
+
+    deadline = started + args.seconds + 2
+    while any(stream.is_monitoring for stream in streams) and time.time() < deadline:
+        time.sleep(0.2)
+    manager.stop_all()
+    elapsed = time.time() - started
+
+    # Let queued alerts finish so their latency is counted
+    drain_deadline = time.time() + args.analysis_latency_ms / 1000 * 4 + 5
+    while time.time() < drain_deadline:
+        alert_stats = manager.alert_executor.get_stats()
+        if not alert_stats['queue_depth'] and not alert_stats['in_progress']:
+            break
+        time.sleep(0.1)
+
+    time_cpu_stages(video, detection_system, timer)
+
+    statuses = [stream.get_status() for stream in streams]
+    inference = manager.scheduler.get_stats()
+    stages = timer.summary()
+    alert_latency = stages.pop('alert_latency', {'count': 0})
+    decoded = sum(status['frame_count'] for status in statuses)
+    gated = sum((status['motion_gate'] or {}).get('frames_skipped', 0) for status in statuses)
+
+    return {
+        'config': {k: v for k, v in vars(args).items() if k not in ('json', 'thresholds')},
+        'elapsed_s': round(elapsed, 2),
+        'frames': {
+            'processed': decoded,
+            'inferred': inference['total_frames'],
+            'gated': gated,
+            'dropped_by_reader': sum(status['frames_dropped'] for status in statuses)
+        },
+        'fps': round(decoded / elapsed, 1) if elapsed else 0,
+        'inference_fps': round(inference['total_frames'] / elapsed, 1) if elapsed else 0,
+        'stages': stages,
+        'stage_histograms': manager.metrics.snapshot()['totals'],
+        'alerts': dict(alert_latency, **manager.alert_executor.get_stats()),
+        'peak_rss_mb': peak_rss_mb(),
+        'inference': inference,
+        'streaming': {k: v for k, v in manager.broadcaster.get_stats().items() if k != 'viewers'},
+        'analysis_cache': manager.analysis_cache.get_stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--video', help='Recorded video to replay (default: generate a synthetic one)')
+    parser.add_argument('--seconds', type=float, default=20,
+                        help='Length of the synthetic video; also caps how long a recorded video is replayed')
+    parser.add_argument('--fps', type=int, default=30, help='Frame rate of the synthetic video')
+    parser.add_argument('--streams', type=int, default=2, help='Concurrent replays of the video')
+    parser.add_argument('--render-mode', default='server', choices=pipeline.RENDER_MODES)
+    parser.add_argument('--viewers', type=int, default=1, choices=(0, 1), help='Attach a fake viewer per stream')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batch-wait-ms', type=float, default=20)
+    parser.add_argument('--batch-latency-ms', type=float, default=10, help='Stub detector cost per batch')
+    parser.add_argument('--frame-latency-ms', type=float, default=4, help='Stub detector cost per frame')
+    parser.add_argument('--analysis-latency-ms', type=float, default=500, help='Stub LLM latency')
+    parser.add_argument('--analysis-jitter-ms', type=float, default=200)
+    parser.add_argument('--no-analysis-cache', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--thresholds', help='JSON file of regression thresholds to gate on')
+    parser.add_argument('--log-level', default='WARNING', help='Pipeline log level (results go to stdout)')
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    with tempfile.TemporaryDirectory(prefix='sos-bench-') as workdir:
+        results = run_benchmark(args, workdir)
+
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            results['violations'] = check_thresholds(results, json.load(f))
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(output)
+
+    if results.get('violations'):
+        for violation in results['violations']:
+            print(f"❌ Regression: {violation}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+from collections import deque
+from queue import Queue
+
+import cv2
+import numpy as np
+
+from logging_setup import get_logger
+
+
+log = get_logger('clips')
+
+
+class EncodedFrameRing:
+    """Recent JPEG frames for one stream, capped by total bytes rather than count"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.frames = deque()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, jpeg):
+        with self.lock:
+            self.frames.append((timestamp, jpeg))
+            self.total_bytes += len(jpeg)
+            while self.total_bytes > self.max_bytes and len(self.frames) > 1:
+                _, dropped = self.frames.popleft()
+                self.total_bytes -= len(dropped)
+
+    def snapshot(self, start, end):
+        with self.lock:
+            return [(ts, jpeg) for ts, jpeg in self.frames if start <= ts <= end]
+
+    def get_stats(self):
+        with self.lock:
+            span = self.frames[-1][0] - self.frames[0][0] if len(self.frames) > 1 else 0
+            return {'frames': len(self.frames), 'bytes': self.total_bytes, 'seconds': round(span, 1)}
+
+
+class ClipRecorder:
+    """Writes pre/post-event MP4 clips from per-stream frame rings
+
+    Clip jobs are handled by one background writer. Each job waits until
+    its post-event window has been captured, then decodes the buffered
+    JPEGs and writes them to disk, so the detection loop only pays for a
+    queue put.
+    """
+
+    def __init__(self, folder='./alerts/clips', seconds_before=5, seconds_after=5,
+                 max_bytes_per_stream=6 * 1024 * 1024, fps=10, metrics=None):
+        self.folder = folder
+        self.seconds_before = seconds_before
+        self.seconds_after = seconds_after
+        self.max_bytes_per_stream = max_bytes_per_stream
+        self.fps = fps
+        self.metrics = metrics
+        os.makedirs(folder, exist_ok=True)
+
+        self.rings = {}
+        self.ring_users = {}  # stream_id -> streams holding the ring (a restart may overlap the release)
+        self.jobs = Queue()
+        self.lock = threading.Lock()
+        self.clips_written = 0
+        self.clips_failed = 0
+
+        self.writer_thread = threading.Thread(target=self.run_writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def get_ring(self, stream_id):
+        with self.lock:
+            if stream_id not in self.rings:
+                self.rings[stream_id] = EncodedFrameRing(self.max_bytes_per_stream)
+            self.ring_users[stream_id] = self.ring_users.get(stream_id, 0) + 1
+            return self.rings[stream_id]
+
+    def release_ring(self, stream_id):
+        """Drop a stopped stream's buffer once its pending clips are written"""
+        self.jobs.put(('release', stream_id, time.time() + self.seconds_after, None))
+
+    def request_clip(self, stream_id, event_time, name):
+        """Schedule a clip around event_time and return the path it will be written to"""
+        filename = f"{name}.mp4"
+        self.jobs.put(('clip', stream_id, event_time, filename))
+        return filename
+
+    def run_writer_loop(self):
+        while True:
+            kind, stream_id, event_time, filename = self.jobs.get()
+
+            # Jobs are queued in event order and share the same post-event delay
+            due = event_time + (self.seconds_after if kind == 'clip' else 0)
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            if kind == 'release':
+                with self.lock:
+                    # A stream restarted under the same id within the delay keeps the ring
+                    self.ring_users[stream_id] = self.ring_users.get(stream_id, 1) - 1
+                    if self.ring_users[stream_id] <= 0:
+                        self.rings.pop(stream_id, None)
+                        self.ring_users.pop(stream_id, None)
+                continue
+
+            started = time.perf_counter()
+            try:
+                self.write_clip(stream_id, event_time, filename)
+                self.clips_written += 1
+                if self.metrics:
+                    self.metrics.observe('clip_write', time.perf_counter() - started, stream_id)
+            except Exception as e:
+                self.clips_failed += 1
+                log.error("❌ [%s] Clip error: %s", stream_id, e)
+
+    def write_clip(self, stream_id, event_time, filename):
+        ring = self.rings.get(stream_id)
+        frames = ring.snapshot(event_time - self.seconds_before, event_time + self.seconds_after) if ring else []
+        if len(frames) < 2:
+            raise RuntimeError("Not enough buffered frames for a clip")
+
+        # Write at the rate the frames were actually buffered so the clip plays in real time
+        duration = frames[-1][0] - frames[0][0]
+        fps = max(1.0, (len(frames) - 1) / duration) if duration > 0 else self.fps
+
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        path = os.path.join(self.folder, filename)
+        tmp_path = os.path.join(self.folder, f".{filename}")
+
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        try:
+            for _, jpeg in frames:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+        finally:
+            writer.release()
+
+        os.replace(tmp_path, path)
+        log.info("🎞️ [%s] Clip saved: %s (%d frames, %.1fs)", stream_id, filename, len(frames), duration)
+
+    def get_stats(self):
+        with self.lock:
+            rings = {stream_id: ring.get_stats() for stream_id, ring in self.rings.items()}
+        return {
+            'pending_jobs': self.jobs.qsize(),
+            'clips_written': self.clips_written,
+            'clips_failed': self.clips_failed,
+            'buffered_bytes': sum(ring['bytes'] for ring in rings.values()),
+            'rings': rings
+        }
@@ -0,0 +1,469 @@
+import os
+import time
+import uuid
+import socket
+import threading
+
+from logging_setup import get_logger
+from metrics import render_families
+from motion_gate import build_roi_mask
+from stream_manager import CLIENT_FRAME_OUTCOMES, CLIENT_STAGES, RENDER_MODES
+from tiling import validate_tiling
+
+
+log = get_logger('cluster')
+
+# A worker (or leader) that misses heartbeats for this long is considered gone
+WORKER_TTL = 10.0
+LEADER_TTL = 10.0
+# Viewer keys are refreshed by their web node; a dead node's viewers expire
+VIEWER_TTL = 30.0
+# Seconds before a worker retries a camera that failed to open or crashed
+RETRY_DELAY = 10.0
+
+CONTROL_TOPIC = 'control'
+ALERTS_TOPIC = 'alerts'
+# Dashboard frame timings, forwarded to the worker running the stream
+CLIENT_TIMING_TOPIC = 'client_timing'
+CLIENT_TIMING_KEYS = tuple(key for _, key in CLIENT_STAGES) + CLIENT_FRAME_OUTCOMES
+
+# Stream status fields a worker publishes in its heartbeat
+STATUS_FIELDS = ('stream_id', 'source', 'is_monitoring', 'frame_count', 'detection_count', 'started_at',
+                 'stopped_at', 'error', 'render_mode', 'live', 'frames_dropped', 'skip_stride', 'avg_inference_ms')
+
+
+def plan_assignments(cameras, assignments, workers):
+    """Camera -> worker plan and the (camera, old worker, new worker) moves it needs
+
+    Cameras stay on their worker while it is alive. New cameras and those
+    whose worker stopped heartbeating go to the live worker with the most
+    free capacity; when every worker is full they stay unassigned.
+    """
+    plan = {camera_id: worker_id for camera_id, worker_id in assignments.items()
+            if camera_id in cameras and worker_id in workers}
+    load = {worker_id: 0 for worker_id in workers}
+    for worker_id in plan.values():
+        load[worker_id] += 1
+
+    moves = []
+    for camera_id in sorted(cameras):
+        if camera_id in plan:
+            continue
+        free = [(workers[w].get('capacity', 1) - load[w], w) for w in sorted(workers)]
+        free = [(room, w) for room, w in free if room > 0]
+        if not free:
+            break
+        worker_id = max(free, key=lambda item: item[0])[1]
+        plan[camera_id] = worker_id
+        load[worker_id] += 1
+        moves.append((camera_id, assignments.get(camera_id), worker_id))
+    return plan, moves
+
+
+def strip_prefix(items, prefix):
+    return {key[len(prefix):]: value for key, value in items.items()}
+
+
+def bus_emitter(bus, emit):
+    """Socket.IO emit that also publishes emergency alerts on the bus for other consumers"""
+    def emit_and_publish(event, data=None, **kwargs):
+        emit(event, data, **kwargs)
+        if event == 'emergency_alert' and isinstance(data, dict):
+            bus.publish(ALERTS_TOPIC, data)
+    return emit_and_publish
+
+
+class ClusterRegistry:
+    """Cluster state kept on the message bus
+
+    camera:<id> holds what to run, assignment:<id> the worker running it,
+    worker:<id> each worker's heartbeat and viewer:<id>:<sid> who is
+    watching. Changes are announced on the control topic.
+    """
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def cameras(self):
+        return strip_prefix(self.bus.scan('camera:'), 'camera:')
+
+    def assignments(self):
+        return strip_prefix(self.bus.scan('assignment:'), 'assignment:')
+
+    def workers(self):
+        return strip_prefix(self.bus.scan('worker:'), 'worker:')
+
+    def viewers(self):
+        """{stream_id: [sid]} of every live viewer"""
+        viewers = {}
+        for key in self.bus.scan('viewer:'):
+            stream_id, _, sid = key[len('viewer:'):].rpartition(':')
+            viewers.setdefault(stream_id, []).append(sid)
+        return viewers
+
+    def put_camera(self, stream_id, spec):
+        self.bus.put(f"camera:{stream_id}", spec)
+        self.notify()
+
+    def remove_camera(self, stream_id):
+        self.bus.delete(f"camera:{stream_id}")
+        self.bus.delete(f"assignment:{stream_id}")
+        self.notify()
+
+    def put_viewer(self, stream_id, sid):
+        self.bus.put(f"viewer:{stream_id}:{sid}", 1, ttl=VIEWER_TTL)
+
+    def remove_viewer(self, stream_id, sid):
+        self.bus.delete(f"viewer:{stream_id}:{sid}")
+
+    def notify(self):
+        self.bus.publish(CONTROL_TOPIC, {'type': 'changed', 'at': time.time()})
+
+
+class ClusterStream:
+    """A web node's handle on a camera running on some detector worker"""
+
+    def __init__(self, registry, stream_id, spec, worker_id=None, status=None):
+        self.registry = registry
+        self.stream_id = stream_id
+        self.spec = spec
+        self.worker_id = worker_id
+        self.status = status
+
+    @property
+    def render_mode(self):
+        return self.spec['render_mode']
+
+    def set_render_mode(self, render_mode):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode}")
+        self.spec['render_mode'] = render_mode
+        self.registry.put_camera(self.stream_id, self.spec)
+
+    def get_status(self):
+        status = self.status or {
+            'stream_id': self.stream_id,
+            'source': self.spec['source'],
+            'is_monitoring': False,
+            'render_mode': self.render_mode,
+            'error': None
+        }
+        return dict(status, worker_id=self.worker_id, state='running' if self.status else 'pending')
+
+
+class ClusterStreams:
+    """Stand-in for StreamManager on web nodes: streams run on detector workers
+
+    Starting or stopping a stream only edits the registry; the detector
+    workers pick the change up. Viewers are registered on the bus so the
+    worker running a stream knows whom to send frames to.
+    """
+
+    def __init__(self, bus, refresh_interval=10.0):
+        self.bus = bus
+        self.registry = ClusterRegistry(bus)
+        self.refresh_interval = refresh_interval
+        self.viewers = {}  # stream_id -> {sid}, on this web node
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run_refresh_loop, daemon=True)
+            self.thread.start()
+
+    def run_refresh_loop(self):
+        """Keep this node's viewer keys alive; they expire if the node dies"""
+        while True:
+            time.sleep(self.refresh_interval)
+            with self.lock:
+                viewers = [(stream_id, sid) for stream_id, sids in self.viewers.items() for sid in sids]
+            try:
+                for stream_id, sid in viewers:
+                    self.registry.put_viewer(stream_id, sid)
+            except Exception as e:
+                log.warning("⚠️ Could not refresh viewers: %s", e)
+
+    def start_stream(self, source, stream_id=None, render_mode='server', roi=None, upload=None, tiling=None,
+                     latency_target_ms=None):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode}")
+        build_roi_mask(roi, (160, 160))
+        validate_tiling(tiling)
+        if latency_target_ms is not None and latency_target_ms <= 0:
+            raise ValueError("latency_target_ms must be positive")
+        if upload is not None:
+            raise ValueError("A file can only be monitored by the cluster once its upload is complete")
+
+        stream_id = stream_id or f"cam-{uuid.uuid4().hex[:8]}"
+        spec = {
+            'source': source,
+            'render_mode': render_mode,
+            'roi': roi,
+            'tiling': tiling,
+            'latency_target_ms': latency_target_ms,
+            'requested_at': time.time()
+        }
+        if not self.bus.put_if_absent(f"camera:{stream_id}", spec):
+            raise ValueError(f"Stream {stream_id} is already running")
+        self.registry.notify()
+        log.info("▶️ Stream %s queued for the cluster", stream_id)
+        return ClusterStream(self.registry, stream_id, spec)
+
+    def stop_stream(self, stream_id):
+        if self.bus.get(f"camera:{stream_id}") is None:
+            return False
+        self.registry.remove_camera(stream_id)
+        return True
+
+    def get_stream(self, stream_id):
+        spec = self.bus.get(f"camera:{stream_id}")
+        if spec is None:
+            return None
+        worker_id = self.bus.get(f"assignment:{stream_id}")
+        worker = self.bus.get(f"worker:{worker_id}") if worker_id else None
+        status = (worker or {}).get('streams', {}).get(stream_id)
+        return ClusterStream(self.registry, stream_id, spec, worker_id, status)
+
+    def list_streams(self):
+        cameras = self.registry.cameras()
+        assignments = self.registry.assignments()
+        workers = self.registry.workers()
+        return [
+            ClusterStream(
+                self.registry, stream_id, spec, assignments.get(stream_id),
+                workers.get(assignments.get(stream_id), {}).get('streams', {}).get(stream_id)
+            ).get_status()
+            for stream_id, spec in sorted(cameras.items())
+        ]
+
+    def add_viewer(self, stream_id, sid):
+        with self.lock:
+            self.viewers.setdefault(stream_id, set()).add(sid)
+        self.registry.put_viewer(stream_id, sid)
+        self.registry.notify()
+
+    def remove_viewer(self, stream_id, sid):
+        with self.lock:
+            self.viewers.get(stream_id, set()).discard(sid)
+        self.registry.remove_viewer(stream_id, sid)
+
+    def remove_client(self, sid):
+        with self.lock:
+            stream_ids = [stream_id for stream_id, sids in self.viewers.items() if sid in sids]
+            for stream_id in stream_ids:
+                self.viewers[stream_id].discard(sid)
+        for stream_id in stream_ids:
+            self.registry.remove_viewer(stream_id, sid)
+
+    def record_client_timing(self, stream_id, report):
+        """Pass a dashboard's timing report on to whichever worker runs the stream"""
+        self.bus.publish(CLIENT_TIMING_TOPIC, {
+            'stream_id': stream_id,
+            'report': {key: report[key] for key in CLIENT_TIMING_KEYS if key in report}
+        })
+
+    def render_metrics(self):
+        """Cluster-wide counters from worker heartbeats; stage histograms are on each worker's /metrics"""
+        cameras = self.registry.cameras()
+        assignments = self.registry.assignments()
+        workers = self.registry.workers()
+        statuses = [status for worker in workers.values() for status in worker.get('streams', {}).values()
+                    if status.get('is_monitoring')]
+        return '\n'.join(render_families([
+            ('sos_cluster_workers', 'gauge', 'Detector workers with a live heartbeat', [({}, len(workers))]),
+            ('sos_cluster_cameras', 'gauge', 'Cameras registered with the cluster', [({}, len(cameras))]),
+            ('sos_cluster_unassigned_cameras', 'gauge', 'Cameras no live worker has taken',
+             [({}, len(set(cameras) - {c for c, w in assignments.items() if w in workers}))]),
+            ('sos_streams_active', 'gauge', 'Streams currently being monitored, per worker',
+             [({'worker': worker_id}, sum(1 for status in worker.get('streams', {}).values()
+                                          if status.get('is_monitoring')))
+              for worker_id, worker in sorted(workers.items())]),
+            ('sos_frames_total', 'counter', 'Source frames reached by the detection loop',
+             [({'stream': status['stream_id']}, status.get('frame_count')) for status in statuses]),
+            ('sos_detections_total', 'counter', 'Detections above threshold',
+             [({'stream': status['stream_id']}, status.get('detection_count')) for status in statuses])
+        ])) + '\n'
+
+    def get_cluster_stats(self):
+        cameras = self.registry.cameras()
+        assignments = self.registry.assignments()
+        workers = self.registry.workers()
+        now = time.time()
+        return {
+            'bus': self.bus.url.split('@')[-1],
+            'leader': self.bus.get('leader'),
+            'cameras': len(cameras),
+            'unassigned': sorted(set(cameras) - {c for c, w in assignments.items() if w in workers}),
+            'workers': {
+                worker_id: {
+                    'host': worker.get('host'),
+                    'capacity': worker.get('capacity'),
+                    'streams': len(worker.get('streams', {})),
+                    'heartbeat_age_s': round(now - worker.get('heartbeat_at', now), 1)
+                }
+                for worker_id, worker in sorted(workers.items())
+            }
+        }
+
+
+class DetectorWorker:
+    """Runs the cameras the cluster assigns to this process
+
+    Every interval the worker publishes a heartbeat (with its streams'
+    status), takes part in leader election and reconciles its streams
+    with the registry: assigned cameras are started, cameras moved
+    elsewhere are stopped and viewers are synced into the broadcaster.
+    The leader assigns new cameras and those of workers whose heartbeat
+    expired, so a dead worker's cameras restart elsewhere within about
+    WORKER_TTL seconds.
+    """
+
+    def __init__(self, bus, stream_manager, worker_id=None, capacity=None, interval=2.0):
+        self.bus = bus
+        self.registry = ClusterRegistry(bus)
+        self.stream_manager = stream_manager
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.capacity = capacity or stream_manager.max_streams
+        self.interval = interval
+
+        self.is_running = False
+        self.is_leader = False
+        self.unassigned = 0
+        self.started_at = time.time()
+        self.retry_at = {}  # stream_id -> time a failed stream may be restarted
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.is_running = True
+        self.bus.subscribe(CONTROL_TOPIC, lambda message: self.wake_event.set())
+        # Every worker hears every report; the manager ignores streams it does not run
+        self.bus.subscribe(CLIENT_TIMING_TOPIC, lambda message: self.stream_manager.record_client_timing(
+            message['stream_id'], message['report']))
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        log.info("🛰️ Detector worker %s joined %s (capacity %d)", self.worker_id, self.bus.url.split('@')[-1],
+                 self.capacity)
+
+    def stop(self):
+        """Stop every stream and leave the cluster so the leader reassigns them now"""
+        self.is_running = False
+        self.wake_event.set()
+        self.stream_manager.stop_all()
+        self.bus.delete(f"worker:{self.worker_id}")
+        if self.is_leader and self.bus.get('leader') == self.worker_id:
+            self.bus.delete('leader')
+        self.registry.notify()
+        log.info("👋 Detector worker %s left the cluster", self.worker_id)
+
+    def run(self):
+        while self.is_running:
+            try:
+                self.heartbeat()
+                self.coordinate()
+                self.reconcile()
+            except Exception as e:
+                log.exception("❌ Cluster round failed on %s: %s", self.worker_id, e)
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+
+    def heartbeat(self):
+        streams = {
+            status['stream_id']: {field: status.get(field) for field in STATUS_FIELDS}
+            for status in self.stream_manager.list_streams()
+        }
+        self.bus.put(f"worker:{self.worker_id}", {
+            'worker_id': self.worker_id,
+            'host': socket.gethostname(),
+            'capacity': self.capacity,
+            'started_at': self.started_at,
+            'heartbeat_at': time.time(),
+            'streams': streams
+        }, ttl=WORKER_TTL)
+
+    def coordinate(self):
+        """Hold or take the leader key; the leader assigns cameras"""
+        leader = self.bus.get('leader')
+        if leader == self.worker_id:
+            self.bus.put('leader', self.worker_id, ttl=LEADER_TTL)
+        elif leader is None and self.bus.put_if_absent('leader', self.worker_id, ttl=LEADER_TTL):
+            log.info("👑 %s is now the cluster leader", self.worker_id)
+        else:
+            self.is_leader = False
+            return
+        self.is_leader = True
+
+        cameras = self.registry.cameras()
+        assignments = self.registry.assignments()
+        plan, moves = plan_assignments(cameras, assignments, self.registry.workers())
+        for camera_id, old_worker, new_worker in moves:
+            self.bus.put(f"assignment:{camera_id}", new_worker)
+            if old_worker:
+                log.warning("🔀 Camera %s moved from %s to %s", camera_id, old_worker, new_worker)
+            else:
+                log.info("📌 Camera %s assigned to %s", camera_id, new_worker)
+        for camera_id in set(assignments) - set(cameras):
+            self.bus.delete(f"assignment:{camera_id}")
+        unassigned = len(cameras) - len(plan)
+        if unassigned and unassigned != self.unassigned:
+            log.warning("⚠️ %d camera(s) waiting for a worker with free capacity", unassigned)
+        self.unassigned = unassigned
+        if moves:
+            self.registry.notify()
+
+    def reconcile(self):
+        cameras = self.registry.cameras()
+        assignments = self.registry.assignments()
+        viewers = self.registry.viewers()
+        manager = self.stream_manager
+        now = time.time()
+
+        mine = {stream_id for stream_id, worker_id in assignments.items()
+                if worker_id == self.worker_id and stream_id in cameras}
+
+        for stream_id in sorted(mine):
+            spec = cameras[stream_id]
+            stream = manager.get_stream(stream_id)
+
+            if stream is not None and not stream.is_monitoring and not stream.error \
+                    and not (stream.reader and stream.reader.is_live):
+                # A file that played to the end is done; the camera leaves the cluster
+                log.info("🏁 Stream %s finished on %s", stream_id, self.worker_id)
+                manager.remove_stream(stream_id)
+                self.registry.remove_camera(stream_id)
+                continue
+
+            if stream is None or not stream.is_monitoring:
+                if now < self.retry_at.get(stream_id, 0):
+                    continue
+                self.retry_at[stream_id] = now + RETRY_DELAY
+                try:
+                    stream = manager.start_stream(
+                        spec['source'], stream_id, spec['render_mode'], spec.get('roi'),
+                        tiling=spec.get('tiling'), latency_target_ms=spec.get('latency_target_ms')
+                    )
+                except ValueError as e:
+                    log.warning("⚠️ Could not start %s on %s: %s", stream_id, self.worker_id, e)
+                    continue
+            elif stream.render_mode != spec['render_mode']:
+                stream.set_render_mode(spec['render_mode'])
+
+            manager.broadcaster.set_viewers(stream_id, viewers.get(stream_id, ()))
+
+        for stream_id, stream in list(manager.streams.items()):
+            if stream_id in mine:
+                continue
+            if stream.is_monitoring:
+                log.info("↪️ Handing off %s from %s", stream_id, self.worker_id)
+            manager.remove_stream(stream_id)
+            manager.broadcaster.set_viewers(stream_id, ())
+            self.retry_at.pop(stream_id, None)
+
+    def get_stats(self):
+        return {
+            'worker_id': self.worker_id,
+            'leader': self.is_leader,
+            'capacity': self.capacity,
+            'streams': sum(1 for stream in list(self.stream_manager.streams.values()) if stream.is_monitoring)
+        }
@@ -0,0 +1,175 @@
+import os
+import json
+import threading
+
+from logging_setup import get_logger
+
+
+log = get_logger('config')
+
+# Tunables of EmergencyDetectionSystem; each becomes an attribute of the same name
+DEFAULT_CONFIG = {
+    # Model
+    'yolo_model_path': r"C:\Users\MG\Downloads\best (1).pt",
+    'detector_backend': 'torch',
+    'int8_quantization': False,
+    'calibration_source': None,
+    'model_cache_folder': './model_cache',
+
+    # Detection thresholds - SET TO 76% (WORKING VALUES)
+    'severe_confidence': 0.76,
+    'moderate_confidence': 0.76,
+    'fall_confidence': 0.76,
+
+    # Google Gemini API
+    'google_api_key': '',
+    'gemini_model': 'gemini-2.0-flash-exp',
+
+    # Incident tracking - one alert per track, confirmed after k of n frames
+    'track_iou_threshold': 0.3,
+    'track_confirm_hits': 3,
+    'track_confirm_window': 5,
+    'track_max_age': 10,
+
+    # Motion gate - skip inference on static scenes, full pass at least every heartbeat seconds
+    'motion_gating': True,
+    'motion_pixel_threshold': 25,
+    'motion_min_area': 0.002,
+    'motion_heartbeat': 2.0,
+
+    # Tiled inference for high-resolution cameras (per camera via start_stream tiling=)
+    'tiling': False,
+    'tile_size': 960,
+    'tile_overlap': 0.2,
+    'tile_max': 6,
+    'tile_min_width': 1920,
+    'tile_seed_confidence': 0.25,
+    'tile_nms_iou': 0.5,
+
+    # Adaptive quality - lower stream FPS, JPEG quality, display size, then inference rate to hold the target
+    'adaptive_quality': True,
+    'latency_target_ms': 500,
+
+    # Alert retention (days / max stored alerts, None to keep everything)
+    'alert_retention_days': 30,
+    'alert_max_stored': None,
+    'alert_cooldown': 5
+}
+
+# Types for keys whose default is None
+OPTIONAL_TYPES = {'calibration_source': str, 'alert_max_stored': int}
+
+# Environment names that predate the SOS_<KEY> convention
+ENV_ALIASES = {'int8_quantization': 'SOS_INT8', 'motion_gating': 'SOS_MOTION_GATE'}
+
+# Changing these needs the detector reloaded; everything else applies on the next frame
+MODEL_KEYS = ('yolo_model_path', 'detector_backend', 'int8_quantization', 'calibration_source', 'model_cache_folder')
+GEMINI_KEYS = ('google_api_key', 'gemini_model')
+SECRET_KEYS = ('google_api_key',)
+
+
+def coerce(key, value):
+    """Convert a file or environment value to the type of the key's default"""
+    default = DEFAULT_CONFIG[key]
+    if value is None:
+        return None
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on') if isinstance(value, str) else bool(value)
+    kind = type(default) if default is not None else OPTIONAL_TYPES.get(key, str)
+    if isinstance(value, (list, dict)):
+        # Lists and objects from the JSON file; str() would happily accept them
+        raise ValueError(f"{key} must be {kind.__name__}, got {type(value).__name__}")
+    try:
+        if kind is int:
+            # int() would silently truncate 0.9 to 0
+            number = float(value)
+            if not number.is_integer():
+                raise ValueError(f"{key} must be a whole number, got {value}")
+            return int(number)
+        return kind(value)
+    except TypeError:
+        raise ValueError(f"{key} must be {kind.__name__}, got {type(value).__name__}") from None
+
+
+def load_config(path=None):
+    """Defaults, overridden by the JSON file at path (if it exists), overridden by SOS_<KEY> variables"""
+    config = dict(DEFAULT_CONFIG)
+
+    if path and os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} must hold a JSON object")
+        for key, value in data.items():
+            if key not in DEFAULT_CONFIG:
+                log.warning("⚠️ Unknown config key in %s: %s", path, key)
+                continue
+            config[key] = coerce(key, value)
+
+    for key in DEFAULT_CONFIG:
+        env_name = ENV_ALIASES.get(key, f"SOS_{key.upper()}")
+        if env_name in os.environ:
+            config[key] = coerce(key, os.environ[env_name])
+
+    validate(config)
+    return config
+
+
+def validate(config):
+    """Reject values the pipeline cannot run with"""
+    if not 0 < config['track_iou_threshold'] <= 1:
+        raise ValueError(f"track_iou_threshold must be in (0, 1], got {config['track_iou_threshold']}")
+
+
+def public_config(config):
+    return {key: ('***' if key in SECRET_KEYS and value else value) for key, value in config.items()}
+
+
+class ConfigWatcher:
+    """Polls the config file and calls on_change(config) whenever it is modified
+
+    A file that fails to parse is logged and ignored, so the running
+    configuration is only ever replaced by a valid one.
+    """
+
+    def __init__(self, path, on_change, interval=2.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.mtime = self.get_mtime()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def get_mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            mtime = self.get_mtime()
+            if mtime == self.mtime:
+                continue
+            self.mtime = mtime
+            try:
+                config = load_config(self.path)
+            except (OSError, ValueError) as e:
+                log.error("❌ Config reload failed, keeping current settings: %s", e)
+                continue
+            except Exception as e:
+                # Whatever the file holds, the watcher must outlive it
+                log.exception("❌ Config reload failed, keeping current settings: %s", e)
+                continue
+            log.info("🔄 Config file %s changed, applying", self.path)
+            try:
+                self.on_change(config)
+            except Exception as e:
+                log.exception("❌ Applying config failed: %s", e)
@@ -1,31 +1,90 @@
 import os
 import time
-import json
+import threading
 import cv2
 import numpy as np
 from PIL import Image
-from ultralytics import YOLO
-import google.generativeai as genai
+from postprocess import build_threshold_table
+from detector_backends import load_detector
+from alert_store import AlertStore
+from logging_setup import get_logger
+from config import load_config, GEMINI_KEYS, MODEL_KEYS
+
+
+log = get_logger('detection')
+
+
+def model_arguments(config):
+    """Arguments for detector_backends.load_detector (picklable for worker processes)"""
+    return {
+        'weights_path': config['yolo_model_path'],
+        'backend': config['detector_backend'],
+        'int8': config['int8_quantization'],
+        'calibration_source': config['calibration_source'],
+        'cache_folder': config['model_cache_folder']
+    }
+
+
+class AnalysisUnavailable(RuntimeError):
+    """No LLM analysis came back; the caller falls back and must not cache the fallback"""
+
+
+class GeminiAnalyst:
+    """Gemini client with the incident prompts, usable without a detection system"""
+
+    PROMPTS = {
+        'severe': "Analyze this severe emergency incident. Provide a brief 2-sentence report for first responders focusing on immediate hazards and required response level.",
+        'moderate': "Analyze this moderate emergency incident. Provide a brief 2-sentence report for first responders focusing on the situation and recommended response.",
+        'fall': "Analyze this fall incident. Provide a brief 2-sentence report for first responders focusing on the person's condition and immediate medical needs."
+    }
+
+    def __init__(self, api_key, model_name):
+        self.model = None
+        try:
+            if api_key and api_key != "YOUR_GEMINI_API_KEY_HERE":
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                self.model = genai.GenerativeModel(model_name)
+                log.info("✅ Gemini AI initialized successfully")
+            else:
+                log.warning("❌ Gemini API key not configured")
+        except Exception as e:
+            log.error("❌ Failed to initialize Gemini: %s", e)
+            self.model = None
+
+    @property
+    def available(self):
+        return self.model is not None
+
+    def analyze(self, image_pil, event_type):
+        """Analysis text for the incident image; raises AnalysisUnavailable instead of falling back"""
+        if not self.model:
+            raise AnalysisUnavailable("Gemini is not configured")
+
+        prompt = self.PROMPTS.get(event_type.lower(), self.PROMPTS['fall'])
+        try:
+            response = self.model.generate_content([prompt, image_pil])
+            text = response.text.strip() if response and response.text else ''
+        except Exception as e:
+            raise AnalysisUnavailable(f"Gemini error: {e}") from e
+        if not text:
+            raise AnalysisUnavailable("Gemini returned an empty response")
+        return text
+
 
 class EmergencyDetectionSystem:
-    def __init__(self):
-        # Configuration
-        self.yolo_model_path = r"C:\Users\MG\Downloads\best (1).pt"
+    def __init__(self, alert_store=None, load_model=True, config=None):
+        # Tunables (model, thresholds, Gemini, tracking, motion gate, retention)
+        # come from config.py defaults, a config file and SOS_* variables
+        self.config = dict(config or load_config())
+        for key, value in self.config.items():
+            setattr(self, key, value)
         self.output_folder = "./alerts"
         
-        # Detection thresholds - SET TO 76% (WORKING VALUES)
-        self.severe_confidence = 0.76
-        self.moderate_confidence = 0.76
-        self.fall_confidence = 0.76
-        
-        # Google Gemini API
-        self.google_api_key = ""
-        self.gemini_model = "gemini-2.0-flash-exp"
-        
         # System settings
-        self.alert_cooldown = 5
-        self.alert_count = 0
-        self.last_alert_time = {}
+        self.alert_lock = threading.Lock()
+        self._threshold_table = None
+        self._threshold_key = None
         
         # Fallback messages
         self.severe_fallback = "Severe incident detected - immediate emergency response required"
@@ -34,59 +93,90 @@ class EmergencyDetectionSystem:
         
         os.makedirs(self.output_folder, exist_ok=True)
         
-        # Initialize Gemini
-        self.use_gemini = True
-        try:
-            if self.google_api_key and self.google_api_key != "YOUR_GEMINI_API_KEY_HERE":
-                genai.configure(api_key=self.google_api_key)
-                self.model = genai.GenerativeModel(self.gemini_model)
-                print("✅ Gemini AI initialized successfully")
-            else:
-                print("❌ Gemini API key not configured")
-                self.use_gemini = False
-                self.model = None
-        except Exception as e:
-            print(f"❌ Failed to initialize Gemini: {e}")
-            self.use_gemini = False
-            self.model = None
-        
-        # Initialize YOLO
+        # Indexed alert store; the alert count carries on across restarts
+        self.alert_store = alert_store or AlertStore(self.output_folder)
+        self.alert_count = self.alert_store.last_alert_number()
+        self.alert_store.start_retention_worker(self.alert_retention_days, self.alert_max_stored)
+        
+        self.init_gemini()
+        
+        # Initialize YOLO (skipped when inference runs in worker processes,
+        # which load their own copy and report the class names back)
+        self.yolo = None
+        self.names = {}
+        self.load_time = None
+        self.warmup_time = None
+        if load_model:
+            self.load_model()
+        
+        log.info("🎯 Thresholds set - Severe: %s, Moderate: %s, Fall: %s",
+                 self.severe_confidence, self.moderate_confidence, self.fall_confidence)
+        log.info("🚨 Emergency Detection System initialized successfully!")
+    
+    def init_gemini(self):
+        """Configure Gemini; the SDK is only imported once a key is set"""
+        self.gemini = GeminiAnalyst(self.google_api_key, self.gemini_model)
+        self.use_gemini = self.gemini.available
+    
+    def load_model(self):
+        """Load and warm up the detector, then swap it in for the running streams"""
         try:
-            print(f"Loading YOLO model from: {self.yolo_model_path}")
-            self.yolo = YOLO(self.yolo_model_path)
-            print(f"✅ YOLO model loaded. Classes: {list(self.yolo.names.values())}")
+            log.info("Loading YOLO model from: %s (backend: %s%s)", self.yolo_model_path,
+                     self.detector_backend, ', int8' if self.int8_quantization else '')
+            started = time.time()
+            yolo = load_detector(**self.get_model_config())
+            self.load_time = time.time() - started
+            self.warm_up(yolo)
+            # Single attribute swaps, so a batch in flight finishes on the old model
+            self.names = yolo.names
+            self.yolo = yolo
+            log.info("✅ YOLO model loaded in %.1fs (warm-up %.0fms). Classes: %s",
+                     self.load_time, self.warmup_time * 1000, list(self.names.values()))
         except Exception as e:
-            print(f"❌ Failed to load YOLO model: {e}")
+            log.error("❌ Failed to load YOLO model: %s", e)
             raise e
+    
+    def warm_up(self, yolo, size=640):
+        """One throwaway inference so the first real frame does not pay for lazy initialisation"""
+        started = time.time()
+        yolo([np.zeros((size, size, 3), dtype=np.uint8)], verbose=False)
+        self.warmup_time = time.time() - started
+    
+    def apply_config(self, config):
+        """Apply a reloaded config in place and return the keys that changed"""
+        changed = {key for key, value in config.items() if getattr(self, key, None) != value}
+        for key in changed:
+            setattr(self, key, config[key])
+        self.config = dict(config)
+        
+        if changed & set(GEMINI_KEYS):
+            self.init_gemini()
+        if changed & set(MODEL_KEYS):
+            if self.yolo is not None:
+                self.load_model()
+            else:
+                log.warning("⚠️ Model settings changed; restart to reload the inference workers")
+        if changed & {'alert_retention_days', 'alert_max_stored'}:
+            log.warning("⚠️ Retention settings take effect on restart")
         
-        # Initialize cooldown tracking
-        for class_name in ['severe', 'moderate', 'fall']:
-            self.last_alert_time[class_name] = 0
-        
-        # DEBUG: Print actual threshold values
-        print(f"🎯 Thresholds set - Severe: {self.severe_confidence}, Moderate: {self.moderate_confidence}, Fall: {self.fall_confidence}")
-        print("🚨 Emergency Detection System initialized successfully!")
+        log.info("🔄 Config applied: %s", ', '.join(sorted(changed)) or 'no changes')
+        return changed
+    
+    def get_model_config(self):
+        return model_arguments(self.config)
+    
+    def request_gemini_analysis(self, image_pil, event_type):
+        """Get emergency analysis from Google Gemini, raising AnalysisUnavailable instead of falling back"""
+        return self.gemini.analyze(image_pil, event_type)
     
     def get_gemini_analysis(self, image_pil, event_type):
-        """Get emergency analysis from Google Gemini"""
-        if not self.use_gemini or not self.model:
-            return self.get_fallback_message(event_type)
-        
+        """Get emergency analysis from Google Gemini, or the fallback message"""
         try:
-            if event_type.lower() == "severe":
-                prompt = "Analyze this severe emergency incident. Provide a brief 2-sentence report for first responders focusing on immediate hazards and required response level."
-            elif event_type.lower() == "moderate":
-                prompt = "Analyze this moderate emergency incident. Provide a brief 2-sentence report for first responders focusing on the situation and recommended response."
-            else:  # fall
-                prompt = "Analyze this fall incident. Provide a brief 2-sentence report for first responders focusing on the person's condition and immediate medical needs."
-            
-            response = self.model.generate_content([prompt, image_pil])
-            if response and response.text:
-                return response.text.strip()
-        except Exception as e:
-            print(f"❌ Gemini error: {str(e)}")
-        
-        return self.get_fallback_message(event_type)
+            return self.request_gemini_analysis(image_pil, event_type)
+        except AnalysisUnavailable as e:
+            if self.use_gemini:
+                log.error("❌ %s", e)
+            return self.get_fallback_message(event_type)
     
     def get_fallback_message(self, event_type):
         """Get appropriate fallback message"""
@@ -110,58 +200,34 @@ class EmergencyDetectionSystem:
         elif event_type.lower() == "fall":
             threshold = self.fall_confidence
         
-        # DEBUG: Print threshold being returned
-        print(f"🎯 Threshold for {event_type}: {threshold}")
         return threshold
     
-    def should_send_alert(self, event_type):
-        """Check alert cooldown per incident type"""
-        current_time = time.time()
-        
-        if event_type not in self.last_alert_time:
-            self.last_alert_time[event_type] = 0
-        
-        time_since_last = current_time - self.last_alert_time[event_type]
-        
-        if time_since_last >= self.alert_cooldown:
-            self.last_alert_time[event_type] = current_time
-            print(f"✅ Alert approved for {event_type}")
-            return True
-        else:
-            remaining = self.alert_cooldown - time_since_last
-            print(f"❌ Alert blocked for {event_type} - {remaining:.1f}s remaining")
-            return False
+    def get_threshold_table(self):
+        """Per-class-id threshold lookup table, rebuilt only when thresholds change"""
+        key = (self.severe_confidence, self.moderate_confidence, self.fall_confidence, id(self.names))
+        if key != self._threshold_key:
+            self._threshold_table = build_threshold_table(self.names, self.get_confidence_threshold)
+            self._threshold_key = key
+        return self._threshold_table
     
-    def save_emergency_alert(self, event_type, confidence, gemini_analysis, image_bgr):
+    def save_emergency_alert(self, event_type, confidence, gemini_analysis, image_bgr,
+                             stream_id=None, track_id=None, clip_file=None):
         """Save comprehensive emergency alert"""
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        self.alert_count += 1
-        
-        # Save evidence image
-        image_filename = f"alert_{self.alert_count}_{event_type}_{timestamp}.jpg"
-        image_path = os.path.join(self.output_folder, image_filename)
-        cv2.imwrite(image_path, image_bgr, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        
-        # Create emergency report
-        emergency_report = {
-            "alert_id": f"EMRG-{self.alert_count:04d}",
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "incident_type": event_type.upper(),
-            "detection_confidence": round(confidence, 3),
-            "ai_analysis": gemini_analysis,
-            "evidence_file": image_filename,
-            "detection_threshold": self.get_confidence_threshold(event_type)
-        }
+        ok, evidence = cv2.imencode('.jpg', image_bgr, [cv2.IMWRITE_JPEG_QUALITY, 95])
         
-        # Save JSON report
-        report_filename = f"report_{self.alert_count}_{event_type}_{timestamp}.json"
-        report_path = os.path.join(self.output_folder, report_filename)
+        alert = self.alert_store.add_alert(
+            event_type, confidence, gemini_analysis,
+            evidence_jpeg=evidence.tobytes() if ok else None,
+            stream_id=stream_id,
+            track_id=track_id,
+            clip_file=clip_file,
+            threshold=self.get_confidence_threshold(event_type)
+        )
         
-        with open(report_path, "w") as f:
-            json.dump(emergency_report, f, indent=2)
+        # Alerts are saved from several workers at once
+        with self.alert_lock:
+            self.alert_count = max(self.alert_count, alert['id'])
         
-        print(f"🚨 EMERGENCY ALERT #{self.alert_count} SAVED")
-        print(f"TYPE: {event_type.upper()} | CONFIDENCE: {confidence:.1%}")
-        print(f"ANALYSIS: {gemini_analysis}")
+        log.info("💾 Alert #%d saved: %s %.1f%%", alert['id'], event_type.upper(), confidence * 100)
         
-        return emergency_report
+        return self.alert_store.export_report(alert)
@@ -0,0 +1,167 @@
+import os
+import glob
+import shutil
+import hashlib
+
+import cv2
+import numpy as np
+
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def weights_fingerprint(weights_path):
+    """Short content hash so a retrained checkpoint never reuses a stale export"""
+    digest = hashlib.sha256()
+    with open(weights_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def load_calibration_frames(source, count=100, imgsz=640):
+    """Sample frames evenly from a video file or a folder of images"""
+    frames = []
+
+    if os.path.isdir(source):
+        paths = sorted(
+            p for p in glob.glob(os.path.join(source, '*'))
+            if p.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))
+        )
+        step = max(1, len(paths) // count)
+        for path in paths[::step][:count]:
+            image = cv2.imread(path)
+            if image is not None:
+                frames.append(cv2.resize(image, (imgsz, imgsz)))
+    else:
+        cap = cv2.VideoCapture(source)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+        for index in np.linspace(0, max(0, total - 1), num=min(count, total), dtype=int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(cv2.resize(frame, (imgsz, imgsz)))
+        cap.release()
+
+    if not frames:
+        raise ValueError(f"No calibration frames found in {source}")
+    return frames
+
+
+def to_model_input(frame):
+    """Same preprocessing ultralytics applies to an already-640x640 BGR frame"""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def export_artifact(weights_path, backend, int8=False, calibration_source=None,
+                    cache_folder='./model_cache', imgsz=640):
+    """Export the checkpoint once and return the cached artifact path"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend} (expected one of {BACKENDS})")
+    if backend == 'torch':
+        return weights_path
+    if int8 and not calibration_source:
+        raise ValueError("INT8 quantization needs calibration frames (calibration_source)")
+
+    key = f"{weights_fingerprint(weights_path)}_{imgsz}"
+    cache_dir = os.path.join(cache_folder, key)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fp32_path = export_fp32(weights_path, backend, cache_dir, imgsz)
+    if not int8:
+        return fp32_path
+
+    if backend == 'onnx':
+        int8_path = os.path.join(cache_dir, 'model_int8.onnx')
+        if not os.path.exists(int8_path):
+            quantize_onnx(fp32_path, int8_path, load_calibration_frames(calibration_source, imgsz=imgsz))
+    else:
+        int8_path = os.path.join(cache_dir, 'model_int8_openvino_model')
+        if not os.path.exists(os.path.join(int8_path, 'model.xml')):
+            quantize_openvino(fp32_path, int8_path, load_calibration_frames(calibration_source, imgsz=imgsz))
+    return int8_path
+
+
+def export_fp32(weights_path, backend, cache_dir, imgsz):
+    from ultralytics import YOLO
+
+    if backend == 'onnx':
+        target = os.path.join(cache_dir, 'model.onnx')
+    else:
+        target = os.path.join(cache_dir, 'model_openvino_model')
+
+    if os.path.exists(target):
+        return target
+
+    print(f"📦 Exporting {weights_path} to {backend} (one-time, cached in {cache_dir})")
+    # Dynamic axes so the inference scheduler can send batches of any size
+    exported = YOLO(weights_path).export(format=backend, imgsz=imgsz, dynamic=True)
+    shutil.move(exported, target)
+    return target
+
+
+def quantize_onnx(fp32_path, int8_path, frames):
+    """Static INT8 quantization with onnxruntime, calibrated on real frames"""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+
+    input_name = onnx.load(fp32_path, load_external_data=False).graph.input[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.inputs = iter({input_name: to_model_input(frame)} for frame in frames)
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    print(f"🔧 Calibrating ONNX INT8 model on {len(frames)} frames")
+    quantize_static(
+        fp32_path, int8_path, FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+
+    # ultralytics reads class names from the model metadata; keep it
+    fp32_model = onnx.load(fp32_path)
+    int8_model = onnx.load(int8_path)
+    if not int8_model.metadata_props:
+        int8_model.metadata_props.extend(fp32_model.metadata_props)
+        onnx.save(int8_model, int8_path)
+
+
+def quantize_openvino(fp32_dir, int8_dir, frames):
+    """Post-training INT8 quantization of the OpenVINO IR with NNCF"""
+    import nncf
+    from openvino.runtime import Core, serialize
+
+    xml_path = glob.glob(os.path.join(fp32_dir, '*.xml'))[0]
+    model = Core().read_model(xml_path)
+
+    print(f"🔧 Calibrating OpenVINO INT8 model on {len(frames)} frames")
+    dataset = nncf.Dataset(frames, to_model_input)
+    quantized = nncf.quantize(model, dataset, preset=nncf.QuantizationPreset.MIXED, subset_size=len(frames))
+
+    os.makedirs(int8_dir, exist_ok=True)
+    serialize(quantized, os.path.join(int8_dir, 'model.xml'))
+    for metadata in glob.glob(os.path.join(fp32_dir, '*.yaml')):
+        shutil.copy(metadata, int8_dir)
+
+
+def load_detector(weights_path, backend='torch', int8=False, calibration_source=None,
+                  cache_folder='./model_cache', imgsz=640):
+    """Load a YOLO detector on the requested backend
+
+    Every backend is wrapped by ultralytics.YOLO, so callers get the same
+    Results objects (and therefore the same detection records) as the
+    PyTorch path.
+    """
+    from ultralytics import YOLO
+
+    artifact = export_artifact(weights_path, backend, int8, calibration_source, cache_folder, imgsz)
+    if backend == 'torch':
+        return YOLO(artifact)
+    return YOLO(artifact, task='detect')
@@ -0,0 +1,188 @@
+"""Detector worker for a horizontally scaled deployment
+
+    SOS_BUS_URL=redis://redis:6379/0 python detector_worker.py --capacity 16
+    SOS_BUS_URL=redis://redis:6379/0 SOS_ROLE=web python app.py
+
+Workers run cameras; web nodes (app.py with SOS_ROLE=web) serve the
+dashboard and API and hold no streams. Both sides share the message bus:
+it carries the camera registry, worker heartbeats and viewer lists, and
+doubles as flask_socketio's message queue so frames and alerts emitted
+here reach viewers on any web node. Cameras are assigned to the least
+loaded worker and move to another one when a worker stops heartbeating.
+
+Per-stream numbers live where the stream runs: workers push the
+dashboards' pipeline_stats and serve the stage histograms on
+--metrics-port, while a web node's /metrics has the cluster-wide view
+from the heartbeats. Dashboard frame timings reach the worker over the
+bus.
+
+Uploaded files, upload state, alert history and evidence live under
+static/uploads, uploads/ and alerts/, which web nodes and workers must
+share (e.g. a network volume).
+"""
+import os
+import time
+import signal
+import socket
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask_socketio import SocketIO
+
+from stream_manager import StreamManager
+from analysis_cache import AnalysisCache
+from alert_store import AlertStore
+from metrics import PipelineMetrics
+from logging_setup import get_logger, setup_logging
+from config import ConfigWatcher, load_config
+from message_bus import create_bus
+from notifications import NotificationDispatcher, channels_from_env
+from cluster import DetectorWorker, bus_emitter
+
+
+log = get_logger('worker')
+
+
+def serve_metrics(stream_manager, worker, port):
+    """Expose /metrics and /healthz of this worker on port"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body = stream_manager.render_metrics().encode()
+                content_type = 'text/plain; version=0.0.4'
+            elif self.path == '/healthz':
+                body = b'ok' if worker.is_running else b'stopping'
+                content_type = 'text/plain'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def emit_stats_loop(stream_manager, emit, interval, stopping):
+    """Push pipeline_stats of each running stream to the dashboards watching it"""
+    while not stopping.wait(interval):
+        try:
+            stats = stream_manager.get_pipeline_stats()
+            for stream_id, quality in stats['quality'].items():
+                emit('pipeline_stats', dict(
+                    stats,
+                    stages={'streams': {stream_id: stats['stages']['streams'].get(stream_id, {})},
+                            'totals': stats['stages']['totals']},
+                    quality={stream_id: quality}
+                ), to=stream_id)
+        except Exception as e:
+            log.warning("⚠️ Could not emit pipeline stats: %s", e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bus', default=os.environ.get('SOS_BUS_URL'), help='Message bus URL (redis://...)')
+    parser.add_argument('--worker-id', default=os.environ.get('SOS_WORKER_ID'),
+                        help='Stable worker name (default: host-pid)')
+    parser.add_argument('--capacity', type=int, default=int(os.environ.get('SOS_MAX_STREAMS', 16)),
+                        help='Cameras this worker runs at most')
+    parser.add_argument('--config', default=os.environ.get('SOS_CONFIG', 'config.json'),
+                        help='Detector config file, as for the web app')
+    parser.add_argument('--metrics-port', type=int, default=int(os.environ.get('SOS_WORKER_METRICS_PORT', 0)),
+                        help='Serve /metrics and /healthz on this port (0: off)')
+    parser.add_argument('--log-level', default=os.environ.get('SOS_LOG_LEVEL', 'INFO'))
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    if not args.bus or args.bus == 'memory://':
+        parser.error("a detector worker needs a shared bus: --bus redis://host:6379/0 or SOS_BUS_URL")
+    bus = create_bus(args.bus)
+
+    # Emits go through the bus to whichever web node holds the viewer; acks cannot come back that way
+    external_socketio = SocketIO(message_queue=bus.socketio_queue)
+
+    os.makedirs('alerts', exist_ok=True)
+    metrics = PipelineMetrics()
+    config = load_config(args.config)
+
+    notifier = None
+    channels = channels_from_env()
+    if channels:
+        # One outbox per host: SQLite files are not shared between writers on network volumes
+        worker_name = args.worker_id or socket.gethostname()
+        notifier = NotificationDispatcher(
+            channels,
+            outbox_path=os.path.join('alerts', f"notifications-{worker_name}.db"),
+            coalesce_window=float(os.environ.get('SOS_NOTIFY_COALESCE', 10)),
+            max_attempts=int(os.environ.get('SOS_NOTIFY_MAX_ATTEMPTS', 8)),
+            metrics=metrics
+        )
+        notifier.start()
+
+    stream_manager = StreamManager(
+        bus_emitter(bus, external_socketio.emit),
+        max_streams=args.capacity,
+        max_batch_size=int(os.environ.get('SOS_MAX_BATCH_SIZE', 8)),
+        max_batch_wait=float(os.environ.get('SOS_MAX_BATCH_WAIT_MS', 20)) / 1000,
+        client_video_fps=float(os.environ.get('SOS_CLIENT_VIDEO_FPS', 5)),
+        alert_workers=int(os.environ.get('SOS_ALERT_WORKERS', 4)),
+        analysis_timeout=float(os.environ.get('SOS_ANALYSIS_TIMEOUT', 8)),
+        analysis_cache=AnalysisCache(
+            max_entries=int(os.environ.get('SOS_ANALYSIS_CACHE_SIZE', 256)),
+            ttl=float(os.environ.get('SOS_ANALYSIS_CACHE_TTL', 600)),
+            max_distance=int(os.environ.get('SOS_ANALYSIS_CACHE_DISTANCE', 6)),
+            persist_path=os.environ.get('SOS_ANALYSIS_CACHE_PATH')
+        ),
+        alert_store=AlertStore('alerts'),
+        execution_mode=os.environ.get('SOS_EXECUTION_MODE', 'thread'),
+        inference_workers=int(os.environ['SOS_INFERENCE_WORKERS']) if os.environ.get('SOS_INFERENCE_WORKERS') else None,
+        metrics=metrics,
+        config=config,
+        notifier=notifier,
+        frame_acks=False
+    )
+
+    # Warm the model before joining so assigned cameras start on a hot detector
+    stream_manager.preload()
+
+    config_watcher = ConfigWatcher(args.config, stream_manager.apply_config,
+                                   interval=float(os.environ.get('SOS_CONFIG_POLL', 2)))
+    config_watcher.start()
+
+    worker = DetectorWorker(bus, stream_manager, worker_id=args.worker_id, capacity=args.capacity)
+    if args.metrics_port:
+        serve_metrics(stream_manager, worker, args.metrics_port)
+
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    worker.start()
+    # Web nodes run no pipelines, so the stage summaries for dashboards come from here
+    stats_interval = float(os.environ.get('SOS_STATS_INTERVAL', 2))
+    if stats_interval > 0:
+        threading.Thread(target=emit_stats_loop, daemon=True,
+                         args=(stream_manager, external_socketio.emit, stats_interval, stopping)).start()
+
+    while not stopping.wait(1):
+        pass
+
+    log.info("🛑 Shutting down detector worker %s", worker.worker_id)
+    # Leave the cluster first so the leader moves this worker's cameras right away
+    worker.stop()
+    if notifier:
+        notifier.stop()
+    time.sleep(0.5)
+    bus.close()
+
+
+if __name__ == '__main__':
+    main()
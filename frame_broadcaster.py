@@ -0,0 +1,141 @@
+import time
+import threading
+from functools import partial
+
+import cv2
+
+
+def encode_jpeg(frame, quality):
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encode failed")
+    return buffer.tobytes()
+
+
+class ViewerState:
+    """Delivery bookkeeping for one client watching one stream"""
+
+    __slots__ = ('sid', 'in_flight', 'last_sent_at', 'frames_sent', 'frames_dropped')
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.in_flight = 0
+        self.last_sent_at = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+
+class FrameBroadcaster:
+    """Encodes each stream's frames once and fans them out to its viewers
+
+    Frames go out as binary Socket.IO attachments. Each viewer may have at
+    most max_in_flight unacknowledged frames; beyond that its frames are
+    dropped so one slow dashboard never holds back the others. Streams
+    with no viewers are not encoded at all. Emitters that cannot deliver
+    acknowledgements (an external Socket.IO emitter on a detector worker)
+    use use_acks=False and send every frame.
+    """
+
+    def __init__(self, emit, max_in_flight=2, ack_timeout=2.0, use_acks=True):
+        self.emit = emit
+        self.use_acks = use_acks
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+
+        self.viewers = {}  # stream_id -> {sid: ViewerState}
+        self.lock = threading.Lock()
+        self.frames_encoded = 0
+        self.frames_skipped = 0
+        self.bytes_encoded = 0
+
+    def add_viewer(self, stream_id, sid):
+        with self.lock:
+            self.viewers.setdefault(stream_id, {}).setdefault(sid, ViewerState(sid))
+
+    def remove_viewer(self, stream_id, sid):
+        with self.lock:
+            self.viewers.get(stream_id, {}).pop(sid, None)
+
+    def remove_client(self, sid):
+        """Forget a disconnected client on every stream"""
+        with self.lock:
+            for viewers in self.viewers.values():
+                viewers.pop(sid, None)
+
+    def set_viewers(self, stream_id, sids):
+        """Replace a stream's viewers, keeping the state of those still watching"""
+        with self.lock:
+            current = self.viewers.get(stream_id, {})
+            self.viewers[stream_id] = {sid: current.get(sid) or ViewerState(sid) for sid in sids}
+
+    def has_viewers(self, stream_id):
+        return bool(self.viewers.get(stream_id))
+
+    def skip(self):
+        """Count a frame that was never encoded because nobody needed it"""
+        self.frames_skipped += 1
+
+    def encode(self, frame, quality=75):
+        # Inline on the stream's own thread: imencode releases the GIL, so streams still encode in parallel
+        jpeg = encode_jpeg(frame, quality)
+        self.frames_encoded += 1
+        self.bytes_encoded += len(jpeg)
+        return jpeg
+
+    def broadcast(self, stream_id, frame, metadata, quality=75, jpeg=None):
+        """Encode frame once (unless jpeg is given) and send it to every viewer that can take it"""
+        with self.lock:
+            viewers = list(self.viewers.get(stream_id, {}).values())
+
+        if not viewers:
+            self.skip()
+            return 0
+
+        if jpeg is None:
+            jpeg = self.encode(frame, quality)
+
+        payload = dict(metadata, frame=jpeg, stream_id=stream_id)
+        now = time.time()
+        sent = 0
+
+        for viewer in viewers:
+            if not self.use_acks:
+                viewer.frames_sent += 1
+                self.emit('video_frame', payload, to=viewer.sid)
+                sent += 1
+                continue
+
+            # A viewer that stopped acknowledging is given a fresh window after ack_timeout
+            if viewer.in_flight >= self.max_in_flight and now - viewer.last_sent_at < self.ack_timeout:
+                viewer.frames_dropped += 1
+                continue
+
+            if viewer.in_flight >= self.max_in_flight:
+                viewer.in_flight = 0
+
+            viewer.in_flight += 1
+            viewer.last_sent_at = now
+            viewer.frames_sent += 1
+            self.emit('video_frame', payload, to=viewer.sid, callback=partial(self.on_ack, viewer))
+            sent += 1
+
+        return sent
+
+    def on_ack(self, viewer, *args):
+        viewer.in_flight = max(0, viewer.in_flight - 1)
+
+    def get_stats(self):
+        with self.lock:
+            viewers = {
+                stream_id: [
+                    {'sid': v.sid, 'sent': v.frames_sent, 'dropped': v.frames_dropped, 'in_flight': v.in_flight}
+                    for v in stream_viewers.values()
+                ]
+                for stream_id, stream_viewers in self.viewers.items() if stream_viewers
+            }
+        return {
+            'frames_encoded': self.frames_encoded,
+            'frames_skipped_no_viewers': self.frames_skipped,
+            'avg_frame_kb': round(self.bytes_encoded / self.frames_encoded / 1024, 1) if self.frames_encoded else None,
+            'viewers': viewers
+        }
@@ -0,0 +1,171 @@
+import os
+import math
+import time
+import threading
+
+import cv2
+
+
+class LatestFrameReader:
+    """Decodes a source on its own thread and keeps only the newest frame
+
+    Live sources (RTSP/HTTP/camera index) are read as fast as they
+    deliver. Files are paced at their native FPS so they behave like a
+    live feed instead of being drained instantly. A file that is still
+    being uploaded (upload is its UploadSession) is followed as it grows:
+    at the end of the received data the capture is reopened and seeked
+    back to where it stopped once more bytes arrive, until the upload
+    stalls for longer than its stall_timeout.
+    """
+
+    def __init__(self, source, decode_histogram=None, upload=None):
+        self.source = source
+        self.decode_histogram = decode_histogram
+        self.upload = upload
+        self.opened_complete = True
+        self.is_live = not (isinstance(source, str) and os.path.isfile(source))
+
+        self.cap = None
+        self.fps = 0
+        self.total_frames = 0
+        self.condition = threading.Condition()
+        self.frame = None
+        self.sequence = 0
+        self.captured_at = None
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.consumed = True
+        self.is_running = False
+        self.finished = False
+        self.thread = None
+
+    def open(self):
+        while True:
+            self.opened_complete = self.upload is None or self.upload.complete
+            received = self.upload.received if self.upload else 0
+            self.cap = cv2.VideoCapture(self.source)
+            if self.cap.isOpened():
+                break
+            self.cap.release()
+            # Container header not uploaded yet (e.g. an MP4 without faststart): wait for more data
+            if self.opened_complete or not self.wait_for_upload(received):
+                return False
+
+        if self.is_live:
+            # Keep the driver-side buffer as small as the backend allows
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return True
+
+    def start(self):
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run_reader_loop, daemon=True)
+        self.thread.start()
+
+    def wait_for_upload(self, received):
+        """Wait until the upload has grown past received; False once it has stalled"""
+        while not self.upload.wait_for_growth(received):
+            if self.upload.is_stalled():
+                return False
+        return True
+
+    def follow_upload(self):
+        """Reopen the growing file after more data arrived and continue at the next frame"""
+        position = self.frames_read
+        received = self.upload.received
+        self.cap.release()
+        if not self.wait_for_upload(received):
+            return False
+        self.opened_complete = self.upload.complete
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            return False
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return True
+
+    def stop(self):
+        self.is_running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def run_reader_loop(self):
+        frame_interval = 1.0 / self.fps if not self.is_live and self.fps > 0 else 0
+        next_due = time.time()
+
+        try:
+            while self.is_running:
+                started = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    # End of the received prefix of an upload in progress, not of the video
+                    if not self.opened_complete and self.is_running and self.follow_upload():
+                        continue
+                    break
+                if self.decode_histogram:
+                    self.decode_histogram.observe(time.perf_counter() - started)
+
+                with self.condition:
+                    if not self.consumed:
+                        self.frames_dropped += 1
+                    self.frame = frame
+                    self.sequence += 1
+                    self.captured_at = time.time()
+                    self.frames_read += 1
+                    self.consumed = False
+                    self.condition.notify_all()
+
+                if frame_interval:
+                    next_due += frame_interval
+                    delay = next_due - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif delay < -1.0:
+                        # Fell far behind (e.g. slow disk); do not try to catch up in a burst
+                        next_due = time.time()
+        finally:
+            self.cap.release()
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def read(self, min_sequence=1, timeout=1.0):
+        """Wait for a frame at least as new as min_sequence
+
+        Returns (sequence, frame, captured_at), or None once the source has
+        ended or the reader was stopped.
+        """
+        with self.condition:
+            while self.sequence < min_sequence and not self.finished and self.is_running:
+                self.condition.wait(timeout)
+            if self.sequence < min_sequence:
+                return None
+            self.consumed = True
+            return self.sequence, self.frame, self.captured_at
+
+
+class FrameSkipController:
+    """Picks how many source frames to skip from measured inference latency
+
+    The stride is the number of source frames that arrive while one frame
+    is being processed, so results stay close to real time as load rises
+    and fall back to every frame when inference is fast.
+    """
+
+    def __init__(self, source_fps, max_stride=30, smoothing=0.2):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 25
+        self.max_stride = max_stride
+        self.smoothing = smoothing
+        self.avg_latency = None
+        self.stride = 1
+
+    def update(self, latency):
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += self.smoothing * (latency - self.avg_latency)
+
+        self.stride = max(1, min(self.max_stride, math.ceil(self.avg_latency * self.source_fps)))
+        return self.stride
@@ -0,0 +1,154 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+from logging_setup import get_logger
+
+
+log = get_logger('inference')
+
+
+class InferenceRequest:
+    """A single frame waiting for a batched model call"""
+
+    __slots__ = ('stream_id', 'frame', 'future', 'submitted_at')
+
+    def __init__(self, stream_id, frame):
+        self.stream_id = stream_id
+        self.frame = frame
+        self.future = Future()
+        self.submitted_at = time.time()
+
+
+class InferenceScheduler:
+    """Collects frames from every stream and runs them as one model call
+
+    A batch is flushed when it reaches max_batch_size or when the oldest
+    frame in it has waited max_wait seconds, whichever comes first.
+    """
+
+    def __init__(self, predict, max_batch_size=8, max_wait=0.02, stats_window=500):
+        self.predict = predict
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+
+        self.request_queue = Queue()
+        self.batch_stats = deque(maxlen=stats_window)
+        self.total_batches = 0
+        self.total_frames = 0
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run_batch_loop, daemon=True)
+        self.thread.start()
+        log.info("🧮 Inference scheduler started - batch size %d, max wait %.0fms",
+                 self.max_batch_size, self.max_wait * 1000)
+
+    def stop(self):
+        self.is_running = False
+
+    def submit(self, stream_id, frame):
+        """Queue a frame for inference and return a Future for its result"""
+        request = InferenceRequest(stream_id, frame)
+        self.request_queue.put(request)
+        return request.future
+
+    def infer(self, stream_id, frame, timeout=None):
+        """Blocking helper: submit a frame and wait for its result"""
+        return self.submit(stream_id, frame).result(timeout=timeout)
+
+    def collect_batch(self):
+        """Block for the first request, then fill the batch until the deadline"""
+        try:
+            first = self.request_queue.get(timeout=0.5)
+        except Empty:
+            return []
+
+        batch = [first]
+        deadline = first.submitted_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                # Deadline passed - still take whatever is already waiting
+                try:
+                    batch.append(self.request_queue.get_nowait())
+                    continue
+                except Empty:
+                    break
+            try:
+                batch.append(self.request_queue.get(timeout=remaining))
+            except Empty:
+                break
+
+        return batch
+
+    def run_batch_loop(self):
+        while self.is_running:
+            batch = self.collect_batch()
+            if not batch:
+                continue
+
+            started = time.time()
+            try:
+                results = self.predict([request.frame for request in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Model returned {len(results)} results for {len(batch)} frames")
+            except Exception as e:
+                log.error("❌ Batch inference error: %s", e)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            finished = time.time()
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+            self.record_batch(batch, started, finished)
+
+        # Fail anything still waiting so capture loops do not hang on shutdown
+        while True:
+            try:
+                self.request_queue.get_nowait().future.set_exception(RuntimeError("Scheduler stopped"))
+            except Empty:
+                break
+
+    def record_batch(self, batch, started, finished):
+        queue_wait = sum(started - request.submitted_at for request in batch) / len(batch)
+        self.batch_stats.append((len(batch), finished - started, queue_wait))
+        self.total_batches += 1
+        self.total_frames += len(batch)
+
+    def get_stats(self):
+        """Per-batch latency and occupancy over the recent window"""
+        stats = list(self.batch_stats)
+        summary = {
+            'mode': 'thread',
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': round(self.max_wait * 1000, 1),
+            'total_batches': self.total_batches,
+            'total_frames': self.total_frames,
+            'queue_depth': self.request_queue.qsize()
+        }
+        if not stats:
+            return summary
+
+        sizes = [s[0] for s in stats]
+        latencies = sorted(s[1] for s in stats)
+        waits = [s[2] for s in stats]
+
+        summary.update({
+            'avg_batch_size': round(sum(sizes) / len(sizes), 2),
+            'avg_occupancy': round(sum(sizes) / (len(sizes) * self.max_batch_size), 3),
+            'avg_batch_latency_ms': round(sum(latencies) / len(latencies) * 1000, 1),
+            'p95_batch_latency_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+            'avg_queue_wait_ms': round(sum(waits) / len(waits) * 1000, 1),
+            'avg_frame_latency_ms': round(sum(l / n for n, l, _ in stats) / len(stats) * 1000, 2)
+        })
+        return summary
@@ -0,0 +1,81 @@
+"""Entry point of ProcessInferencePool's worker processes
+
+Kept free of the web app and the streaming pipeline: a spawned worker
+imports only this module (plus the detector backend it loads), so it
+never starts servers, stores or background threads of its own.
+"""
+import os
+import time
+from multiprocessing import shared_memory
+from queue import Empty
+
+import numpy as np
+
+
+def run_worker_process(worker_id, model_config, shm_name, slots, shape, max_batch_size, max_wait,
+                       task_queue, result_queue, threads_per_worker):
+    """Load the model once, then serve batches from shared memory
+
+    Messages to the pool are (kind, worker_id, payload, extra) tuples:
+    ready, failed, taken (request ids about to run), batch and error.
+    """
+    # Keep each worker's intra-op threads to its share of the cores
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads_per_worker))
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots,) + tuple(shape), dtype=np.uint8, buffer=shm.buf)
+
+    try:
+        from detector_backends import load_detector
+        from postprocess import extract_arrays
+
+        try:
+            import torch
+            torch.set_num_threads(threads_per_worker)
+        except ImportError:
+            pass
+
+        model = load_detector(**model_config)
+        model(np.zeros(tuple(shape), dtype=np.uint8), verbose=False)
+    except Exception as e:
+        result_queue.put(('failed', worker_id, f"{type(e).__name__}: {e}", None))
+        frames = None
+        shm.close()
+        return
+
+    result_queue.put(('ready', worker_id, dict(model.names), None))
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            # Same size/deadline batching as the in-process scheduler
+            batch = [task]
+            deadline = time.time() + max_wait
+            while len(batch) < max_batch_size:
+                try:
+                    task = task_queue.get(timeout=max(0.0, deadline - time.time()))
+                except Empty:
+                    break
+                if task is None:
+                    task_queue.put(None)
+                    break
+                batch.append(task)
+
+            # Tell the pool which requests this worker holds, so they fail fast if it dies
+            result_queue.put(('taken', worker_id, [request_id for request_id, _ in batch], None))
+
+            started = time.time()
+            try:
+                results = model([frames[slot] for _, slot in batch], verbose=False)
+                rows = [extract_arrays(result) for result in results]
+                result_queue.put(('batch', worker_id, [
+                    (request_id, slot, row) for (request_id, slot), row in zip(batch, rows)
+                ], time.time() - started))
+            except Exception as e:
+                result_queue.put(('error', worker_id, [(request_id, slot, None) for request_id, slot in batch], str(e)))
+    finally:
+        frames = None
+        shm.close()
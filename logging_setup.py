@@ -0,0 +1,147 @@
+import atexit
+import logging
+import threading
+from queue import Queue, Full
+from logging.handlers import QueueHandler, QueueListener
+
+
+LOG_FORMAT = '%(asctime)s %(levelname).1s %(message)s'
+ROOT_LOGGER = 'sos'
+
+listener = None
+queue_handler = None
+
+
+def get_logger(name):
+    """Logger under the application namespace, e.g. get_logger('alerts')"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def get_stream_logger(stream_id):
+    return get_logger(f"stream.{stream_id}")
+
+
+def set_stream_debug(stream_id, enabled=True):
+    """Trace one stream at DEBUG while every other stream stays at the global level"""
+    get_stream_logger(stream_id).setLevel(logging.DEBUG if enabled else logging.NOTSET)
+
+
+def is_stream_debug(stream_id):
+    return get_stream_logger(stream_id).level == logging.DEBUG
+
+
+class RateLimitFilter(logging.Filter):
+    """Let at most burst records per message template through every interval seconds
+
+    Suppressed records are counted and reported on the next one that passes.
+    DEBUG records are exempt: they only exist for streams being traced.
+    """
+
+    def __init__(self, burst=20, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.windows = {}  # (logger, template) -> [window_start, passed, suppressed]
+        self.lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG:
+            return True
+        key = (record.name, record.msg)
+        now = record.created
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self.windows[key] = [now, 1, 0]
+                if len(self.windows) > 10000:
+                    self.windows.clear()
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} similar suppressed)"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in sample_every records for calls made with extra={'sample_every': n}"""
+
+    def __init__(self):
+        super().__init__()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        every = getattr(record, 'sample_every', 1)
+        if every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self.lock:
+            count = self.counters.get(key, 0)
+            self.counters[key] = count + 1
+        return count % every == 0
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never block the caller: when the log queue is full the record is dropped"""
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+def setup_logging(level='INFO', debug_streams=(), rate_burst=20, rate_interval=10.0, queue_size=10000):
+    """Route application logs through a bounded queue to a background writer thread
+
+    Filters run on the calling thread before anything is formatted or
+    queued, so a suppressed or sampled-out record never reaches stdout.
+    Records below the logger's level are not even created.
+    """
+    global listener, queue_handler
+    if listener is not None:
+        return
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT, '%H:%M:%S'))
+
+    queue_handler = DroppingQueueHandler(Queue(maxsize=queue_size))
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(RateLimitFilter(rate_burst, rate_interval))
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    for stream_id in debug_streams:
+        set_stream_debug(stream_id)
+
+    listener = QueueListener(queue_handler.queue, console, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def get_logging_stats():
+    if queue_handler is None:
+        return None
+    rate_limit = next(f for f in queue_handler.filters if isinstance(f, RateLimitFilter))
+    return {
+        'level': logging.getLevelName(logging.getLogger(ROOT_LOGGER).level),
+        'queued': queue_handler.queue.qsize(),
+        'dropped': queue_handler.dropped,
+        'rate_limited': rate_limit.suppressed
+    }
+
@@ -0,0 +1,162 @@
+import json
+import math
+import time
+import threading
+from queue import Queue
+
+from logging_setup import get_logger
+
+
+log = get_logger('bus')
+
+
+class InProcessBus:
+    """Topics and a small expiring key-value store inside one process
+
+    Messages are JSON round-tripped and delivered on a background thread,
+    so code written against it behaves the same on RedisBus.
+    """
+
+    url = 'memory://'
+    # flask_socketio needs no message queue when web and detection share a process
+    socketio_queue = None
+
+    def __init__(self):
+        self.handlers = {}  # topic -> [handler]
+        self.values = {}  # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+        self.queue = Queue()
+        self.thread = threading.Thread(target=self.run_delivery_loop, daemon=True)
+        self.thread.start()
+
+    def publish(self, topic, message):
+        self.queue.put((topic, json.dumps(message)))
+
+    def subscribe(self, topic, handler):
+        with self.lock:
+            self.handlers.setdefault(topic, []).append(handler)
+
+    def run_delivery_loop(self):
+        while True:
+            topic, data = self.queue.get()
+            with self.lock:
+                handlers = list(self.handlers.get(topic, ()))
+            for handler in handlers:
+                try:
+                    handler(json.loads(data))
+                except Exception as e:
+                    log.exception("❌ Bus handler for %s failed: %s", topic, e)
+
+    def live_value(self, key, now):
+        item = self.values.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self.values[key]
+            return None
+        return item
+
+    def put(self, key, value, ttl=None):
+        with self.lock:
+            self.values[key] = (json.loads(json.dumps(value)), time.time() + ttl if ttl else None)
+
+    def put_if_absent(self, key, value, ttl=None):
+        """Set key only if it does not exist; True if it was set"""
+        with self.lock:
+            if self.live_value(key, time.time()) is not None:
+                return False
+            self.values[key] = (json.loads(json.dumps(value)), time.time() + ttl if ttl else None)
+            return True
+
+    def get(self, key):
+        with self.lock:
+            item = self.live_value(key, time.time())
+        return item[0] if item else None
+
+    def delete(self, key):
+        with self.lock:
+            self.values.pop(key, None)
+
+    def scan(self, prefix):
+        """{key: value} of every live key starting with prefix"""
+        now = time.time()
+        with self.lock:
+            items = {key: self.live_value(key, now) for key in list(self.values) if key.startswith(prefix)}
+        return {key: item[0] for key, item in items.items() if item}
+
+    def close(self):
+        pass
+
+
+class RedisBus:
+    """The same interface on Redis, or any server speaking its protocol
+
+    Topics are PUBLISH/SUBSCRIBE channels and keys are JSON strings with
+    EXPIRE, all under namespace. The URL doubles as flask_socketio's
+    message_queue, so any web node can reach any viewer.
+    """
+
+    def __init__(self, url, namespace='sos'):
+        import redis
+        self.url = url
+        self.socketio_queue = url
+        self.namespace = namespace
+        self.redis = redis.Redis.from_url(url)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def key(self, name):
+        return f"{self.namespace}:{name}"
+
+    def publish(self, topic, message):
+        self.redis.publish(self.key(topic), json.dumps(message))
+
+    def subscribe(self, topic, handler):
+        def deliver(item):
+            try:
+                handler(json.loads(item['data']))
+            except Exception as e:
+                log.exception("❌ Bus handler for %s failed: %s", topic, e)
+
+        with self.lock:
+            self.pubsub.subscribe(**{self.key(topic): deliver})
+            if self.thread is None:
+                self.thread = self.pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+
+    def put(self, key, value, ttl=None):
+        self.redis.set(self.key(key), json.dumps(value), ex=math.ceil(ttl) if ttl else None)
+
+    def put_if_absent(self, key, value, ttl=None):
+        return bool(self.redis.set(self.key(key), json.dumps(value), nx=True, ex=math.ceil(ttl) if ttl else None))
+
+    def get(self, key):
+        data = self.redis.get(self.key(key))
+        return json.loads(data) if data is not None else None
+
+    def delete(self, key):
+        self.redis.delete(self.key(key))
+
+    def scan(self, prefix):
+        keys = list(self.redis.scan_iter(match=f"{self.key(prefix)}*", count=500))
+        if not keys:
+            return {}
+        start = len(self.namespace) + 1
+        return {
+            key.decode()[start:]: json.loads(data)
+            for key, data in zip(keys, self.redis.mget(keys)) if data is not None
+        }
+
+    def close(self):
+        if self.thread:
+            self.thread.stop()
+        self.pubsub.close()
+
+
+def create_bus(url=None):
+    """memory:// (or nothing) for a single process, redis:// / rediss:// / unix:// for a cluster"""
+    if not url or url == 'memory://':
+        return InProcessBus()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBus(url)
+    raise ValueError(f"Unsupported message bus URL: {url}")
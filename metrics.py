@@ -0,0 +1,165 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Upper bounds in seconds, Prometheus style; the last bucket is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; observe is a bisect and three increments"""
+
+    __slots__ = ('counts', 'sum', 'count', 'lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def read(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def merge(self, other):
+        counts, total, count = other.read()
+        with self.lock:
+            self.counts = [a + b for a, b in zip(self.counts, counts)]
+            self.sum += total
+            self.count += count
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket"""
+        counts, _, count = self.read()
+        if not count:
+            return None
+
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                if index == len(LATENCY_BUCKETS):
+                    return lower
+                upper = LATENCY_BUCKETS[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return LATENCY_BUCKETS[-1]
+
+    def summary(self):
+        _, total, count = self.read()
+        if not count:
+            return {'count': 0}
+        return {
+            'count': count,
+            'avg_ms': round(total / count * 1000, 2),
+            'p50_ms': round(self.quantile(0.5) * 1000, 2),
+            'p95_ms': round(self.quantile(0.95) * 1000, 2),
+            'p99_ms': round(self.quantile(0.99) * 1000, 2)
+        }
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PipelineMetrics:
+    """Per-stream, per-stage latency histograms for the whole pipeline
+
+    Stages are e.g. decode, resize, inference, postprocess, draw, encode,
+    emit, frame_queue_wait, analysis and alert_write, plus client_decode
+    and client_display as reported by dashboards. Alert stages that are
+    not tied to a stream use stream_id ''.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # (stage, stream_id) -> LatencyHistogram
+        self.lock = threading.Lock()
+
+    def histogram(self, stage, stream_id=''):
+        key = (stage, stream_id or '')
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def observe(self, stage, seconds, stream_id=''):
+        self.histogram(stage, stream_id).observe(seconds)
+
+    @contextmanager
+    def time(self, stage, stream_id=''):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(stage, stream_id).observe(time.perf_counter() - started)
+
+    def remove_stream(self, stream_id):
+        """Drop every stage histogram of a stream that is gone"""
+        with self.lock:
+            for key in [key for key in self.histograms if key[1] == stream_id]:
+                del self.histograms[key]
+
+    def snapshot(self):
+        """Summaries per stream and stage, plus all-stream totals per stage"""
+        with self.lock:
+            items = list(self.histograms.items())
+
+        streams, totals = {}, {}
+        for (stage, stream_id), histogram in items:
+            streams.setdefault(stream_id or '_', {})[stage] = histogram.summary()
+            totals.setdefault(stage, LatencyHistogram()).merge(histogram)
+
+        return {
+            'streams': streams,
+            'totals': {stage: histogram.summary() for stage, histogram in totals.items()}
+        }
+
+    def render_prometheus(self, families=()):
+        """Prometheus text exposition of the stage histograms and extra metric families
+
+        families is an iterable of (name, type, help, [(labels dict, value)]).
+        """
+        lines = [
+            '# HELP sos_stage_latency_seconds Pipeline stage latency per stream',
+            '# TYPE sos_stage_latency_seconds histogram'
+        ]
+        with self.lock:
+            items = sorted(self.histograms.items())
+
+        for (stage, stream_id), histogram in items:
+            counts, total, count = histogram.read()
+            labels = f'stage="{escape_label(stage)}",stream="{escape_label(stream_id)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'sos_stage_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'sos_stage_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'sos_stage_latency_seconds_sum{{{labels}}} {total}')
+            lines.append(f'sos_stage_latency_seconds_count{{{labels}}} {count}')
+
+        return '\n'.join(lines + render_families(families)) + '\n'
+
+
+def render_families(families):
+    """Prometheus text lines of (name, type, help, [(labels dict, value)]) metric families"""
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items())
+            lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+    return lines
@@ -0,0 +1,135 @@
+import time
+
+import cv2
+import numpy as np
+
+
+def build_roi_mask(roi, size):
+    """Rasterize ROI polygons given in normalized [0, 1] coordinates; None means the whole frame"""
+    width, height = size
+    if not roi:
+        return None
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for polygon in roi:
+        points = np.asarray(polygon, dtype=np.float32)
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError("Each ROI polygon needs at least 3 [x, y] points")
+        if points.min() < 0 or points.max() > 1:
+            raise ValueError("ROI points must be normalized to the 0-1 range")
+        points = np.round(points * [width - 1, height - 1]).astype(np.int32)
+        cv2.fillPoly(mask, [points], 255)
+    return mask
+
+
+class MotionGate:
+    """Cheap pre-filter that decides whether a frame is worth a model call
+
+    Frames are downscaled to a small grayscale image and compared with a
+    running-average background. Inference runs only when enough changed
+    pixels fall inside the camera's ROI polygons, or when the caller
+    forces it, or when heartbeat seconds have passed since the last run,
+    so a motionless person is still re-checked periodically.
+    """
+
+    def __init__(self, roi=None, width=160, pixel_threshold=25, min_area=0.002,
+                 heartbeat=2.0, learning_rate=0.05):
+        self.roi = roi
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.heartbeat = heartbeat
+        self.learning_rate = learning_rate
+
+        self.size = None
+        self.mask = None
+        self.mask_pixels = 0
+        self.background = None
+        self.last_run = 0
+        self.last_motion = 0.0
+        self.changed = None
+
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.runs = {'motion': 0, 'heartbeat': 0, 'forced': 0}
+        self.gate_time = 0.0
+
+        # Validate the polygons up front so a bad ROI fails at start_stream
+        build_roi_mask(roi, (width, width))
+
+    def prepare(self, frame):
+        height, width = frame.shape[:2]
+        if self.size is None:
+            self.size = (self.width, max(1, round(height * self.width / width)))
+            self.mask = build_roi_mask(self.roi, self.size)
+            self.mask_pixels = int(np.count_nonzero(self.mask)) if self.mask is not None else self.size[0] * self.size[1]
+
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame, force=False, now=None):
+        """Return why inference should run ('motion', 'heartbeat', 'forced') or None to skip
+
+        now is the clock the heartbeat runs on; it defaults to wall time,
+        offline analysis passes the video timestamp instead.
+        """
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        gray = self.prepare(frame)
+        self.frames_checked += 1
+
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+            self.last_motion = 1.0
+            reason = 'motion'
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            if self.mask is not None:
+                changed = cv2.bitwise_and(changed, self.mask)
+            self.last_motion = cv2.countNonZero(changed) / max(1, self.mask_pixels)
+            self.changed = changed
+            cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+
+            if self.last_motion >= self.min_area:
+                reason = 'motion'
+            elif force:
+                reason = 'forced'
+            elif now - self.last_run >= self.heartbeat:
+                reason = 'heartbeat'
+            else:
+                reason = None
+
+        self.gate_time += time.perf_counter() - started
+        if reason is None:
+            self.frames_skipped += 1
+        else:
+            self.runs[reason] += 1
+            self.last_run = now
+        return reason
+
+    def motion_boxes(self, frame_size, min_pixels=4):
+        """(N, 4) boxes around the changed regions of the last checked frame, in frame pixels"""
+        if self.changed is None:
+            return np.empty((0, 4), dtype=np.float32)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(self.changed, connectivity=8)
+        # Row 0 is the background component
+        stats = stats[1:count]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= min_pixels]
+
+        x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        boxes = np.stack([x, y, x + stats[:, cv2.CC_STAT_WIDTH], y + stats[:, cv2.CC_STAT_HEIGHT]], axis=1)
+        scale_x, scale_y = frame_size[0] / self.size[0], frame_size[1] / self.size[1]
+        return boxes.astype(np.float32) * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+
+    def get_stats(self):
+        return {
+            'frames_checked': self.frames_checked,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': round(self.frames_skipped / self.frames_checked, 3) if self.frames_checked else None,
+            'runs': dict(self.runs),
+            'motion': round(self.last_motion, 4),
+            'avg_gate_ms': round(self.gate_time / self.frames_checked * 1000, 2) if self.frames_checked else None,
+            'roi_polygons': len(self.roi) if self.roi else 0
+        }
@@ -0,0 +1,526 @@
+"""External alert notifications (email, webhooks) delivered off the alert path
+
+    python notifications.py --smtp localhost:1025 --to ops@example.com --webhook http://localhost:8000/hook
+
+sends a test alert through the dispatcher, e.g. to `python -m aiosmtpd -n -l localhost:1025`
+or any local HTTP server, and prints the delivery stats.
+"""
+import os
+import json
+import time
+import random
+import smtplib
+import sqlite3
+import argparse
+import threading
+import http.client
+from collections import deque
+from contextlib import contextmanager
+from email.message import EmailMessage
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from logging_setup import get_logger
+
+
+log = get_logger('notifications')
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (channel, status, next_attempt_at);
+"""
+
+# Errors that mean a pooled connection went stale; the send is retried once on a fresh one
+STALE_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, http.client.RemoteDisconnected,
+                           http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError)
+
+
+def format_alert(alert):
+    return (f"🚨 EMERGENCY ALERT {alert['alert_id']} 🚨\n"
+            f"STREAM: {alert['stream_id']} | TRACK: {alert['track_id']}\n"
+            f"TYPE: {alert['type']} | CONFIDENCE: {alert['confidence']:.1%}\n"
+            f"TIME: {alert['timestamp']}\n"
+            f"ANALYSIS: {alert['analysis']}")
+
+
+def format_subject(alerts):
+    if len(alerts) == 1:
+        alert = alerts[0]
+        return f"🚨 {alert['alert_id']}: {alert['type']} on {alert['stream_id']} ({alert['confidence']:.0%})"
+    counts = {}
+    for alert in alerts:
+        counts[alert['type']] = counts.get(alert['type'], 0) + 1
+    summary = ', '.join(f"{count} {kind.lower()}" for kind, count in sorted(counts.items()))
+    return f"🚨 {len(alerts)} emergency alerts ({summary})"
+
+
+def format_message(alerts):
+    """One alert, or a digest of a burst of them"""
+    if len(alerts) == 1:
+        return format_alert(alerts[0])
+    return format_subject(alerts) + '\n\n' + '\n\n'.join(format_alert(alert) for alert in alerts)
+
+
+class Outbox:
+    """Durable SQLite queue of notifications, one row per alert and channel
+
+    Rows stay pending until their channel confirms delivery, so alerts
+    raised while a channel is down (or the server is restarting) are sent
+    once it is back. Delivery is at least once.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(OUTBOX_SCHEMA)
+            self.conn.commit()
+
+    def add(self, channels, payload, created_at=None):
+        created_at = created_at or time.time()
+        data = json.dumps(payload)
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO outbox (channel, payload, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                [(channel, data, created_at, created_at) for channel in channels]
+            )
+            self.conn.commit()
+
+    def due(self, channel, now, limit, exclude=()):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM outbox WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?", (channel, now, limit + len(exclude))
+            ).fetchall()
+        return [dict(row) for row in rows if row['id'] not in exclude][:limit]
+
+    def next_due(self, channel):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE channel = ? AND status = 'pending'", (channel,)
+            ).fetchone()
+        return row[0]
+
+    def mark_sent(self, ids, sent_at):
+        with self.lock:
+            self.conn.execute(
+                f"UPDATE outbox SET status = 'sent', sent_at = ? WHERE id IN ({','.join('?' * len(ids))})",
+                [sent_at, *ids]
+            )
+            self.conn.commit()
+
+    def mark_failed(self, ids, error, next_attempt_at, max_attempts):
+        """Schedule another attempt, or give up on rows that have used max_attempts"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END "
+                f"WHERE id IN ({','.join('?' * len(ids))})",
+                [error, next_attempt_at, max_attempts, *ids]
+            )
+            self.conn.commit()
+
+    def purge(self, older_than):
+        """Delete delivered rows older than the given timestamp"""
+        with self.lock:
+            deleted = self.conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (older_than,)
+            ).rowcount
+            self.conn.commit()
+        return deleted
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT channel, status, COUNT(*) FROM outbox GROUP BY channel, status")
+            counts = {}
+            for channel, status, count in rows:
+                counts.setdefault(channel, {})[status] = count
+        return counts
+
+
+class ConnectionPool:
+    """Keeps up to size idle connections open for reuse
+
+    A connection that raised is closed instead of returned; one idle
+    for longer than max_idle is closed on the next checkout.
+    """
+
+    def __init__(self, connect, close, size=2, max_idle=60.0):
+        self.connect = connect
+        self.close = close
+        self.size = size
+        self.max_idle = max_idle
+        self.idle = deque()  # (connection, returned_at)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def take(self):
+        with self.lock:
+            while self.idle:
+                connection, returned_at = self.idle.pop()
+                if time.time() - returned_at <= self.max_idle:
+                    self.reused += 1
+                    return connection
+                self.close(connection)
+        connection = self.connect()
+        self.created += 1
+        return connection
+
+    def give_back(self, connection):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((connection, time.time()))
+                return
+        self.close(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.take()
+        try:
+            yield connection
+        except BaseException:
+            self.close(connection)
+            raise
+        self.give_back(connection)
+
+    def get_stats(self):
+        return {'idle': len(self.idle), 'created': self.created, 'reused': self.reused}
+
+
+class NotificationChannel:
+    """A delivery target; subclasses implement open/close/deliver for one pooled connection"""
+
+    name = 'channel'
+
+    def __init__(self, pool_size=2, max_idle=60.0):
+        self.pool = ConnectionPool(self.open, self.close, pool_size, max_idle)
+
+    def open(self):
+        raise NotImplementedError
+
+    def close(self, connection):
+        raise NotImplementedError
+
+    def deliver(self, connection, alerts):
+        raise NotImplementedError
+
+    def send(self, alerts):
+        """Deliver one message for alerts, retrying once if a pooled connection had gone stale"""
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as connection:
+                    return self.deliver(connection, alerts)
+            except STALE_CONNECTION_ERRORS:
+                if attempt:
+                    raise
+
+
+class SMTPChannel(NotificationChannel):
+    name = 'email'
+
+    def __init__(self, host, port=25, sender='sos-monitor@localhost', recipients=(), username=None,
+                 password=None, starttls=False, use_ssl=False, timeout=10.0, pool_size=1, max_idle=60.0):
+        if not recipients:
+            raise ValueError("SMTP channel needs at least one recipient")
+        super().__init__(pool_size, max_idle)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+    def open(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def close(self, smtp):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def deliver(self, smtp, alerts):
+        message = EmailMessage()
+        message['Subject'] = format_subject(alerts)
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(format_message(alerts))
+        smtp.send_message(message)
+
+
+class WebhookChannel(NotificationChannel):
+    """JSON POST with a Slack-compatible 'text' field plus the structured alerts"""
+
+    name = 'webhook'
+
+    def __init__(self, url, headers=None, timeout=10.0, pool_size=2, max_idle=30.0):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Webhook URL must be http(s): {url}")
+        super().__init__(pool_size, max_idle)
+        self.url = url
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+
+    def open(self):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def close(self, connection):
+        connection.close()
+
+    def deliver(self, connection, alerts):
+        body = json.dumps({
+            'text': format_message(alerts),
+            'digest': len(alerts) > 1,
+            'alerts': alerts
+        })
+        headers = dict(self.headers, **{'Content-Type': 'application/json', 'Connection': 'keep-alive'})
+        connection.request('POST', self.path, body=body, headers=headers)
+        response = connection.getresponse()
+        # Read the whole response so the connection can be reused
+        response.read()
+        if response.status >= 300:
+            raise RuntimeError(f"Webhook returned HTTP {response.status}")
+
+
+class ChannelState:
+    __slots__ = ('in_flight', 'hold_until', 'sent', 'messages', 'digests', 'retries', 'failed', 'last_error')
+
+    def __init__(self):
+        self.in_flight = set()
+        self.hold_until = 0.0
+        self.sent = 0
+        self.messages = 0
+        self.digests = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_error = None
+
+
+class NotificationDispatcher:
+    """Delivers alerts to every channel from a durable outbox, off the alert path
+
+    notify() only writes outbox rows. A scheduler thread per channel
+    sends the first alert at once and then holds the channel for
+    coalesce_window seconds; alerts arriving meanwhile go out together
+    as one digest of up to max_digest alerts. Sends run on pool_size
+    threads per channel, each using a pooled connection. Failed sends are
+    retried with exponential backoff and jitter up to max_attempts.
+    Delivery latency (queued to sent) is recorded per channel.
+    """
+
+    def __init__(self, channels, outbox_path, coalesce_window=10.0, max_digest=50, max_attempts=8,
+                 base_backoff=2.0, max_backoff=300.0, keep_sent_days=7, metrics=None):
+        names = [channel.name for channel in channels]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Channel names must be unique: {names}")
+        self.channels = {channel.name: channel for channel in channels}
+        self.outbox = Outbox(outbox_path)
+        self.coalesce_window = coalesce_window
+        self.max_digest = max_digest
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.keep_sent_days = keep_sent_days
+        self.metrics = metrics
+
+        self.states = {name: ChannelState() for name in self.channels}
+        self.senders = {name: ThreadPoolExecutor(max_workers=channel.pool.size, thread_name_prefix=f"notify-{name}")
+                        for name, channel in self.channels.items()}
+        self.condition = threading.Condition()
+        self.is_running = False
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        for channel in self.channels.values():
+            threading.Thread(target=self.run_channel, args=(channel,), daemon=True).start()
+        log.info("📨 Notification dispatcher started: %s", ', '.join(self.channels) or 'no channels')
+
+    def stop(self):
+        self.is_running = False
+        self.wake()
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def notify(self, alert):
+        """Queue an alert (a JSON-friendly dict) for every channel"""
+        if not self.channels:
+            return
+        self.outbox.add(self.channels, alert)
+        self.wake()
+
+    def run_channel(self, channel):
+        state = self.states[channel.name]
+        last_purge = 0
+        while self.is_running:
+            try:
+                wait = self.dispatch_due(channel, state)
+                if time.time() - last_purge > 3600:
+                    self.outbox.purge(time.time() - self.keep_sent_days * 86400)
+                    last_purge = time.time()
+            except Exception as e:
+                log.exception("❌ Notification scheduler for %s failed: %s", channel.name, e)
+                wait = 5.0
+            with self.condition:
+                self.condition.wait(wait)
+
+    def dispatch_due(self, channel, state):
+        """Start a send if alerts are due and the channel is not held; returns how long to sleep"""
+        now = time.time()
+        if now < state.hold_until:
+            return state.hold_until - now
+
+        with self.condition:
+            in_flight = set(state.in_flight)
+        rows = self.outbox.due(channel.name, now, self.max_digest, exclude=in_flight)
+        if not rows:
+            next_due = self.outbox.next_due(channel.name)
+            return min(5.0, max(0.05, next_due - now)) if next_due else 5.0
+
+        ids = [row['id'] for row in rows]
+        with self.condition:
+            state.in_flight.update(ids)
+        state.hold_until = now + self.coalesce_window
+        self.senders[channel.name].submit(self.deliver, channel, state, rows)
+        return self.coalesce_window
+
+    def deliver(self, channel, state, rows):
+        ids = [row['id'] for row in rows]
+        alerts = [json.loads(row['payload']) for row in rows]
+        try:
+            channel.send(alerts)
+        except Exception as e:
+            attempts = max(row['attempts'] for row in rows) + 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            self.outbox.mark_failed(ids, str(e), time.time() + delay, self.max_attempts)
+            state.last_error = str(e)
+            if attempts >= self.max_attempts:
+                state.failed += len(ids)
+                log.error("❌ %s: giving up on %d alerts after %d attempts: %s", channel.name, len(ids), attempts, e)
+            else:
+                state.retries += 1
+                log.warning("⚠️ %s delivery failed (attempt %d), retrying in %.0fs: %s",
+                            channel.name, attempts, delay, e)
+        else:
+            sent_at = time.time()
+            self.outbox.mark_sent(ids, sent_at)
+            state.sent += len(ids)
+            state.messages += 1
+            if len(ids) > 1:
+                state.digests += 1
+            if self.metrics:
+                for row, alert in zip(rows, alerts):
+                    self.metrics.observe(f"notify_{channel.name}", sent_at - row['created_at'])
+                    if alert.get('captured_at'):
+                        self.metrics.observe('capture_to_notify', sent_at - alert['captured_at'], alert.get('stream_id'))
+            log.info("📨 %s: sent %s", channel.name,
+                     f"digest of {len(ids)} alerts" if len(ids) > 1 else alerts[0].get('alert_id'))
+        finally:
+            with self.condition:
+                state.in_flight.difference_update(ids)
+                self.condition.notify_all()
+
+    def get_stats(self):
+        counts = self.outbox.counts()
+        return {
+            name: {
+                'sent': state.sent,
+                'messages': state.messages,
+                'digests': state.digests,
+                'retries': state.retries,
+                'failed': state.failed,
+                'in_flight': len(state.in_flight),
+                'pending': counts.get(name, {}).get('pending', 0),
+                'last_error': state.last_error,
+                'connections': self.channels[name].pool.get_stats()
+            }
+            for name, state in self.states.items()
+        }
+
+
+def channels_from_env(environ=os.environ):
+    """Channels configured by SOS_SMTP_* and SOS_WEBHOOK_URL, shared by web nodes and detector workers"""
+    channels = []
+    if environ.get('SOS_SMTP_HOST'):
+        channels.append(SMTPChannel(
+            environ['SOS_SMTP_HOST'],
+            port=int(environ.get('SOS_SMTP_PORT', 25)),
+            sender=environ.get('SOS_SMTP_FROM', 'sos-monitor@localhost'),
+            recipients=[r.strip() for r in environ.get('SOS_SMTP_TO', '').split(',') if r.strip()],
+            username=environ.get('SOS_SMTP_USER'),
+            password=environ.get('SOS_SMTP_PASSWORD'),
+            starttls=environ.get('SOS_SMTP_STARTTLS', '0') == '1',
+            use_ssl=environ.get('SOS_SMTP_SSL', '0') == '1'
+        ))
+    if environ.get('SOS_WEBHOOK_URL'):
+        channels.append(WebhookChannel(environ['SOS_WEBHOOK_URL']))
+    return channels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--smtp', help='host:port of an SMTP server')
+    parser.add_argument('--to', action='append', default=[], help='Email recipient (repeatable)')
+    parser.add_argument('--webhook', help='Webhook URL')
+    parser.add_argument('--count', type=int, default=3, help='Alerts to send as a burst')
+    parser.add_argument('--outbox', default='notifications_test.db')
+    args = parser.parse_args()
+
+    from logging_setup import setup_logging
+    setup_logging('INFO')
+
+    channels = []
+    if args.smtp:
+        host, _, port = args.smtp.partition(':')
+        channels.append(SMTPChannel(host, int(port or 25), recipients=args.to or ['ops@localhost']))
+    if args.webhook:
+        channels.append(WebhookChannel(args.webhook))
+    if not channels:
+        parser.error("give --smtp and/or --webhook")
+
+    dispatcher = NotificationDispatcher(channels, args.outbox, coalesce_window=2.0)
+    dispatcher.start()
+    for index in range(args.count):
+        dispatcher.notify({
+            'alert_id': f"TEST-{index + 1:04d}", 'stream_id': 'test', 'track_id': index + 1, 'type': 'FALL',
+            'confidence': 0.9, 'analysis': 'Test notification', 'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+    time.sleep(4)
+    print(json.dumps(dispatcher.get_stats(), indent=2))
+    dispatcher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+
+
+SKIP_CLASSES = ('slight',)
+
+
+class Detections:
+    """Array-backed detections for one frame
+
+    boxes are in original-frame pixels and display_boxes in display-frame
+    pixels, both int32 arrays of shape (N, 4) in x1, y1, x2, y2 order.
+    """
+
+    __slots__ = ('class_ids', 'confidences', 'boxes', 'display_boxes', 'names', 'candidates', 'track_ids')
+
+    def __init__(self, class_ids, confidences, boxes, display_boxes, names, candidates=0):
+        self.class_ids = class_ids
+        self.confidences = confidences
+        self.boxes = boxes
+        self.display_boxes = display_boxes
+        self.names = names
+        self.candidates = candidates
+        self.track_ids = None
+
+    @classmethod
+    def empty(cls, names):
+        return cls(
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.float32),
+            np.empty((0, 4), dtype=np.int32),
+            np.empty((0, 4), dtype=np.int32),
+            names
+        )
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def class_name(self, index):
+        return self.names[int(self.class_ids[index])].lower()
+
+    def __iter__(self):
+        """Yield (class_name, confidence, bbox, display_bbox) per detection"""
+        confidences = self.confidences.tolist()
+        boxes = self.boxes.tolist()
+        display_boxes = self.display_boxes.tolist()
+        for i in range(len(self)):
+            yield self.class_name(i), confidences[i], boxes[i], display_boxes[i]
+
+    def to_list(self):
+        """JSON-friendly list in the same shape the dashboard has always used"""
+        detections = [
+            {'class_name': class_name, 'confidence': confidence, 'bbox': bbox}
+            for class_name, confidence, bbox, _ in self
+        ]
+        if self.track_ids is not None:
+            for detection, track_id in zip(detections, self.track_ids.tolist()):
+                detection['track_id'] = track_id
+        return detections
+
+
+def build_threshold_table(names, get_threshold, skip_classes=SKIP_CLASSES):
+    """Confidence threshold per class id; skipped classes can never pass"""
+    table = np.full(max(names) + 1 if names else 0, np.inf, dtype=np.float32)
+    for class_id, name in names.items():
+        if name.lower() not in skip_classes:
+            table[class_id] = get_threshold(name.lower())
+    return table
+
+
+def extract_arrays(result):
+    """Pull (N, 6) x1, y1, x2, y2, conf, cls rows out of a YOLO result in one transfer"""
+    if isinstance(result, np.ndarray):
+        # Already extracted (e.g. by an inference worker process)
+        return result
+
+    boxes = getattr(result, 'boxes', None)
+    if boxes is None or len(boxes) == 0:
+        return np.empty((0, 6), dtype=np.float32)
+
+    data = boxes.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    return np.asarray(data, dtype=np.float32)
+
+
+def affine_boxes(boxes, scale, offset=(0.0, 0.0)):
+    """Apply x' = x * sx + ox, y' = y * sy + oy to every box corner at once"""
+    sx, sy = scale
+    ox, oy = offset
+    return boxes * np.array([sx, sy, sx, sy], dtype=np.float32) + np.array([ox, oy, ox, oy], dtype=np.float32)
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes as an (N, M) matrix"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).clip(0).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).clip(0).prod(axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def postprocess_arrays(data, names, threshold_table, inference_size, original_size, display_size):
+    """Filter and rescale raw detection rows without a per-box Python loop
+
+    Sizes are (width, height) tuples.
+    """
+    if len(data) == 0:
+        return Detections.empty(names)
+
+    class_ids = data[:, 5].astype(np.int32)
+    confidences = data[:, 4]
+
+    # Unknown class ids fall outside the table and are dropped
+    known = (class_ids >= 0) & (class_ids < len(threshold_table))
+    keep = np.zeros(len(data), dtype=bool)
+    keep[known] = confidences[known] >= threshold_table[class_ids[known]]
+
+    kept = data[keep]
+    if len(kept) == 0:
+        detections = Detections.empty(names)
+        detections.candidates = len(data)
+        return detections
+
+    inference_w, inference_h = inference_size
+    original_w, original_h = original_size
+    display_w, display_h = display_size
+
+    boxes = affine_boxes(kept[:, :4], (original_w / inference_w, original_h / inference_h)).astype(np.int32)
+    display_boxes = affine_boxes(boxes, (display_w / original_w, display_h / original_h)).astype(np.int32)
+
+    return Detections(class_ids[keep], confidences[keep].copy(), boxes, display_boxes, names, len(data))
+
+
+def postprocess_result(result, names, threshold_table, inference_size, original_size, display_size):
+    """Vectorized post-processing for one YOLO result"""
+    return postprocess_arrays(
+        extract_arrays(result), names, threshold_table,
+        inference_size, original_size, display_size
+    )
@@ -0,0 +1,300 @@
+import os
+import time
+import itertools
+import threading
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from queue import Queue, Empty
+
+import numpy as np
+
+from inference_worker import run_worker_process
+from logging_setup import get_logger
+
+
+log = get_logger('inference')
+
+
+class SharedFramePool:
+    """Preallocated shared-memory slots for fixed-size inference frames
+
+    Frames are copied into a slot once; worker processes read them through
+    zero-copy NumPy views, so only slot indices cross the process boundary.
+    """
+
+    def __init__(self, slots, shape=(640, 640, 3), dtype=np.uint8):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * frame_bytes)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self.free_slots = Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self, timeout=None):
+        return self.free_slots.get(timeout=timeout)
+
+    def release(self, slot):
+        self.free_slots.put(slot)
+
+    def write(self, slot, frame):
+        np.copyto(self.frames[slot], frame)
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ProcessInferencePool:
+    """Runs detection in worker processes fed through a shared-memory frame pool
+
+    Has the same submit/infer/get_stats interface as InferenceScheduler.
+    Results are the raw (N, 6) detection rows, which postprocess accepts
+    directly, so nothing else in the pipeline changes. A worker that dies
+    fails the frames it held and is restarted up to max_restarts times;
+    once no worker is left every request fails instead of hanging.
+    """
+
+    def __init__(self, model_config, workers=None, slots=96, max_batch_size=8, max_wait=0.02,
+                 frame_shape=(640, 640, 3), stats_window=500, max_restarts=3):
+        self.model_config = model_config
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.frame_shape = frame_shape
+        self.max_restarts = max_restarts
+        self.threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+
+        self.context = mp.get_context('spawn')
+        self.frame_pool = SharedFramePool(slots, frame_shape)
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.processes = {}  # worker_id -> Process
+        self.taken = {}  # worker_id -> request ids the worker is running
+        self.restarts = {}  # worker_id -> restarts so far
+        self.pending = {}  # request_id -> (future, submitted_at, slot)
+        self.request_ids = itertools.count()
+        self.lock = threading.Lock()
+
+        self.names = None
+        self.is_running = False
+        self.error = None
+        self.batch_stats = deque(maxlen=stats_window)
+        self.total_batches = 0
+        self.total_frames = 0
+
+    def spawn(self, worker_id):
+        process = self.context.Process(
+            target=run_worker_process,
+            args=(worker_id, self.model_config, self.frame_pool.name, self.frame_pool.slots,
+                  self.frame_shape, self.max_batch_size, self.max_wait,
+                  self.task_queue, self.result_queue, self.threads_per_worker),
+            daemon=True
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.taken[worker_id] = set()
+
+    def start(self, ready_timeout=300):
+        """Spawn the workers and wait until every one has loaded the model
+
+        Raises RuntimeError when a worker cannot load the model, exits, or
+        is not ready within ready_timeout seconds.
+        """
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        waiting = set(self.processes)
+        deadline = time.time() + ready_timeout
+        while waiting:
+            try:
+                kind, worker_id, payload, _ = self.result_queue.get(timeout=0.5)
+            except Empty:
+                dead = [w for w in sorted(waiting) if not self.processes[w].is_alive()]
+                if dead:
+                    exitcode = self.processes[dead[0]].exitcode
+                    self.abort()
+                    raise RuntimeError(f"Inference worker {dead[0]} exited while loading the model "
+                                       f"(exit code {exitcode})")
+                if time.time() > deadline:
+                    self.abort()
+                    raise RuntimeError(f"Inference workers not ready after {ready_timeout:.0f}s "
+                                       f"({len(waiting)} of {self.workers} still loading)")
+                continue
+
+            if kind == 'failed':
+                self.abort()
+                raise RuntimeError(f"Inference worker {worker_id} could not load the model: {payload}")
+            self.names = payload
+            waiting.discard(worker_id)
+            log.info("⚙️ Inference worker %d ready", worker_id)
+
+        self.is_running = True
+        threading.Thread(target=self.run_result_loop, daemon=True).start()
+        log.info("🧮 Process inference pool started - %d workers, %d shared frame slots, %d threads each",
+                 self.workers, self.frame_pool.slots, self.threads_per_worker)
+
+    def abort(self):
+        """Tear down a pool that failed to start"""
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=5)
+        self.processes = {}
+        self.frame_pool.close()
+
+    def stop(self):
+        self.is_running = False
+        for _ in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes.values():
+            process.join(timeout=5)
+        self.frame_pool.close()
+
+    def submit(self, stream_id, frame, timeout=5.0):
+        """Copy frame into a shared slot and queue it; returns a Future of detection rows"""
+        if self.error:
+            raise RuntimeError(self.error)
+        slot = self.frame_pool.acquire(timeout=timeout)
+        self.frame_pool.write(slot, frame)
+
+        future = Future()
+        request_id = next(self.request_ids)
+        with self.lock:
+            self.pending[request_id] = (future, time.time(), slot)
+        self.task_queue.put((request_id, slot))
+        return future
+
+    def infer(self, stream_id, frame, timeout=None):
+        return self.submit(stream_id, frame).result(timeout=timeout)
+
+    def finish(self, request_id):
+        """Take a request out of pending and free its slot; None if it was already failed"""
+        with self.lock:
+            item = self.pending.pop(request_id, None)
+        if item is not None:
+            self.frame_pool.release(item[2])
+        return item
+
+    def fail_requests(self, request_ids, message):
+        for request_id in request_ids:
+            item = self.finish(request_id)
+            if item is not None:
+                item[0].set_exception(RuntimeError(message))
+
+    def check_workers(self):
+        """Fail the frames of workers that died and start replacements"""
+        dead = [(worker_id, process) for worker_id, process in list(self.processes.items()) if not process.is_alive()]
+        if not dead:
+            return
+
+        # A dead worker's last messages are already in the pipe; read them before deciding what it lost
+        while True:
+            try:
+                self.handle_message(self.result_queue.get(timeout=0.05))
+            except Empty:
+                break
+
+        for worker_id, process in dead:
+            lost = self.taken.pop(worker_id, set())
+            del self.processes[worker_id]
+            message = f"Inference worker {worker_id} died (exit code {process.exitcode})"
+            log.error("💥 %s, failing %d in-flight frames", message, len(lost))
+            self.fail_requests(lost, message)
+
+            restarts = self.restarts.get(worker_id, 0)
+            if restarts < self.max_restarts:
+                self.restarts[worker_id] = restarts + 1
+                self.spawn(worker_id)
+                log.warning("🔁 Restarting inference worker %d (%d/%d)", worker_id, restarts + 1, self.max_restarts)
+            else:
+                log.error("❌ Inference worker %d gave up after %d restarts; pool degraded to %d workers",
+                          worker_id, restarts, len(self.processes))
+
+        if not self.processes and self.error is None:
+            self.error = "Every inference worker died"
+            with self.lock:
+                queued = list(self.pending)
+            self.fail_requests(queued, self.error)
+
+    def run_result_loop(self):
+        last_check = time.time()
+        while self.is_running:
+            if time.time() - last_check >= 0.5:
+                self.check_workers()
+                last_check = time.time()
+            try:
+                message = self.result_queue.get(timeout=0.5)
+            except Empty:
+                continue
+            self.handle_message(message)
+
+    def handle_message(self, message):
+        kind, worker_id, items, extra = message
+        if kind == 'taken':
+            self.taken.setdefault(worker_id, set()).update(items)
+            return
+        if kind == 'ready':
+            log.info("⚙️ Inference worker %d ready again", worker_id)
+            return
+        if kind == 'failed':
+            # The process exits next; check_workers restarts or retires it
+            log.error("❌ Inference worker %d could not load the model: %s", worker_id, items)
+            return
+
+        finished = time.time()
+        waits = []
+        taken = self.taken.get(worker_id, set())
+        for request_id, slot, rows in items:
+            taken.discard(request_id)
+            item = self.finish(request_id)
+            if item is None:
+                continue
+            future, submitted_at, _ = item
+            waits.append(finished - submitted_at)
+            if kind == 'error':
+                future.set_exception(RuntimeError(f"Worker {worker_id}: {extra}"))
+            else:
+                future.set_result(rows)
+
+        if kind == 'batch':
+            if waits:
+                self.batch_stats.append((len(items), extra, sum(waits) / len(waits)))
+            self.total_batches += 1
+            self.total_frames += len(items)
+        else:
+            log.error("❌ Worker %d batch error: %s", worker_id, extra)
+
+    def get_stats(self):
+        stats = list(self.batch_stats)
+        summary = {
+            'mode': 'process',
+            'workers': self.workers,
+            'alive_workers': sum(1 for p in list(self.processes.values()) if p.is_alive()),
+            'restarts': sum(self.restarts.values()),
+            'error': self.error,
+            'max_batch_size': self.max_batch_size,
+            'total_batches': self.total_batches,
+            'total_frames': self.total_frames,
+            'pending': len(self.pending),
+            'free_slots': self.frame_pool.free_slots.qsize()
+        }
+        if stats:
+            sizes = [s[0] for s in stats]
+            summary.update({
+                'avg_batch_size': round(sum(sizes) / len(sizes), 2),
+                'avg_occupancy': round(sum(sizes) / (len(sizes) * self.max_batch_size), 3),
+                'avg_batch_latency_ms': round(sum(s[1] for s in stats) / len(stats) * 1000, 1),
+                'avg_round_trip_ms': round(sum(s[2] for s in stats) / len(stats) * 1000, 1)
+            })
+        return summary
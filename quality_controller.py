@@ -0,0 +1,157 @@
+import time
+import threading
+from collections import deque
+
+from alert_executor import percentile
+
+
+# Knobs in the order they are given up under pressure, each from full quality down
+QUALITY_KNOBS = (
+    ('video_fps', (30, 20, 15, 10, 5)),
+    ('jpeg_quality', (75, 60, 45, 35)),
+    ('display_size', ((640, 480), (480, 360), (320, 240))),
+    ('inference_stride', (1, 2, 3, 4))
+)
+
+
+def build_ladder(knobs=QUALITY_KNOBS):
+    """Settings per quality level: level 0 is full quality, each level lowers one knob one notch"""
+    settings = {name: values[0] for name, values in knobs}
+    ladder = [dict(settings)]
+    for name, values in knobs:
+        for value in values[1:]:
+            settings[name] = value
+            ladder.append(dict(settings))
+    return ladder
+
+
+QUALITY_LADDER = build_ladder()
+
+
+class QualityController:
+    """Keeps a stream's frame latency under its target by trading quality for speed
+
+    Latency samples (capture to frame ready, capture to frame sent) are
+    collected over interval seconds. When their p95 is over target the
+    stream drops one level down QUALITY_LADDER: video FPS first, then
+    JPEG quality, display resolution and finally inference rate. A level
+    is only restored after restore_after intervals in a row with p95
+    under restore_ratio * target, so the stream does not oscillate.
+    """
+
+    def __init__(self, target_ms=500, enabled=True, interval=1.0, min_samples=5, restore_ratio=0.7,
+                 restore_after=3, history=20):
+        self.target = target_ms / 1000
+        self.enabled = enabled
+        self.interval = interval
+        self.min_samples = min_samples
+        self.restore_ratio = restore_ratio
+        self.restore_after = restore_after
+
+        self.level = 0
+        self.settings = QUALITY_LADDER[0]
+        self.samples = []
+        self.window_start = time.time()
+        self.calm_intervals = 0
+        self.last_p95 = None
+        self.degraded = 0
+        self.restored = 0
+        self.decisions = deque(maxlen=history)
+        self.lock = threading.Lock()
+
+    @property
+    def video_fps(self):
+        return self.settings['video_fps']
+
+    @property
+    def jpeg_quality(self):
+        return self.settings['jpeg_quality']
+
+    @property
+    def display_size(self):
+        return self.settings['display_size']
+
+    @property
+    def inference_stride(self):
+        return self.settings['inference_stride']
+
+    def observe(self, latency):
+        """Record one frame latency in seconds; re-evaluates the level once per interval"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            self.samples.append(latency)
+            now = time.time()
+            if now - self.window_start < self.interval or len(self.samples) < self.min_samples:
+                return None
+            samples = sorted(self.samples)
+            self.samples = []
+            self.window_start = now
+            return self.evaluate(percentile(samples, 0.95))
+
+    def evaluate(self, p95):
+        self.last_p95 = p95
+        if p95 > self.target:
+            self.calm_intervals = 0
+            if self.level < len(QUALITY_LADDER) - 1:
+                return self.set_level(self.level + 1, 'over_target', p95)
+        elif p95 < self.target * self.restore_ratio:
+            self.calm_intervals += 1
+            if self.level > 0 and self.calm_intervals >= self.restore_after:
+                self.calm_intervals = 0
+                return self.set_level(self.level - 1, 'headroom', p95)
+        else:
+            self.calm_intervals = 0
+        return None
+
+    def set_level(self, level, reason, p95=None):
+        previous = self.level
+        self.level = level
+        self.settings = QUALITY_LADDER[level]
+        if level > previous:
+            self.degraded += 1
+        else:
+            self.restored += 1
+
+        decision = {
+            'at': time.time(),
+            'from': previous,
+            'to': level,
+            'reason': reason,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'settings': self.describe()
+        }
+        self.decisions.append(decision)
+        return decision
+
+    def configure(self, target_ms=None, enabled=None):
+        """Apply a new target or switch adaptation off (which restores full quality)"""
+        with self.lock:
+            if target_ms is not None:
+                self.target = target_ms / 1000
+            if enabled is not None:
+                self.enabled = enabled
+                if not enabled and self.level:
+                    self.set_level(0, 'disabled')
+
+    def describe(self):
+        width, height = self.display_size
+        return {
+            'video_fps': self.video_fps,
+            'jpeg_quality': self.jpeg_quality,
+            'display_size': [width, height],
+            'inference_stride': self.inference_stride
+        }
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'level': self.level,
+            'max_level': len(QUALITY_LADDER) - 1,
+            'target_ms': round(self.target * 1000),
+            'p95_ms': round(self.last_p95 * 1000, 1) if self.last_p95 is not None else None,
+            'settings': self.describe(),
+            'degraded': self.degraded,
+            'restored': self.restored,
+            'last_decision': self.decisions[-1] if self.decisions else None
+        }
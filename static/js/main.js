@@ -9,9 +9,24 @@ const socket = io({
 
 // Global variables
 let isMonitoring = false;
+let currentStreamId = null;
 let totalAlerts = 0;
 let detectionCount = 0;
 
+// Frame rendering: one decode at a time, and only the newest decoded frame is drawn per animation frame
+let pendingFrame = null;
+let readyFrame = null;
+let decoding = false;
+let drawScheduled = false;
+let frameGeneration = 0;
+let frameTiming = newFrameTiming();
+
+// Alert history is capped; the list only renders the rows scrolled into view
+let alertHistory = [];
+let pendingAnalyses = 0;
+let lastProcessingType = '';
+let alertListScheduled = false;
+
 // DOM elements
 const videoStream = document.getElementById('video-stream');
 const videoOverlay = document.getElementById('video-overlay');
@@ -25,6 +40,25 @@ const detectionCountEl = document.getElementById('detection-count');
 const totalAlertsEl = document.getElementById('total-alerts');
 const statusText = document.getElementById('status-text');
 const statusDot = document.getElementById('status-dot');
+const detectionCanvas = document.getElementById('detection-canvas');
+const detectionCtx = detectionCanvas.getContext('2d');
+const clientRenderInput = document.getElementById('client-render');
+const stageLatencyEl = document.getElementById('stage-latency');
+const qualityLevelEl = document.getElementById('quality-level');
+const videoCtx = videoStream.getContext('2d');
+const alertList = document.getElementById('alert-list');
+const alertProcessingEl = document.getElementById('alert-processing');
+
+const MAX_ALERTS = 500;
+const ALERT_ROW_HEIGHT = 150;
+const MAX_TIMING_SAMPLES = 500;
+const TIMING_REPORT_INTERVAL = 2000;
+
+const CLASS_COLORS = {
+    severe: '#ff0000',
+    moderate: '#ffa500',
+    fall: '#ffff00'
+};
 
 // FIXED: Comprehensive Socket.IO event handlers
 socket.on('connect', function() {
@@ -63,34 +97,104 @@ document.querySelectorAll('input[name="source"]').forEach(radio => {
     });
 });
 
-// File upload
+// File upload - resumable chunks; monitoring can start once the first chunk is in
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+let currentUploadId = null;
+
+function uploadKey(file) {
+    return `sos-upload:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function openUpload(file) {
+    // Resume an upload of the same file if the server still has it
+    const savedId = localStorage.getItem(uploadKey(file));
+    if (savedId) {
+        const response = await fetch(`/api/uploads/${savedId}`);
+        if (response.ok) {
+            return response.json();
+        }
+        localStorage.removeItem(uploadKey(file));
+    }
+    
+    const response = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    const upload = await response.json();
+    if (!response.ok) {
+        throw new Error(upload.error || 'Could not start upload');
+    }
+    localStorage.setItem(uploadKey(file), upload.upload_id);
+    return upload;
+}
+
+async function sendChunk(uploadId, file, offset) {
+    const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+    
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(`/api/uploads/${uploadId}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: chunk
+            });
+            const status = await response.json();
+            // 409 means the server is elsewhere; carry on from its offset
+            if (response.ok || response.status === 409) {
+                return status.received;
+            }
+            throw new Error(status.error || `HTTP ${response.status}`);
+        } catch (error) {
+            if (attempt >= UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            console.warn(`Chunk at ${offset} failed, retrying:`, error);
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+        }
+    }
+}
+
+async function uploadFile(file) {
+    const upload = await openUpload(file);
+    currentUploadId = upload.upload_id;
+    let received = upload.received;
+    
+    while (received < file.size) {
+        received = await sendChunk(upload.upload_id, file, received);
+        startBtn.disabled = isMonitoring;
+        if (!isMonitoring) {
+            updateStatus(`Uploading video... ${Math.floor(received / file.size * 100)}%`, 'monitoring');
+        }
+    }
+    
+    localStorage.removeItem(uploadKey(file));
+    return upload.upload_id;
+}
+
 fileInput.addEventListener('change', function() {
-    if (this.files[0]) {
-        const formData = new FormData();
-        formData.append('video', this.files[0]);
-        
-        updateStatus('Uploading video...', 'monitoring');
-        
-        fetch('/upload', {
-            method: 'POST',
-            body: formData
-        })
-        .then(response => response.json())
-        .then(data => {
-            console.log('Upload response:', data);
-            if (data.success) {
+    const file = this.files[0];
+    if (!file) {
+        return;
+    }
+    
+    currentUploadId = null;
+    startBtn.disabled = true;
+    updateStatus('Uploading video...', 'monitoring');
+    
+    uploadFile(file)
+        .then(uploadId => {
+            console.log('Upload complete:', uploadId);
+            if (!isMonitoring) {
                 updateStatus('Video uploaded successfully', 'ready');
-                startBtn.disabled = false;
-            } else {
-                updateStatus('Upload failed', 'ready');
-                alert('Upload failed: ' + data.error);
             }
         })
         .catch(error => {
             updateStatus('Upload error', 'ready');
             console.error('Upload error:', error);
+            alert('Upload failed: ' + error.message);
         });
-    }
 });
 
 // RTSP handling
@@ -100,7 +204,7 @@ function checkStartButtonState() {
     const sourceType = document.querySelector('input[name="source"]:checked').value;
     
     if (sourceType === 'file') {
-        startBtn.disabled = !fileInput.files[0];
+        startBtn.disabled = !currentUploadId;
     } else {
         startBtn.disabled = !rtspInput.value.trim();
     }
@@ -115,7 +219,9 @@ startBtn.addEventListener('click', function() {
     
     socket.emit('start_monitoring', {
         source: source,
-        type: sourceType
+        type: sourceType,
+        upload_id: sourceType === 'file' ? currentUploadId : null,
+        render_mode: renderMode()
     });
     
     startBtn.disabled = true;
@@ -124,15 +230,29 @@ startBtn.addEventListener('click', function() {
 
 // Stop monitoring
 stopBtn.addEventListener('click', function() {
-    console.log('⏹️ Stopping monitoring');
-    socket.emit('stop_monitoring');
+    console.log('⏹️ Stopping monitoring:', currentStreamId);
+    socket.emit('stop_monitoring', { stream_id: currentStreamId });
     stopBtn.disabled = true;
 });
 
+// Switch between server-drawn video and browser-drawn detections
+clientRenderInput.addEventListener('change', function() {
+    clearDetections();
+    if (currentStreamId) {
+        socket.emit('set_render_mode', { stream_id: currentStreamId, render_mode: renderMode() });
+    }
+});
+
+function renderMode() {
+    return clientRenderInput.checked ? 'client' : 'server';
+}
+
 // FIXED: Socket event handlers with detailed logging
 socket.on('monitoring_started', function(data) {
     console.log('✅ Monitoring started:', data);
     isMonitoring = true;
+    currentStreamId = data.stream_id;
+    frameTiming = newFrameTiming();
     startBtn.disabled = true;
     stopBtn.disabled = false;
     updateStatus('Monitoring active', 'monitoring');
@@ -141,7 +261,9 @@ socket.on('monitoring_started', function(data) {
 
 socket.on('monitoring_stopped', function(data) {
     console.log('⏹️ Monitoring stopped:', data);
+    if (!isCurrentStream(data)) return;
     isMonitoring = false;
+    currentStreamId = null;
     startBtn.disabled = false;
     stopBtn.disabled = true;
     
@@ -155,39 +277,174 @@ socket.on('monitoring_stopped', function(data) {
     }
     
     videoOverlay.style.display = 'flex';
-    videoStream.src = '';
+    resetVideo();
+    clearDetections();
 });
 
 socket.on('monitoring_error', function(data) {
     console.error('❌ Monitoring error:', data);
+    if (!isCurrentStream(data)) return;
     updateStatus('Error: ' + data.error, 'ready');
     startBtn.disabled = false;
     stopBtn.disabled = true;
 });
 
-// FIXED: Video frame handler with better error handling
-socket.on('video_frame', function(data) {
-    console.log('📹 Received frame:', data.frame_count, 'detections:', data.detections?.length || 0);
+// Frames arrive as binary JPEG attachments; the ack lets the server pace this viewer.
+// A frame that is replaced before it is decoded or drawn is dropped, never queued.
+socket.on('video_frame', function(data, ack) {
+    if (ack) ack();
+    if (!isCurrentStream(data) || !data.frame) return;
+    
+    const { frame, ...metadata } = data;
+    frameTiming.received++;
+    if (pendingFrame) frameTiming.dropped++;
+    pendingFrame = {
+        blob: new Blob([frame], { type: 'image/jpeg' }),
+        metadata: metadata,
+        receivedAt: performance.now(),
+        generation: frameGeneration
+    };
+    decodeLatestFrame();
+});
+
+async function decodeLatestFrame() {
+    // Hidden tabs skip decoding; the newest frame is decoded when the tab shows again
+    if (decoding || !pendingFrame || document.hidden) return;
     
+    decoding = true;
+    const frame = pendingFrame;
+    pendingFrame = null;
     try {
-        if (data.frame) {
-            videoStream.src = 'data:image/jpeg;base64,' + data.frame;
-            videoOverlay.style.display = 'none';
-        }
+        const started = performance.now();
+        const bitmap = await decodeFrame(frame.blob);
+        recordTiming(frameTiming.decode_ms, performance.now() - started);
         
-        if (frameCountEl) {
-            frameCountEl.textContent = `Frame: ${data.frame_count}`;
+        if (frame.generation !== frameGeneration) {
+            closeFrame(bitmap);
+            return;
         }
-        
-        if (data.detections && data.detections.length > 0) {
-            detectionCount += data.detections.length;
-            if (detectionCountEl) {
-                detectionCountEl.textContent = `Detections: ${detectionCount}`;
-            }
+        if (readyFrame) {
+            closeFrame(readyFrame.bitmap);
+            frameTiming.dropped++;
+        }
+        readyFrame = { bitmap: bitmap, metadata: frame.metadata, receivedAt: frame.receivedAt };
+        if (!drawScheduled) {
+            drawScheduled = true;
+            requestAnimationFrame(drawLatestFrame);
         }
     } catch (error) {
-        console.error('Error processing video frame:', error);
+        console.error('Error decoding video frame:', error);
+    } finally {
+        decoding = false;
+        decodeLatestFrame();
+    }
+}
+
+function decodeFrame(blob) {
+    if (window.createImageBitmap) return createImageBitmap(blob);
+    
+    // Browsers without createImageBitmap decode through an <img>, which drawImage accepts too
+    return new Promise(function(resolve, reject) {
+        const url = URL.createObjectURL(blob);
+        const image = new Image();
+        image.onload = function() {
+            URL.revokeObjectURL(url);
+            resolve(image);
+        };
+        image.onerror = function() {
+            URL.revokeObjectURL(url);
+            reject(new Error('Could not decode frame'));
+        };
+        image.src = url;
+    });
+}
+
+function closeFrame(bitmap) {
+    if (bitmap.close) bitmap.close();
+}
+
+function drawLatestFrame() {
+    drawScheduled = false;
+    const frame = readyFrame;
+    readyFrame = null;
+    if (!frame) return;
+    
+    const bitmap = frame.bitmap;
+    if (videoStream.width !== bitmap.width || videoStream.height !== bitmap.height) {
+        videoStream.width = bitmap.width;
+        videoStream.height = bitmap.height;
+    }
+    videoCtx.drawImage(bitmap, 0, 0);
+    closeFrame(bitmap);
+    
+    frameTiming.drawn++;
+    recordTiming(frameTiming.display_ms, performance.now() - frame.receivedAt);
+    videoOverlay.style.display = 'none';
+    
+    if (frameCountEl) {
+        frameCountEl.textContent = `Frame: ${frame.metadata.frame_count}`;
+    }
+    updateDetectionCount(frame.metadata.detection_count);
+}
+
+function resetVideo() {
+    frameGeneration++;
+    pendingFrame = null;
+    if (readyFrame) {
+        closeFrame(readyFrame.bitmap);
+        readyFrame = null;
+    }
+    videoCtx.clearRect(0, 0, videoStream.width, videoStream.height);
+}
+
+document.addEventListener('visibilitychange', decodeLatestFrame);
+
+// Decode and receive-to-display timings go back to the server's stage histograms
+function newFrameTiming() {
+    return { decode_ms: [], display_ms: [], received: 0, drawn: 0, dropped: 0 };
+}
+
+function recordTiming(samples, ms) {
+    if (samples.length < MAX_TIMING_SAMPLES) samples.push(Math.round(ms * 10) / 10);
+}
+
+setInterval(function() {
+    if (!currentStreamId || !socket.connected || !frameTiming.received) return;
+    socket.emit('client_timing', Object.assign({ stream_id: currentStreamId }, frameTiming));
+    frameTiming = newFrameTiming();
+}, TIMING_REPORT_INTERVAL);
+
+// Client render mode: compact detections at inference rate, drawn on the canvas
+socket.on('detections', function(data) {
+    if (!isCurrentStream(data) || renderMode() !== 'client') return;
+    
+    drawDetections(data);
+    if (frameCountEl) {
+        frameCountEl.textContent = `Frame: ${data.frame_count}`;
     }
+    updateDetectionCount(data.detection_count);
+});
+
+// Periodic per-stage latency summary: show where this stream's frame budget goes
+socket.on('pipeline_stats', function(data) {
+    updateQualityLevel(currentStreamId && data.quality && data.quality[currentStreamId]);
+    
+    const stages = currentStreamId && data.stages.streams[currentStreamId];
+    if (!stageLatencyEl || !stages) return;
+    
+    const slowest = Object.entries(stages)
+        .filter(([name, stats]) => stats.count && name !== 'capture_to_alert')
+        .sort((a, b) => b[1].p95_ms - a[1].p95_ms)
+        .slice(0, 3);
+    stageLatencyEl.textContent = slowest
+        .map(([name, stats]) => `${name} ${stats.p95_ms.toFixed(1)}ms`)
+        .join(' · ');
+});
+
+socket.on('render_mode_changed', function(data) {
+    console.log('🎨 Render mode:', data.render_mode);
+    clientRenderInput.checked = data.render_mode === 'client';
+    clearDetections();
 });
 
 socket.on('alert_processing', function(data) {
@@ -216,54 +473,174 @@ socket.on('alert_error', function(data) {
 });
 
 // Helper functions (same as before)
+function updateQualityLevel(quality) {
+    if (!qualityLevelEl) return;
+    if (!quality || !quality.enabled) {
+        qualityLevelEl.textContent = '';
+        return;
+    }
+    
+    const settings = quality.settings;
+    qualityLevelEl.textContent = `Q${quality.level}/${quality.max_level} · ${settings.video_fps}fps ` +
+        `q${settings.jpeg_quality} ${settings.display_size.join('x')} ×${settings.inference_stride}`;
+    qualityLevelEl.classList.toggle('degraded', quality.level > 0);
+    
+    const decision = quality.last_decision;
+    qualityLevelEl.title = `Adaptive quality - p95 ${quality.p95_ms ?? '-'}ms, target ${quality.target_ms}ms` +
+        (decision ? `\nLast change: ${decision.from} → ${decision.to} (${decision.reason})` : '');
+}
+
+function updateDetectionCount(count) {
+    if (count === undefined || !detectionCountEl) return;
+    detectionCount = count;
+    detectionCountEl.textContent = `Detections: ${detectionCount}`;
+}
+
+function clearDetections() {
+    detectionCtx.clearRect(0, 0, detectionCanvas.width, detectionCanvas.height);
+}
+
+function drawDetections(data) {
+    const [frameW, frameH] = data.size;
+    if (detectionCanvas.width !== frameW || detectionCanvas.height !== frameH) {
+        detectionCanvas.width = frameW;
+        detectionCanvas.height = frameH;
+    }
+    
+    clearDetections();
+    detectionCtx.lineWidth = 2;
+    detectionCtx.font = 'bold 13px sans-serif';
+    
+    for (let i = 0; i < data.classes.length; i++) {
+        const [x1, y1, x2, y2] = data.boxes.slice(i * 4, i * 4 + 4);
+        const color = CLASS_COLORS[data.classes[i]] || '#ffffff';
+        const track = data.tracks && data.tracks[i] ? ` #${data.tracks[i]}` : '';
+        const label = `${data.classes[i].toUpperCase()}${track} ${data.scores[i].toFixed(2)}`;
+        const labelW = detectionCtx.measureText(label).width + 6;
+        
+        detectionCtx.strokeStyle = color;
+        detectionCtx.strokeRect(x1, y1, x2 - x1, y2 - y1);
+        detectionCtx.fillStyle = color;
+        detectionCtx.fillRect(x1, y1 - 18, labelW, 18);
+        detectionCtx.fillStyle = '#ffffff';
+        detectionCtx.fillText(label, x1 + 3, y1 - 5);
+    }
+    
+    detectionCtx.fillStyle = '#00ff00';
+    detectionCtx.font = 'bold 14px sans-serif';
+    detectionCtx.fillText(`Inference: ${data.fps}FPS | Frame: ${data.frame_count}`, 10, 22);
+}
+
+function isCurrentStream(data) {
+    // Events without a stream id (or before we know ours) apply to this view
+    return !data.stream_id || !currentStreamId || data.stream_id === currentStreamId;
+}
+
 function updateStatus(text, type) {
     console.log(`Status: ${text} (${type})`);
     if (statusText) statusText.textContent = text;
     if (statusDot) statusDot.className = `status-dot ${type}`;
 }
 
+// One indicator for however many analyses are in flight
 function showProcessingAlert(type) {
-    const processingHtml = `
-        <div class="processing-alert" id="processing-indicator">
+    pendingAnalyses++;
+    lastProcessingType = type;
+    renderProcessingAlert();
+}
+
+function removeProcessingAlert() {
+    pendingAnalyses = Math.max(0, pendingAnalyses - 1);
+    renderProcessingAlert();
+}
+
+function renderProcessingAlert() {
+    if (!pendingAnalyses) {
+        alertProcessingEl.innerHTML = '';
+        return;
+    }
+    
+    const label = pendingAnalyses > 1 ? `${pendingAnalyses} incidents` : `${escapeHtml(lastProcessingType.toUpperCase())} incident`;
+    alertProcessingEl.innerHTML = `
+        <div class="processing-alert">
             <i class="fas fa-spinner"></i>
-            <strong>Processing ${type.toUpperCase()} incident...</strong>
+            <strong>Processing ${label}...</strong>
             <p>AI analysis in progress...</p>
         </div>
     `;
-    
+    hideNoAlerts();
+}
+
+function hideNoAlerts() {
     const noAlerts = alertsContainer.querySelector('.no-alerts');
     if (noAlerts) noAlerts.style.display = 'none';
+}
+
+function addEmergencyAlert(alertData) {
+    alertHistory.unshift(alertData);
+    if (alertHistory.length > MAX_ALERTS) alertHistory.length = MAX_ALERTS;
+    
+    // Keep the rows the user is reading in place while new alerts arrive on top
+    if (alertsContainer.scrollTop > alertList.offsetTop) {
+        alertsContainer.scrollTop += ALERT_ROW_HEIGHT;
+    }
     
-    alertsContainer.insertAdjacentHTML('afterbegin', processingHtml);
+    hideNoAlerts();
+    scheduleAlertList();
 }
 
-function removeProcessingAlert() {
-    const processing = document.getElementById('processing-indicator');
-    if (processing) processing.remove();
+function scheduleAlertList() {
+    if (alertListScheduled) return;
+    alertListScheduled = true;
+    requestAnimationFrame(renderAlertList);
 }
 
-function addEmergencyAlert(alertData) {
-    const alertHtml = `
-        <div class="alert-item ${alertData.type.toLowerCase()}" onclick="showAlertModal('${alertData.alert_id}', ${JSON.stringify(alertData).replace(/"/g, '&quot;')})">
+function renderAlertList() {
+    alertListScheduled = false;
+    alertList.style.height = `${alertHistory.length * ALERT_ROW_HEIGHT}px`;
+    
+    const top = alertsContainer.scrollTop - alertList.offsetTop;
+    const first = Math.max(0, Math.floor(top / ALERT_ROW_HEIGHT) - 2);
+    const last = Math.min(alertHistory.length, Math.ceil((top + alertsContainer.clientHeight) / ALERT_ROW_HEIGHT) + 2);
+    
+    const rows = [];
+    for (let i = first; i < last; i++) {
+        rows.push(alertRowHtml(alertHistory[i], i));
+    }
+    alertList.innerHTML = rows.join('');
+}
+
+function alertRowHtml(alertData, index) {
+    const analysis = alertData.analysis || '';
+    return `
+        <div class="alert-item ${escapeHtml(alertData.type.toLowerCase())}" data-alert-id="${escapeHtml(alertData.alert_id)}" style="top: ${index * ALERT_ROW_HEIGHT}px">
             <div class="alert-header">
-                <span class="alert-type">${alertData.type}</span>
-                <span class="alert-time">${alertData.timestamp}</span>
+                <span class="alert-type">${escapeHtml(alertData.type)}</span>
+                <span class="alert-time">${escapeHtml(alertData.timestamp)}</span>
             </div>
             <div class="alert-confidence">
                 Confidence: ${(alertData.confidence * 100).toFixed(1)}%
             </div>
             <div class="alert-analysis">
-                ${alertData.analysis.substring(0, 100)}${alertData.analysis.length > 100 ? '...' : ''}
+                ${escapeHtml(analysis.substring(0, 100))}${analysis.length > 100 ? '...' : ''}
             </div>
         </div>
     `;
-    
-    const noAlerts = alertsContainer.querySelector('.no-alerts');
-    if (noAlerts) noAlerts.style.display = 'none';
-    
-    alertsContainer.insertAdjacentHTML('afterbegin', alertHtml);
 }
 
+function escapeHtml(text) {
+    const entities = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+    return String(text ?? '').replace(/[&<>"']/g, c => entities[c]);
+}
+
+alertsContainer.addEventListener('scroll', scheduleAlertList, { passive: true });
+
+alertList.addEventListener('click', function(event) {
+    const item = event.target.closest('.alert-item');
+    const alertData = item && alertHistory.find(a => a.alert_id === item.dataset.alertId);
+    if (alertData) showAlertModal(alertData.alert_id, alertData);
+});
+
 function showAlertModal(alertId, alertData) {
     const modal = document.getElementById('alert-modal');
     const modalTitle = document.getElementById('modal-title');
@@ -274,19 +651,25 @@ function showAlertModal(alertId, alertData) {
     const modalHtml = `
         <div class="alert-details">
             <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-bottom: 20px;">
-                <div><strong>Alert ID:</strong> ${alertData.alert_id}</div>
-                <div><strong>Timestamp:</strong> ${alertData.timestamp}</div>
-                <div><strong>Type:</strong> ${alertData.type}</div>
+                <div><strong>Alert ID:</strong> ${escapeHtml(alertData.alert_id)}</div>
+                <div><strong>Timestamp:</strong> ${escapeHtml(alertData.timestamp)}</div>
+                <div><strong>Type:</strong> ${escapeHtml(alertData.type)}</div>
                 <div><strong>Confidence:</strong> ${(alertData.confidence * 100).toFixed(1)}%</div>
+                <div><strong>Stream:</strong> ${escapeHtml(alertData.stream_id || '-')}</div>
             </div>
             <div style="margin-bottom: 20px;">
                 <strong>AI Analysis:</strong>
-                <p style="margin-top: 10px; line-height: 1.5;">${alertData.analysis}</p>
+                <p style="margin-top: 10px; line-height: 1.5;">${escapeHtml(alertData.analysis)}</p>
             </div>
             <div>
                 <strong>Evidence Image:</strong>
-                <img src="data:image/jpeg;base64,${alertData.image}" alt="Evidence" style="max-width: 100%; border-radius: 10px; margin-top: 10px;">
+                <img src="${escapeHtml(alertData.evidence_url)}" alt="Evidence" loading="lazy" style="max-width: 100%; border-radius: 10px; margin-top: 10px;">
             </div>
+            ${alertData.clip_url ? `
+            <div style="margin-top: 20px;">
+                <strong>Incident Clip:</strong>
+                <video src="${escapeHtml(alertData.clip_url)}" controls preload="none" style="max-width: 100%; border-radius: 10px; margin-top: 10px;"></video>
+            </div>` : ''}
         </div>
     `;
     
@@ -0,0 +1,916 @@
+import time
+import uuid
+import threading
+from queue import Queue, Empty
+
+import cv2
+from PIL import Image
+
+from detection_model import EmergencyDetectionSystem
+from inference_scheduler import InferenceScheduler
+from process_workers import ProcessInferencePool
+from postprocess import Detections, postprocess_result
+from frame_reader import LatestFrameReader, FrameSkipController
+from frame_broadcaster import FrameBroadcaster
+from alert_executor import AlertExecutor
+from analysis_cache import AnalysisCache
+from tracker import IncidentTracker
+from motion_gate import MotionGate, build_roi_mask
+from tiling import TiledInference, validate_tiling
+from quality_controller import QualityController
+from metrics import PipelineMetrics
+from logging_setup import get_logger, get_stream_logger, is_stream_debug, get_logging_stats
+
+
+log = get_logger('streams')
+
+
+def get_color_for_class(class_name):
+    colors = {
+        'severe': (0, 0, 255),     # Red
+        'moderate': (0, 165, 255), # Orange
+        'fall': (0, 255, 255)      # Yellow
+    }
+    return colors.get(class_name, (255, 255, 255))
+
+
+def draw_detections(display_frame, detections):
+    """Draw boxes and labels onto the display frame (server render mode)"""
+    for class_name, confidence, _, (x1_disp, y1_disp, x2_disp, y2_disp) in detections:
+        color = get_color_for_class(class_name)
+        cv2.rectangle(display_frame, (x1_disp, y1_disp), (x2_disp, y2_disp), color, 2)
+
+        # Add label with background
+        label = f"{class_name.upper()} {confidence:.2f}"
+        (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+        cv2.rectangle(display_frame, (x1_disp, y1_disp - label_h - 10),
+                    (x1_disp + label_w, y1_disp), color, -1)
+        cv2.putText(display_frame, label, (x1_disp, y1_disp - 5),
+                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+
+def crop_incident(frame, bbox, pad=30):
+    """Copy out the padded incident region so alerts never hold a full frame"""
+    x1, y1, x2, y2 = bbox
+    h, w = frame.shape[:2]
+    return frame[max(0, y1 - pad):min(h, y2 + pad), max(0, x1 - pad):min(w, x2 + pad)].copy()
+
+
+def quality_knobs(quality):
+    """(knob, numeric value) pairs for the metrics export"""
+    width, height = quality.display_size
+    return (('video_fps', quality.video_fps), ('jpeg_quality', quality.jpeg_quality),
+            ('display_width', width), ('display_height', height), ('inference_stride', quality.inference_stride))
+
+
+RENDER_MODES = ('server', 'client')
+EXECUTION_MODES = ('thread', 'process')
+
+# Dashboard timing reports: (stage, report key of millisecond samples) and frame outcomes
+CLIENT_STAGES = (('client_decode', 'decode_ms'), ('client_display', 'display_ms'))
+CLIENT_FRAME_OUTCOMES = ('received', 'drawn', 'dropped')
+MAX_CLIENT_SAMPLES = 500
+
+
+class MonitoringStream:
+    """State and worker threads for one monitored video source"""
+
+    def __init__(self, manager, stream_id, source, render_mode='server', client_video_fps=5, roi=None,
+                 upload=None, tiling=None, latency_target_ms=None):
+        self.manager = manager
+        self.stream_id = stream_id
+        self.source = source
+        self.log = get_stream_logger(stream_id)
+
+        # Normalized ROI polygons; motion outside them never triggers inference
+        self.roi = roi
+
+        # UploadSession when the source file is still being uploaded
+        self.upload = upload
+
+        # Tiled inference: None follows the config, or True/False/dict of tiling options
+        self.tiling = tiling
+
+        # Frame latency target for the adaptive quality controller (None follows the config)
+        self.latency_target_ms = latency_target_ms
+        self.quality = QualityController(latency_target_ms or 500, enabled=False)
+
+        # 'server' draws boxes into the video; 'client' sends detections as
+        # metadata at inference rate and lets the dashboard draw them
+        self.render_mode = render_mode
+        self.client_video_fps = client_video_fps
+
+        self.is_monitoring = False
+        self.frame_queue = Queue(maxsize=3)
+        self.frame_count = 0
+        self.detection_count = 0
+        self.requested_at = time.time()
+        self.started_at = None
+        self.first_result_at = None
+        self.stopped_at = None
+        self.error = None
+        self.threads = []
+        self.reader = None
+        self.skipper = None
+        self.tracker = None
+        self.gate = None
+        self.tiler = None
+
+    def start(self):
+        """Start the detection and streaming threads for this source"""
+        self.is_monitoring = True
+        self.started_at = time.time()
+
+        self.threads = [
+            threading.Thread(target=self.run_detection_loop, daemon=True),
+            threading.Thread(target=self.run_streaming_loop, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.is_monitoring = False
+
+    def set_render_mode(self, render_mode):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode}")
+        self.render_mode = render_mode
+
+    def make_gate(self, detection_system):
+        if not detection_system.motion_gating:
+            return None
+        return MotionGate(
+            roi=self.roi,
+            pixel_threshold=detection_system.motion_pixel_threshold,
+            min_area=detection_system.motion_min_area,
+            heartbeat=detection_system.motion_heartbeat
+        )
+
+    def make_tiler(self, detection_system):
+        enabled = self.tiling if self.tiling is not None else detection_system.tiling
+        if not enabled:
+            return None
+        options = {
+            'tile_size': detection_system.tile_size,
+            'overlap': detection_system.tile_overlap,
+            'max_tiles': detection_system.tile_max,
+            'min_width': detection_system.tile_min_width,
+            'seed_confidence': detection_system.tile_seed_confidence,
+            'nms_iou': detection_system.tile_nms_iou
+        }
+        if isinstance(self.tiling, dict):
+            options.update(self.tiling)
+        return TiledInference(**options)
+
+    def activity_boxes(self, frame):
+        """Where tiles are worth running besides the coarse pass: motion and live tracks"""
+        boxes = [track.bbox for track in self.tracker.tracks]
+        if self.gate:
+            boxes.extend(self.gate.motion_boxes((frame.shape[1], frame.shape[0])))
+        return boxes
+
+    def infer_batch(self, images):
+        """Submit images together so the scheduler runs them in one batch"""
+        futures = [self.manager.scheduler.submit(self.stream_id, image) for image in images]
+        return [future.result() for future in futures]
+
+    def configure_quality(self, detection_system):
+        self.quality.configure(
+            target_ms=self.latency_target_ms or detection_system.latency_target_ms,
+            enabled=detection_system.adaptive_quality
+        )
+
+    def observe_latency(self, latency):
+        """Feed a frame latency to the quality controller and log any level change"""
+        decision = self.quality.observe(latency)
+        if decision:
+            self.log.info("%s [%s] Quality level %d -> %d (p95 %.0fms, target %dms): %s",
+                          '📉' if decision['to'] > decision['from'] else '📈', self.stream_id,
+                          decision['from'], decision['to'], decision['p95_ms'],
+                          self.quality.target * 1000, decision['settings'])
+
+    def apply_config(self, detection_system):
+        """Pick up reloaded tracking, motion gate, tiling and quality settings without restarting the stream"""
+        self.configure_quality(detection_system)
+        if self.tracker:
+            self.tracker.iou_threshold = detection_system.track_iou_threshold
+            self.tracker.confirm_hits = detection_system.track_confirm_hits
+            self.tracker.confirm_window = detection_system.track_confirm_window
+            self.tracker.max_age = detection_system.track_max_age
+
+        if not detection_system.motion_gating:
+            self.gate = None
+        elif self.gate is None:
+            self.gate = self.make_gate(detection_system)
+        else:
+            self.gate.pixel_threshold = detection_system.motion_pixel_threshold
+            self.gate.min_area = detection_system.motion_min_area
+            self.gate.heartbeat = detection_system.motion_heartbeat
+
+        if self.tracker:
+            self.tiler = self.make_tiler(detection_system)
+
+    def emit(self, event, data):
+        """Emit an event to every client watching this stream"""
+        data['stream_id'] = self.stream_id
+        self.manager.emit(event, data, to=self.stream_id)
+
+    def get_status(self):
+        return {
+            'stream_id': self.stream_id,
+            'source': self.source,
+            'is_monitoring': self.is_monitoring,
+            'frame_count': self.frame_count,
+            'detection_count': self.detection_count,
+            'started_at': self.started_at,
+            'stopped_at': self.stopped_at,
+            'error': self.error,
+            'upload': self.upload.to_dict() if self.upload else None,
+            'render_mode': self.render_mode,
+            'debug': is_stream_debug(self.stream_id),
+            'tracks': self.tracker.get_stats() if self.tracker else None,
+            'motion_gate': self.gate.get_stats() if self.gate else None,
+            'tiling': self.tiler.get_stats() if self.tiler else None,
+            'quality': self.quality.get_stats(),
+            'live': self.reader.is_live if self.reader else None,
+            'frames_dropped': self.reader.frames_dropped if self.reader else 0,
+            'skip_stride': self.skipper.stride if self.skipper else None,
+            'avg_inference_ms': round(self.skipper.avg_latency * 1000, 1)
+                                if self.skipper and self.skipper.avg_latency else None,
+            'time_to_first_detection_ms': round((self.first_result_at - self.requested_at) * 1000)
+                                          if self.first_result_at else None
+        }
+
+    def run_detection_loop(self):
+        """Optimized detection loop with debugging"""
+        detection_system = self.manager.detection_system
+        metrics = self.manager.metrics
+        video_source = self.source
+
+        self.log.info("🎬 [%s] Starting optimized detection on: %s", self.stream_id, video_source)
+        reader = LatestFrameReader(video_source, metrics.histogram('decode', self.stream_id), upload=self.upload)
+
+        if not reader.open():
+            self.is_monitoring = False
+            self.error = f'Cannot open: {video_source}'
+            self.emit('monitoring_error', {'error': self.error})
+            self.forget_metrics()
+            return
+
+        self.log.info("📹 [%s] Video - FPS: %s, Frames: %s, %s", self.stream_id, reader.fps,
+                      reader.total_frames, 'live' if reader.is_live else 'file')
+
+        self.reader = reader
+        self.skipper = FrameSkipController(reader.fps)
+        self.tracker = IncidentTracker(
+            iou_threshold=detection_system.track_iou_threshold,
+            confirm_hits=detection_system.track_confirm_hits,
+            confirm_window=detection_system.track_confirm_window,
+            max_age=detection_system.track_max_age
+        )
+        self.gate = self.make_gate(detection_system)
+        self.tiler = self.make_tiler(detection_system)
+        self.configure_quality(detection_system)
+        quality = self.quality
+        reader.start()
+        last_sequence = 0
+
+        try:
+            while self.is_monitoring:
+                # Always work on the newest decoded frame; stale ones are dropped by the reader
+                # Under load the quality controller stretches the stride further
+                latest = reader.read(min_sequence=last_sequence + self.skipper.stride * quality.inference_stride)
+                if latest is None:
+                    if reader.finished:
+                        self.log.info("📄 [%s] End of video file reached", self.stream_id)
+                        break
+                    continue
+
+                last_sequence, frame, captured_at = latest
+                self.frame_count = last_sequence
+
+                # Resize for optimal YOLO performance
+                original_height, original_width = frame.shape[:2]
+                display_size = quality.display_size
+                with metrics.time('resize', self.stream_id):
+                    display_frame = cv2.resize(frame, display_size)
+
+                # Skip the model on static scenes; live tracks keep it running so they can confirm or expire
+                gate_reason = 'ungated'
+                if self.gate:
+                    with metrics.time('motion_gate', self.stream_id):
+                        gate_reason = self.gate.check(frame, force=bool(self.tracker.tracks))
+
+                if gate_reason is None:
+                    detections = Detections.empty(detection_system.names)
+                    inference_time = 0
+                else:
+                    # YOLO inference, batched with the other streams
+                    if self.tiler and self.tiler.applies(frame):
+                        # Coarse pass plus tiles around activity; rows come back in frame pixels
+                        start_time = time.time()
+                        result = self.tiler.detect(frame, self.infer_batch, self.activity_boxes(frame))
+                        inference_size = (original_width, original_height)
+                    else:
+                        with metrics.time('resize', self.stream_id):
+                            inference_frame = cv2.resize(frame, (640, 640))
+                        start_time = time.time()
+                        result = self.manager.scheduler.infer(self.stream_id, inference_frame)
+                        inference_size = (640, 640)
+                    inference_time = time.time() - start_time
+                    if self.first_result_at is None:
+                        self.first_result_at = time.time()
+                        self.log.info("⏱️ [%s] First detection %.0fms after start was requested",
+                                      self.stream_id, (self.first_result_at - self.requested_at) * 1000)
+                    metrics.observe('inference', inference_time, self.stream_id)
+                    self.skipper.update(inference_time)
+
+                    # Process detections on the whole box tensor at once
+                    with metrics.time('postprocess', self.stream_id):
+                        detections = postprocess_result(
+                            result,
+                            detection_system.names,
+                            detection_system.get_threshold_table(),
+                            inference_size=inference_size,
+                            original_size=(original_width, original_height),
+                            display_size=display_size
+                        )
+                    self.detection_count += len(detections)
+
+                    # Per-frame trace, only for streams switched to debug
+                    self.log.debug("🔍 [%s] frame %d: %d/%d boxes above threshold, gate=%s, inference %.1fms, stride %d",
+                                   self.stream_id, self.frame_count, len(detections), detections.candidates,
+                                   gate_reason, inference_time * 1000, self.skipper.stride)
+
+                    with metrics.time('tracking', self.stream_id):
+                        confirmed = self.tracker.update(detections)
+
+                    # One alert per confirmed incident track, on the shared alert pipeline
+                    for index, track in confirmed:
+                        clip_file = None
+                        if self.manager.clip_recorder:
+                            clip_file = self.manager.clip_recorder.request_clip(
+                                self.stream_id, captured_at,
+                                f"clip_{self.stream_id}_{track.track_id}_{int(captured_at * 1000)}"
+                            )
+                        alert_data = {
+                            'stream_id': self.stream_id,
+                            'track_id': track.track_id,
+                            'crop': crop_incident(frame, detections.boxes[index].tolist()),
+                            'bbox': detections.boxes[index].tolist(),
+                            'class_name': detections.class_name(index),
+                            'confidence': float(detections.confidences[index]),
+                            'captured_at': captured_at,
+                            'clip_file': clip_file
+                        }
+                        self.manager.queue_alert(alert_data)
+
+                fps_actual = 1 / inference_time if inference_time > 0 else 0
+
+                if self.render_mode == 'server':
+                    with metrics.time('draw', self.stream_id):
+                        draw_detections(display_frame, detections)
+
+                        # Add performance overlay
+                        inference_label = f"{fps_actual:.1f}FPS" if gate_reason else "idle (no motion)"
+                        cv2.putText(display_frame, f"Inference: {inference_label} | Frame: {self.frame_count}",
+                                   (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                        cv2.putText(display_frame, f"Detections: {self.detection_count}",
+                                   (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+                elif self.manager.broadcaster.has_viewers(self.stream_id):
+                    # Compact metadata at full inference rate; the dashboard draws the boxes
+                    emit_started = time.perf_counter()
+                    self.emit('detections', {
+                        'frame_count': self.frame_count,
+                        'size': list(display_size),
+                        'boxes': detections.display_boxes.ravel().tolist(),
+                        'classes': [detections.class_name(i) for i in range(len(detections))],
+                        'scores': [round(c, 3) for c in detections.confidences.tolist()],
+                        'tracks': detections.track_ids.tolist(),
+                        'fps': round(fps_actual, 1),
+                        'gated': gate_reason is None,
+                        'detection_count': self.detection_count
+                    })
+                    metrics.observe('emit', time.perf_counter() - emit_started, self.stream_id)
+
+                # Queue frame for streaming
+                frame_data = {
+                    'frame': display_frame,
+                    'frame_count': self.frame_count,
+                    'detections': detections.to_list(),
+                    'inference_time': inference_time,
+                    'fps': fps_actual,
+                    'captured_at': captured_at,
+                    'queued_at': time.time()
+                }
+
+                self.observe_latency(time.time() - captured_at)
+
+                # Non-blocking frame queuing
+                try:
+                    if not self.frame_queue.full():
+                        self.frame_queue.put_nowait(frame_data)
+                    else:
+                        try:
+                            self.frame_queue.get_nowait()
+                            self.frame_queue.put_nowait(frame_data)
+                        except:
+                            pass
+                except:
+                    pass
+
+        except Exception as e:
+            self.log.exception("❌ [%s] Detection error: %s", self.stream_id, e)
+            self.error = str(e)
+            self.emit('monitoring_error', {'error': str(e)})
+        finally:
+            reader.stop()
+            self.is_monitoring = False
+            self.stopped_at = time.time()
+            self.log.info("🏁 [%s] Detection finished. %d frames, %d detections",
+                          self.stream_id, self.frame_count, self.detection_count)
+            self.emit('monitoring_stopped', {'status': 'stopped'})
+            self.forget_metrics()
+
+    def forget_metrics(self, join_timeout=5.0):
+        """Drop this stream's metric series once its streaming thread is done with them
+
+        Per-stream series would otherwise pile up in /metrics for every
+        camera ever run. A stream restarted under the same id keeps its
+        series.
+        """
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(join_timeout)
+        manager = self.manager
+        with manager.lock:
+            if manager.streams.get(self.stream_id) not in (self, None):
+                return
+            manager.metrics.remove_stream(self.stream_id)
+            manager.client_frames.pop(self.stream_id, None)
+
+    def run_streaming_loop(self, max_fps=30):
+        """Stream frames to the clients watching this stream"""
+        broadcaster = self.manager.broadcaster
+        metrics = self.manager.metrics
+        recorder = self.manager.clip_recorder
+        ring = recorder.get_ring(self.stream_id) if recorder else None
+        last_sent = 0
+        last_buffered = 0
+
+        while self.is_monitoring:
+            try:
+                frame_data = self.frame_queue.get(timeout=0.5)
+            except Empty:
+                continue
+            metrics.observe('frame_queue_wait', time.time() - frame_data['queued_at'], self.stream_id)
+
+            # Cap the outgoing rate; client render mode only needs a slow background video
+            video_fps = min(max_fps if self.render_mode == 'server' else self.client_video_fps,
+                            self.quality.video_fps)
+            has_viewers = broadcaster.has_viewers(self.stream_id)
+            send_video = has_viewers and time.time() - last_sent >= 1.0 / video_fps
+            buffer_clip = ring is not None and frame_data['captured_at'] - last_buffered >= 1.0 / recorder.fps
+
+            # Nobody watching and nothing to record: skip the encode entirely
+            if not send_video and not buffer_clip:
+                if not has_viewers:
+                    broadcaster.skip()
+                continue
+
+            try:
+                # One encode serves both the viewers and the clip buffer
+                with metrics.time('encode', self.stream_id):
+                    jpeg = broadcaster.encode(frame_data['frame'], self.quality.jpeg_quality)
+
+                if buffer_clip:
+                    ring.append(frame_data['captured_at'], jpeg)
+                    last_buffered = frame_data['captured_at']
+
+                if send_video:
+                    emit_started = time.perf_counter()
+                    broadcaster.broadcast(self.stream_id, None, {
+                        'frame_count': frame_data['frame_count'],
+                        'detection_count': self.detection_count,
+                        'detections': frame_data['detections'],
+                        'fps': f"{frame_data['fps']:.1f}",
+                        'inference_time': f"{frame_data['inference_time']*1000:.1f}ms",
+                        'latency': f"{(time.time() - frame_data['captured_at'])*1000:.0f}ms"
+                    }, jpeg=jpeg)
+                    metrics.observe('emit', time.perf_counter() - emit_started, self.stream_id)
+                    last_sent = time.time()
+                    self.observe_latency(last_sent - frame_data['captured_at'])
+
+            except Exception as e:
+                self.log.warning("⚠️ [%s] Streaming error: %s", self.stream_id, e)
+                time.sleep(0.1)
+
+        if recorder:
+            recorder.release_ring(self.stream_id)
+
+
+class StreamManager:
+    """Runs many monitored streams on one shared model and alert pipeline"""
+
+    def __init__(self, emit, max_streams=64, max_batch_size=8, max_batch_wait=0.02, client_video_fps=5,
+                 alert_workers=4, analysis_timeout=8.0, analysis_cache=None, alert_store=None,
+                 clip_recorder=None, execution_mode='thread', inference_workers=None, detection_system=None,
+                 metrics=None, config=None, notifier=None, frame_acks=True):
+        self.emit = emit
+        self.max_streams = max_streams
+        self.client_video_fps = client_video_fps
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {execution_mode}")
+        self.execution_mode = execution_mode
+        self.inference_workers = inference_workers
+
+        # A prebuilt detection system (e.g. the benchmark's stub) is used as-is in thread mode
+        self.detection_system = detection_system
+        self.config = config
+        self.created_at = time.time()
+        self.startup = {}
+        self.alert_store = alert_store
+        self.metrics = metrics or PipelineMetrics()
+        self.scheduler = None
+        self.broadcaster = FrameBroadcaster(emit, use_acks=frame_acks)
+        self.clip_recorder = clip_recorder
+        self.notifier = notifier
+        self.analysis_cache = analysis_cache or AnalysisCache()
+        self.alert_executor = AlertExecutor(
+            self.process_emergency_alert,
+            max_workers=alert_workers,
+            call_timeout=analysis_timeout
+        )
+        self.streams = {}
+        self.client_frames = {}  # stream_id -> {outcome: count} reported by dashboards
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def get_detection_system(self):
+        """Load the shared detection model once for all streams
+
+        Loading has its own lock: starting a process pool can take minutes
+        and must not hold up stream bookkeeping under self.lock.
+        """
+        with self.load_lock:
+            if self.scheduler is None:
+                if self.execution_mode == 'process':
+                    # Detection runs in worker processes; this process only needs the class names
+                    detection_system = EmergencyDetectionSystem(
+                        alert_store=self.alert_store, load_model=False, config=self.config
+                    )
+                    scheduler = ProcessInferencePool(
+                        detection_system.get_model_config(),
+                        workers=self.inference_workers,
+                        slots=self.max_streams + 2 * self.max_batch_size,
+                        max_batch_size=self.max_batch_size,
+                        max_wait=self.max_batch_wait
+                    )
+                    scheduler.start()
+                    detection_system.names = scheduler.names
+                    self.detection_system = detection_system
+                else:
+                    self.detection_system = self.detection_system or EmergencyDetectionSystem(
+                        alert_store=self.alert_store, config=self.config
+                    )
+                    scheduler = InferenceScheduler(
+                        self.predict_batch,
+                        max_batch_size=self.max_batch_size,
+                        max_wait=self.max_batch_wait
+                    )
+                    scheduler.start()
+                detection_system = self.detection_system
+                self.scheduler = scheduler
+                self.startup.update({
+                    'detector_ready_s': round(time.time() - self.created_at, 3),
+                    'model_load_s': round(detection_system.load_time, 3) if detection_system.load_time else None,
+                    'warmup_s': round(detection_system.warmup_time, 3) if detection_system.warmup_time else None
+                })
+            return self.detection_system
+
+    def preload(self):
+        """Load and warm up the detector ahead of the first stream"""
+        try:
+            self.get_detection_system()
+        except Exception as e:
+            log.error("❌ Detector preload failed, will retry on first stream: %s", e)
+
+    def apply_config(self, config):
+        """Hot-reload settings into the shared detection system and every running stream"""
+        self.config = config
+        if self.detection_system is None:
+            return set()
+        changed = self.detection_system.apply_config(config)
+        for stream in list(self.streams.values()):
+            stream.apply_config(self.detection_system)
+        return changed
+
+    def predict_batch(self, frames):
+        """Run one model call over frames from several streams"""
+        return self.detection_system.yolo(frames, verbose=False)
+
+    def start_stream(self, source, stream_id=None, render_mode='server', roi=None, upload=None, tiling=None,
+                     latency_target_ms=None):
+        """Start monitoring a source, returning its MonitoringStream"""
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode}")
+        build_roi_mask(roi, (160, 160))
+        validate_tiling(tiling)
+        if latency_target_ms is not None and latency_target_ms <= 0:
+            raise ValueError("latency_target_ms must be positive")
+        requested_at = time.time()
+        self.get_detection_system()
+
+        with self.lock:
+            stream_id = stream_id or f"cam-{uuid.uuid4().hex[:8]}"
+            existing = self.streams.get(stream_id)
+            if existing and existing.is_monitoring:
+                raise ValueError(f"Stream {stream_id} is already running")
+
+            active = sum(1 for s in self.streams.values() if s.is_monitoring)
+            if active >= self.max_streams:
+                raise ValueError(f"Stream limit reached ({self.max_streams})")
+
+            stream = MonitoringStream(self, stream_id, source, render_mode, self.client_video_fps, roi, upload,
+                                      tiling, latency_target_ms)
+            stream.requested_at = requested_at
+            self.streams[stream_id] = stream
+
+            self.alert_executor.start()
+
+        stream.start()
+        log.info("▶️ Stream %s started (%d/%d active)", stream_id, active + 1, self.max_streams)
+        return stream
+
+    def stop_stream(self, stream_id):
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            return False
+        stream.stop()
+        return True
+
+    def remove_stream(self, stream_id):
+        """Stop a stream if it runs and forget it; its metric series go when its threads finish"""
+        with self.lock:
+            stream = self.streams.pop(stream_id, None)
+        if stream is not None:
+            stream.stop()
+        return stream is not None
+
+    def stop_all(self):
+        for stream in list(self.streams.values()):
+            stream.stop()
+
+    def get_stream(self, stream_id):
+        return self.streams.get(stream_id)
+
+    def list_streams(self):
+        return [stream.get_status() for stream in list(self.streams.values())]
+
+    def add_viewer(self, stream_id, sid):
+        self.broadcaster.add_viewer(stream_id, sid)
+
+    def remove_viewer(self, stream_id, sid):
+        self.broadcaster.remove_viewer(stream_id, sid)
+
+    def remove_client(self, sid):
+        self.broadcaster.remove_client(sid)
+
+    def get_motion_gate_stats(self):
+        """Frames the motion gate kept away from the model, across all streams"""
+        gates = [stream.gate for stream in list(self.streams.values()) if stream.gate]
+        checked = sum(gate.frames_checked for gate in gates)
+        skipped = sum(gate.frames_skipped for gate in gates)
+        return {
+            'frames_checked': checked,
+            'frames_skipped': skipped,
+            'skip_ratio': round(skipped / checked, 3) if checked else None
+        }
+
+    def get_pipeline_stats(self):
+        """Stage latency, gating and quality summaries pushed to dashboards as pipeline_stats"""
+        return {
+            'stages': self.metrics.snapshot(),
+            'motion_gate': self.get_motion_gate_stats(),
+            'quality': self.get_quality_stats(),
+            'alert_queue_depth': self.alert_executor.get_stats()['queue_depth'],
+            'timestamp': time.time()
+        }
+
+    def get_stats(self):
+        return {
+            'streams': self.list_streams(),
+            'motion_gate': self.get_motion_gate_stats(),
+            'inference': self.scheduler.get_stats() if self.scheduler else None,
+            'streaming': self.broadcaster.get_stats(),
+            'alerts': self.alert_executor.get_stats(),
+            'analysis_cache': self.analysis_cache.get_stats(),
+            'clips': self.clip_recorder.get_stats() if self.clip_recorder else None,
+            'notifications': self.notifier.get_stats() if self.notifier else None,
+            'logging': get_logging_stats(),
+            'startup': self.startup
+        }
+
+    def get_metric_families(self):
+        """Counters and gauges exported next to the stage histograms on /metrics"""
+        # Stopped streams stay listed in the API but leave the metric export
+        streams = [stream for stream in list(self.streams.values()) if stream.is_monitoring]
+        alerts = self.alert_executor.get_stats()
+        inference = self.scheduler.get_stats() if self.scheduler else {}
+        streaming = self.broadcaster.get_stats()
+        notifications = self.notifier.get_stats() if self.notifier else {}
+        return [
+            ('sos_streams_active', 'gauge', 'Streams currently being monitored',
+             [({}, sum(1 for stream in streams if stream.is_monitoring))]),
+            ('sos_frames_total', 'counter', 'Source frames reached by the detection loop',
+             [({'stream': stream.stream_id}, stream.frame_count) for stream in streams]),
+            ('sos_frames_dropped_total', 'counter', 'Decoded frames replaced before they were read',
+             [({'stream': stream.stream_id}, stream.reader.frames_dropped) for stream in streams if stream.reader]),
+            ('sos_frames_gated_total', 'counter', 'Frames the motion gate kept away from the model',
+             [({'stream': stream.stream_id}, stream.gate.frames_skipped) for stream in streams if stream.gate]),
+            ('sos_detections_total', 'counter', 'Detections above threshold',
+             [({'stream': stream.stream_id}, stream.detection_count) for stream in streams]),
+            ('sos_inference_frames_total', 'counter', 'Frames run through the model',
+             [({}, inference.get('total_frames'))]),
+            ('sos_inference_batch_size', 'gauge', 'Average recent inference batch size',
+             [({}, inference.get('avg_batch_size'))]),
+            ('sos_frames_encoded_total', 'counter', 'Frames JPEG encoded for viewers or clips',
+             [({}, streaming['frames_encoded'])]),
+            ('sos_startup_seconds', 'gauge', 'Cold-start phases: server ready, model load, warm-up, detector ready',
+             [({'phase': phase}, value) for phase, value in self.startup.items()]),
+            ('sos_time_to_first_detection_seconds', 'gauge', 'From start request to the first inference result',
+             [({'stream': stream.stream_id}, round(stream.first_result_at - stream.requested_at, 3))
+              for stream in streams if stream.first_result_at]),
+            ('sos_quality_level', 'gauge', 'Adaptive quality level (0 is full quality)',
+             [({'stream': stream.stream_id}, stream.quality.level) for stream in streams]),
+            ('sos_quality_setting', 'gauge', 'Settings chosen by the adaptive quality controller',
+             [({'stream': stream.stream_id, 'knob': knob}, value)
+              for stream in streams for knob, value in quality_knobs(stream.quality)]),
+            ('sos_quality_changes_total', 'counter', 'Quality level changes by direction',
+             [({'stream': stream.stream_id, 'direction': direction}, count) for stream in streams
+              for direction, count in (('down', stream.quality.degraded), ('up', stream.quality.restored))]),
+            ('sos_notifications_total', 'counter', 'Alerts delivered or given up on per notification channel',
+             [({'channel': channel, 'status': status}, stats[status])
+              for channel, stats in notifications.items() for status in ('sent', 'failed')]),
+            ('sos_notification_retries_total', 'counter', 'Failed notification sends that were retried',
+             [({'channel': channel}, stats['retries']) for channel, stats in notifications.items()]),
+            ('sos_notification_outbox_pending', 'gauge', 'Notifications waiting in the outbox',
+             [({'channel': channel}, stats['pending']) for channel, stats in notifications.items()]),
+            ('sos_client_frames_total', 'counter', 'Frames dashboards received, drew or replaced before drawing',
+             [({'stream': stream_id, 'outcome': outcome}, count)
+              for stream_id, counts in list(self.client_frames.items()) for outcome, count in counts.items()]),
+            ('sos_alert_queue_depth', 'gauge', 'Alerts waiting for a worker', [({}, alerts['queue_depth'])]),
+            ('sos_alerts_processed_total', 'counter', 'Alerts fully processed', [({}, alerts['processed'])]),
+            ('sos_alerts_failed_total', 'counter', 'Alerts that raised', [({}, alerts['failed'])]),
+            ('sos_alerts_dropped_total', 'counter', 'Alerts dropped on a full queue', [({}, alerts['dropped'])]),
+            ('sos_analysis_timeouts_total', 'counter', 'Analysis calls that fell back on timeout',
+             [({}, alerts['timeouts'])])
+        ]
+
+    def record_client_timing(self, stream_id, report):
+        """Fold a dashboard's frame decode/display timings into the stage histograms"""
+        with self.lock:
+            # Late reports for a stopped stream would bring back the series it dropped
+            stream = self.streams.get(stream_id)
+            if stream is None or not stream.is_monitoring:
+                return False
+
+            for stage, key in CLIENT_STAGES:
+                samples = report.get(key)
+                if not isinstance(samples, list):
+                    continue
+                for ms in samples[:MAX_CLIENT_SAMPLES]:
+                    if isinstance(ms, (int, float)) and 0 <= ms < 60000:
+                        self.metrics.observe(stage, ms / 1000, stream_id)
+
+            counts = self.client_frames.setdefault(stream_id, dict.fromkeys(CLIENT_FRAME_OUTCOMES, 0))
+            for outcome in CLIENT_FRAME_OUTCOMES:
+                value = report.get(outcome)
+                if isinstance(value, int) and 0 <= value <= 100000:
+                    counts[outcome] += value
+        return True
+
+    def get_quality_stats(self):
+        return {stream_id: stream.quality.get_stats() for stream_id, stream in list(self.streams.items())
+                if stream.is_monitoring}
+
+    def render_metrics(self):
+        return self.metrics.render_prometheus(self.get_metric_families())
+
+    def queue_alert(self, alert_data):
+        if self.alert_executor.submit(alert_data):
+            log.info("🚨 [%s] Queued alert for %s", alert_data['stream_id'], alert_data['class_name'])
+        else:
+            log.warning("⚠️ [%s] Alert queue full, dropping %s alert", alert_data['stream_id'], alert_data['class_name'])
+
+    def process_emergency_alert(self, alert_data):
+        """Process and emit emergency alerts with message sending"""
+        detection_system = self.detection_system
+        log.info("🤖 [%s] Processing alert for %s", alert_data['stream_id'], alert_data['class_name'])
+        stream_id = alert_data['stream_id']
+        class_name = alert_data['class_name']
+        confidence = alert_data['confidence']
+        self.metrics.observe('alert_queue_wait', time.time() - alert_data['queued_at'], stream_id)
+
+        try:
+            # Padded incident region, cropped in the detection loop
+            incident_crop = alert_data['crop']
+
+            # Resize if too large
+            if incident_crop.shape[0] > 400 or incident_crop.shape[1] > 400:
+                incident_crop = cv2.resize(incident_crop, (400, 400))
+
+            incident_rgb = cv2.cvtColor(incident_crop, cv2.COLOR_BGR2RGB)
+            incident_pil = Image.fromarray(incident_rgb)
+
+            # Notify frontend of AI processing
+            self.emit('alert_processing', {
+                'stream_id': stream_id,
+                'type': class_name,
+                'status': 'Getting AI analysis...'
+            })
+
+            # Near-duplicate scenes reuse an earlier analysis instead of calling Gemini again
+            start_ai = time.time()
+            gemini_analysis, phash = self.analysis_cache.lookup(class_name, incident_crop)
+            cached = gemini_analysis is not None
+
+            if not cached and not detection_system.use_gemini:
+                gemini_analysis = detection_system.get_fallback_message(class_name)
+            elif not cached:
+                # A slow call falls back instead of holding up the pipeline
+                with self.metrics.time('analysis', stream_id):
+                    # Errors and empty answers raise, so only real analyses reach the cache
+                    gemini_analysis, used_fallback = self.alert_executor.call_with_timeout(
+                        detection_system.request_gemini_analysis, incident_pil, class_name,
+                        fallback=lambda: detection_system.get_fallback_message(class_name)
+                    )
+                if not used_fallback:
+                    self.analysis_cache.store(class_name, phash, gemini_analysis, time.time() - start_ai)
+            ai_time = time.time() - start_ai
+
+            # Save alert
+            with self.metrics.time('alert_write', stream_id):
+                report = detection_system.save_emergency_alert(
+                    class_name, confidence, gemini_analysis, incident_crop,
+                    stream_id=stream_id, track_id=alert_data['track_id'],
+                    clip_file=alert_data['clip_file']
+                )
+            alert_id = report['alert_id']
+
+            alert_message = f"""
+🚨 EMERGENCY ALERT {alert_id} 🚨
+STREAM: {stream_id} | TRACK: {alert_data['track_id']}
+TYPE: {class_name.upper()} | CONFIDENCE: {confidence:.1%}
+TIME: {time.strftime("%Y-%m-%d %H:%M:%S")}
+ANALYSIS: {gemini_analysis}
+ALERT ID: {alert_id}
+AI PROCESSING TIME: {ai_time:.1f}s{" (cached)" if cached else ""}
+            """.strip()
+
+            log.warning(alert_message)
+
+            # End-to-end: frame decoded -> alert ready to emit
+            capture_to_alert = time.time() - alert_data['captured_at']
+            self.metrics.observe('capture_to_alert', capture_to_alert, stream_id)
+
+            # External notifications only write to the outbox here; delivery runs on the dispatcher
+            if self.notifier:
+                self.notifier.notify({
+                    'alert_id': alert_id,
+                    'stream_id': stream_id,
+                    'track_id': alert_data['track_id'],
+                    'type': class_name.upper(),
+                    'confidence': confidence,
+                    'analysis': gemini_analysis,
+                    'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+                    'evidence_url': f"/api/alerts/{alert_id}/evidence",
+                    'captured_at': alert_data['captured_at']
+                })
+
+            # Emergency alerts go to every dashboard, not just the stream's viewers;
+            # the evidence image is fetched from evidence_url when an alert is opened
+            self.emit('emergency_alert', {
+                'stream_id': stream_id,
+                'track_id': alert_data['track_id'],
+                'type': class_name.upper(),
+                'confidence': confidence,
+                'analysis': gemini_analysis,
+                'alert_message': alert_message,
+                'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'alert_id': alert_id,
+                'evidence_url': f"/api/alerts/{alert_id}/evidence",
+                'clip_url': f"/api/alerts/{alert_id}/clip" if alert_data['clip_file'] else None,
+                'ai_time': f"{ai_time:.1f}s",
+                'cached_analysis': cached,
+                'capture_to_alert': f"{capture_to_alert:.2f}s"
+            })
+
+            log.info("✅ [%s] Alert emitted: %s - %.1f%%", stream_id, class_name.upper(), confidence * 100)
+
+        except Exception as e:
+            self.emit('alert_error', {'stream_id': stream_id, 'error': str(e)})
+            raise
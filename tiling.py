@@ -0,0 +1,194 @@
+import math
+
+import cv2
+import numpy as np
+
+from postprocess import affine_boxes, box_iou, extract_arrays
+
+
+# Per-camera overrides accepted by start_stream(tiling={...})
+TILING_OPTIONS = ('tile_size', 'overlap', 'max_tiles', 'min_width', 'seed_confidence', 'nms_iou')
+
+
+def letterbox(image, size=640, fill=114):
+    """Fit image into a size x size square without distorting it
+
+    Returns the padded image and (scale, pad_x, pad_y) to map boxes back.
+    """
+    height, width = image.shape[:2]
+    scale = min(size / width, size / height)
+    new_w, new_h = max(1, round(width * scale)), max(1, round(height * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(image, (new_w, new_h), interpolation=interpolation)
+
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), fill, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, (scale, pad_x, pad_y)
+
+
+def unletterbox_rows(rows, transform, offset=(0, 0)):
+    """Map (N, 6) detection rows from letterboxed pixels back to frame pixels"""
+    scale, pad_x, pad_y = transform
+    rows = np.array(rows, dtype=np.float32).reshape(-1, 6)
+    rows[:, :4] = affine_boxes(
+        rows[:, :4], (1 / scale, 1 / scale), (offset[0] - pad_x / scale, offset[1] - pad_y / scale)
+    )
+    return rows
+
+
+def axis_starts(length, tile, overlap):
+    """Evenly spaced tile starts covering length with at least overlap between neighbours"""
+    if length <= tile:
+        return [0]
+    count = math.ceil((length - tile) / (tile * (1 - overlap))) + 1
+    return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+
+def plan_tiles(width, height, tile_size, overlap):
+    """(T, 4) x1, y1, x2, y2 grid of overlapping tiles covering the frame"""
+    tile_w, tile_h = min(tile_size, width), min(tile_size, height)
+    return np.array([
+        (x, y, x + tile_w, y + tile_h)
+        for y in axis_starts(height, tile_h, overlap)
+        for x in axis_starts(width, tile_w, overlap)
+    ], dtype=np.int32)
+
+
+def select_tiles(tiles, activity, max_tiles):
+    """The tiles that overlap activity boxes most, at most max_tiles of them"""
+    activity = np.asarray(activity, dtype=np.float32).reshape(-1, 4)
+    if len(activity) == 0 or max_tiles <= 0:
+        return tiles[:0]
+
+    top_left = np.maximum(tiles[:, None, :2], activity[None, :, :2])
+    bottom_right = np.minimum(tiles[:, None, 2:], activity[None, :, 2:])
+    covered = np.clip(bottom_right - top_left, 0, None).prod(axis=2).sum(axis=1)
+
+    ranked = np.argsort(-covered)[:max_tiles]
+    return tiles[ranked[covered[ranked] > 0]]
+
+
+def class_aware_nms(rows, iou_threshold=0.5):
+    """Greedy NMS over (N, 6) rows that only suppresses boxes of the same class"""
+    if len(rows) < 2:
+        return rows
+    rows = rows[np.argsort(-rows[:, 4])]
+
+    # Shift each class into its own coordinate range so classes never overlap
+    offsets = rows[:, 5:6] * (rows[:, :4].max() + 1)
+    iou = box_iou(rows[:, :4] + offsets, rows[:, :4] + offsets)
+
+    keep = np.ones(len(rows), dtype=bool)
+    for i in range(len(rows)):
+        if keep[i]:
+            keep[i + 1:] &= iou[i, i + 1:] < iou_threshold
+    return rows[keep]
+
+
+class TiledInference:
+    """Multi-scale inference for high-resolution cameras
+
+    A coarse letterboxed pass sees the whole frame; overlapping tiles of
+    tile_size frame pixels are then run as one batch, but only where
+    there is activity: small coarse detections (above seed_confidence),
+    motion, or live tracks. At most max_tiles are added per frame, so the
+    cost stays bounded. All boxes are mapped back to frame pixels and
+    merged with class-aware NMS. Frames narrower than min_width skip tiling.
+    """
+
+    def __init__(self, tile_size=960, overlap=0.2, max_tiles=6, min_width=1920, seed_confidence=0.25,
+                 nms_iou=0.5, input_size=640):
+        if tile_size < 64:
+            raise ValueError("tile_size must be at least 64 pixels")
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+        if max_tiles < 0:
+            raise ValueError("max_tiles must not be negative")
+
+        self.tile_size = int(tile_size)
+        self.overlap = float(overlap)
+        self.max_tiles = int(max_tiles)
+        self.min_width = int(min_width)
+        self.seed_confidence = float(seed_confidence)
+        self.nms_iou = float(nms_iou)
+        self.input_size = input_size
+
+        self.tiles = None
+        self.tiles_key = None
+        self.frames = 0
+        self.tiled_frames = 0
+        self.tiles_run = 0
+        self.last_tiles = 0
+
+    def applies(self, frame):
+        return frame.shape[1] >= self.min_width
+
+    def get_tiles(self, width, height):
+        key = (width, height, self.tile_size, self.overlap)
+        if key != self.tiles_key:
+            self.tiles = plan_tiles(width, height, self.tile_size, self.overlap)
+            self.tiles_key = key
+        return self.tiles
+
+    def detect(self, frame, infer_batch, activity=()):
+        """Detection rows (N, 6) in frame pixels for one frame
+
+        infer_batch(images) runs letterboxed images through the model
+        together and returns their results in order; activity is extra
+        (M, 4) frame-pixel boxes worth a closer look (motion, tracks).
+        """
+        height, width = frame.shape[:2]
+        coarse, transform = letterbox(frame, self.input_size)
+        rows = unletterbox_rows(extract_arrays(infer_batch([coarse])[0]), transform)
+
+        # Large coarse detections are already resolved; small or faint ones get a tile
+        sizes = (rows[:, 2:4] - rows[:, :2]).max(axis=1)
+        seeds = rows[(rows[:, 4] >= self.seed_confidence) & (sizes < self.tile_size / 2), :4]
+        activity = np.concatenate([seeds, np.asarray(activity, dtype=np.float32).reshape(-1, 4)])
+
+        tiles = select_tiles(self.get_tiles(width, height), activity, self.max_tiles)
+        self.frames += 1
+        self.last_tiles = len(tiles)
+        if len(tiles) == 0:
+            return rows
+
+        crops = [letterbox(frame[y1:y2, x1:x2], self.input_size) for x1, y1, x2, y2 in tiles.tolist()]
+        results = infer_batch([image for image, _ in crops])
+        merged = [rows] + [
+            unletterbox_rows(extract_arrays(result), tile_transform, tile[:2])
+            for (_, tile_transform), result, tile in zip(crops, results, tiles.tolist())
+        ]
+        self.tiled_frames += 1
+        self.tiles_run += len(tiles)
+
+        rows = np.concatenate(merged)
+        rows[:, [0, 2]] = rows[:, [0, 2]].clip(0, width)
+        rows[:, [1, 3]] = rows[:, [1, 3]].clip(0, height)
+        return class_aware_nms(rows, self.nms_iou)
+
+    def get_stats(self):
+        return {
+            'tile_size': self.tile_size,
+            'grid_tiles': len(self.tiles) if self.tiles is not None else None,
+            'max_tiles': self.max_tiles,
+            'frames': self.frames,
+            'tiled_frames': self.tiled_frames,
+            'avg_tiles': round(self.tiles_run / self.frames, 2) if self.frames else None,
+            'last_tiles': self.last_tiles
+        }
+
+
+def validate_tiling(tiling):
+    """Check a per-camera tiling setting: None, a bool, or a dict of TILING_OPTIONS"""
+    if tiling is None or isinstance(tiling, bool):
+        return
+    if not isinstance(tiling, dict):
+        raise ValueError("tiling must be true, false or an object of tiling options")
+    unknown = set(tiling) - set(TILING_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown tiling options: {', '.join(sorted(unknown))}")
+    for name, value in tiling.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"tiling option {name} must be a number")
+    TiledInference(**tiling)
@@ -0,0 +1,170 @@
+import itertools
+from collections import deque
+
+import numpy as np
+
+from postprocess import box_iou
+
+
+# Constant-velocity model over [cx, cy, area, aspect, vcx, vcy, varea]
+TRANSITION = np.eye(7)
+TRANSITION[0, 4] = TRANSITION[1, 5] = TRANSITION[2, 6] = 1
+MEASUREMENT = np.eye(4, 7)
+PROCESS_NOISE = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.0001])
+MEASUREMENT_NOISE = np.diag([1, 1, 10, 10])
+
+
+def bbox_to_measurement(bbox):
+    x1, y1, x2, y2 = bbox
+    w, h = x2 - x1, y2 - y1
+    return np.array([x1 + w / 2, y1 + h / 2, w * h, w / max(h, 1e-6)], dtype=float)
+
+
+def state_to_bbox(state):
+    cx, cy, area, aspect = state[:4]
+    w = np.sqrt(max(area * aspect, 0))
+    h = area / w if w > 0 else 0
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+
+class Track:
+    """One incident followed across frames by a small Kalman filter"""
+
+    def __init__(self, track_id, class_id, bbox, confidence, confirm_window):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.confidence = confidence
+        self.bbox = np.asarray(bbox, dtype=float)
+
+        self.state = np.zeros(7)
+        self.state[:4] = bbox_to_measurement(bbox)
+        self.covariance = np.diag([10, 10, 10, 10, 1e4, 1e4, 1e4])
+
+        self.hits = deque([True], maxlen=confirm_window)
+        self.misses = 0
+        self.alerted = False
+
+    def predict(self):
+        # Do not let a shrinking box go to negative area
+        if self.state[2] + self.state[6] <= 0:
+            self.state[6] = 0
+        self.state = TRANSITION @ self.state
+        self.covariance = TRANSITION @ self.covariance @ TRANSITION.T + PROCESS_NOISE
+        return state_to_bbox(self.state)
+
+    def update(self, bbox, confidence):
+        residual = bbox_to_measurement(bbox) - MEASUREMENT @ self.state
+        innovation = MEASUREMENT @ self.covariance @ MEASUREMENT.T + MEASUREMENT_NOISE
+        gain = self.covariance @ MEASUREMENT.T @ np.linalg.inv(innovation)
+        self.state = self.state + gain @ residual
+        self.covariance = (np.eye(7) - gain @ MEASUREMENT) @ self.covariance
+
+        self.bbox = np.asarray(bbox, dtype=float)
+        self.confidence = max(self.confidence, confidence)
+        self.hits.append(True)
+        self.misses = 0
+
+    def mark_missed(self):
+        self.hits.append(False)
+        self.misses += 1
+
+
+class IncidentTracker:
+    """Assigns track ids across frames and confirms incidents after k of n hits
+
+    Detections are matched to the Kalman-predicted boxes of existing
+    tracks of the same class by greedy highest-IoU assignment. A track is
+    confirmed once it has been seen in confirm_hits of its last
+    confirm_window frames, and each track is reported as confirmed
+    exactly once - that is the point where it should raise an alert.
+    """
+
+    def __init__(self, iou_threshold=0.3, confirm_hits=3, confirm_window=5, max_age=10):
+        # Matching stops once no pair reaches the threshold, so it must be above zero
+        if not 0 < iou_threshold <= 1:
+            raise ValueError(f"iou_threshold must be in (0, 1], got {iou_threshold}")
+        self.iou_threshold = iou_threshold
+        self.confirm_hits = confirm_hits
+        self.confirm_window = confirm_window
+        self.max_age = max_age
+
+        self.tracks = []
+        self.track_ids = itertools.count(1)
+
+    def __getstate__(self):
+        # Checkpointable: keep the next track id rather than the counter object
+        state = dict(self.__dict__)
+        next_id = next(self.track_ids)
+        self.track_ids = itertools.count(next_id)
+        state['track_ids'] = next_id
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.track_ids = itertools.count(state['track_ids'])
+
+    def update(self, detections):
+        """Match a frame's Detections to tracks
+
+        Sets detections.track_ids and returns a list of
+        (detection_index, track) for tracks confirmed on this frame.
+        """
+        predicted = np.array([track.predict() for track in self.tracks]).reshape(-1, 4)
+        matches = self.match(detections, predicted)
+
+        detection_tracks = [None] * len(detections)
+        matched_tracks = set()
+
+        for det_index, track_index in matches:
+            track = self.tracks[track_index]
+            track.update(detections.boxes[det_index], float(detections.confidences[det_index]))
+            detection_tracks[det_index] = track
+            matched_tracks.add(track_index)
+
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in matched_tracks:
+                track.mark_missed()
+
+        for det_index in range(len(detections)):
+            if detection_tracks[det_index] is not None:
+                continue
+            track = Track(
+                next(self.track_ids), int(detections.class_ids[det_index]),
+                detections.boxes[det_index], float(detections.confidences[det_index]),
+                self.confirm_window
+            )
+            self.tracks.append(track)
+            detection_tracks[det_index] = track
+
+        confirmed = []
+        for det_index, track in enumerate(detection_tracks):
+            if not track.alerted and sum(track.hits) >= self.confirm_hits:
+                track.alerted = True
+                confirmed.append((det_index, track))
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_age]
+        detections.track_ids = np.array([track.track_id for track in detection_tracks], dtype=np.int32)
+        return confirmed
+
+    def match(self, detections, predicted):
+        """Greedy class-aware IoU matching; returns [(detection_index, track_index)]"""
+        if len(detections) == 0 or len(predicted) == 0:
+            return []
+
+        iou = box_iou(detections.boxes, predicted)
+        track_classes = np.array([track.class_id for track in self.tracks])
+        iou[detections.class_ids[:, None] != track_classes[None, :]] = 0
+
+        matches = []
+        while iou.size and iou.max() >= self.iou_threshold:
+            det_index, track_index = np.unravel_index(iou.argmax(), iou.shape)
+            matches.append((int(det_index), int(track_index)))
+            iou[det_index, :] = 0
+            iou[:, track_index] = 0
+        return matches
+
+    def get_stats(self):
+        return {
+            'active_tracks': len(self.tracks),
+            'alerted_tracks': sum(1 for track in self.tracks if track.alerted)
+        }
@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+
+from logging_setup import get_logger
+
+
+log = get_logger('uploads')
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi', '.ts', '.webm')
+
+
+class UploadSession:
+    """One resumable upload, written sequentially into its final file
+
+    Readers can follow the file while it grows: wait_for_growth blocks
+    until more bytes arrive or the upload completes.
+    """
+
+    def __init__(self, upload_id, path, filename, size, received=0, created_at=None, stall_timeout=60.0):
+        self.upload_id = upload_id
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.received = received
+        self.created_at = created_at or time.time()
+        self.updated_at = time.time()
+        self.stall_timeout = stall_timeout
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+
+    @property
+    def complete(self):
+        return self.received >= self.size
+
+    def is_stalled(self):
+        return not self.complete and time.time() - self.updated_at > self.stall_timeout
+
+    def advance(self, received):
+        with self.condition:
+            self.received = received
+            self.updated_at = time.time()
+            self.condition.notify_all()
+
+    def wait_for_growth(self, received, timeout=5.0):
+        """Block until more than received bytes are on disk or the upload is complete"""
+        with self.condition:
+            if self.received <= received and not self.complete:
+                self.condition.wait(timeout)
+            return self.received > received or self.complete
+
+    def to_dict(self):
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'received': self.received,
+            'complete': self.complete,
+            'created_at': self.created_at
+        }
+
+
+class UploadManager:
+    """Chunked uploads stored as <upload_id><ext> with a small JSON sidecar
+
+    Sidecars go to state_folder, outside the (publicly served) upload
+    folder, so upload state is never downloadable.
+
+    Chunks must arrive in order: a chunk is accepted only at the current
+    received offset, and a client resumes by asking for that offset. The
+    byte count on disk is the source of truth, so uploads can be resumed
+    after a server restart too.
+    """
+
+    def __init__(self, folder, state_folder='uploads/.state', stall_timeout=60.0, copy_block=1024 * 1024):
+        self.folder = folder
+        self.state_folder = state_folder
+        self.stall_timeout = stall_timeout
+        self.copy_block = copy_block
+        self.sessions = {}
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        os.makedirs(state_folder, exist_ok=True)
+
+    def meta_path(self, upload_id):
+        return os.path.join(self.state_folder, f"{upload_id}.json")
+
+    def create(self, filename, size):
+        if size is None or int(size) <= 0:
+            raise ValueError("Upload size must be a positive number of bytes")
+        extension = os.path.splitext(filename or '')[1].lower()
+        if extension not in VIDEO_EXTENSIONS:
+            extension = '.mp4'
+
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.folder, f"{upload_id}{extension}")
+        open(path, 'wb').close()
+
+        session = UploadSession(upload_id, path, os.path.basename(filename or ''), int(size),
+                                stall_timeout=self.stall_timeout)
+        with open(self.meta_path(upload_id), 'w') as f:
+            json.dump({'path': path, 'filename': session.filename, 'size': session.size,
+                       'created_at': session.created_at}, f)
+
+        with self.lock:
+            self.sessions[upload_id] = session
+        log.info("📤 Upload %s started: %s (%.1f MB)", upload_id, session.filename, session.size / 1e6)
+        return session
+
+    def get(self, upload_id):
+        """Return the session, reloading it from disk if the server restarted mid-upload"""
+        if not upload_id or not UPLOAD_ID_PATTERN.match(upload_id):
+            return None
+        with self.lock:
+            session = self.sessions.get(upload_id)
+            if session is None and os.path.exists(self.meta_path(upload_id)):
+                with open(self.meta_path(upload_id)) as f:
+                    meta = json.load(f)
+                received = os.path.getsize(meta['path']) if os.path.exists(meta['path']) else 0
+                session = UploadSession(upload_id, meta['path'], meta['filename'], meta['size'],
+                                        received=min(received, meta['size']), created_at=meta['created_at'],
+                                        stall_timeout=self.stall_timeout)
+                self.sessions[upload_id] = session
+        return session
+
+    def write_chunk(self, session, offset, stream):
+        """Append a chunk read from stream at offset; returns the new received count
+
+        Raises ValueError when offset is not where the upload left off.
+        """
+        if not session.write_lock.acquire(blocking=False):
+            raise ValueError(f"Another chunk is being written; expected offset {session.received}")
+        try:
+            return self.append(session, offset, stream)
+        finally:
+            session.write_lock.release()
+
+    def append(self, session, offset, stream):
+        if offset != session.received:
+            raise ValueError(f"Expected offset {session.received}")
+
+        received = offset
+        with open(session.path, 'r+b') as f:
+            f.seek(offset)
+            f.truncate()
+            while True:
+                block = stream.read(self.copy_block)
+                if not block:
+                    break
+                if received + len(block) > session.size:
+                    raise ValueError("Chunk runs past the declared upload size")
+                f.write(block)
+                received += len(block)
+                # Publish progress as it lands so a stream on this upload can read ahead
+                f.flush()
+                session.advance(received)
+
+        if session.complete:
+            log.info("✅ Upload %s complete (%.1f MB)", session.upload_id, session.size / 1e6)
+        return received
+
+    def save_file(self, file_storage):
+        """Single-request upload (legacy /upload): stream the form file into a new session"""
+        file_storage.stream.seek(0, os.SEEK_END)
+        size = file_storage.stream.tell()
+        file_storage.stream.seek(0)
+
+        session = self.create(file_storage.filename, size)
+        self.write_chunk(session, 0, file_storage.stream)
+        return session